@@ -0,0 +1,120 @@
+"""
+In-process API of RST-Tace, e.g. for evaluation loops in Python.
+Sources of RST trees can be paths of rs3-files, the content of rs3-files
+as bytes, or any 'IRstInput'. Results are returned directly, nothing is
+written to the filesystem.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from os import PathLike
+
+import pandas as pd
+
+from rsttace.controller import IRstInput
+from rsttace.controller.interactors import AnalyseInteractor
+from rsttace.core import RelTable, RelColumns, ComparisonTable
+from rsttace.core import CompareSetTable, TableComparer, TableSetComparer
+from rsttace.core import AgreementSession
+from rsttace.core.comparesettable import createMetricsRow
+from rsttace.input import RstTreeParser, RstBytesParser, RstFileObjectParser
+
+
+RELATION_COLUMNS = ["Relation", "MultiNuclear", "Nuclearity",
+                    "C1", "C2", "CN", "A1", "A2", "AN", "CS"]
+
+
+def analyse(source) -> pd.DataFrame:
+    """ Relations annotated in the RST tree of source, one row per relation
+        with typed columns (see RELATION_COLUMNS): span IDs as int,
+        nuclearity of constituent (CN) and attachment point (AN) as bool,
+        and the central subconstituent (CS) as list of (minID, maxID). """
+    return createRelationFrame(extractRelations(source))
+
+
+def compare(source1, source2) -> ComparisonTable:
+    """ Compares the RST trees of both sources. The ComparisonTable holds
+        the compared relation pairs as parallel arrays (relIDs1, relIDs2,
+        distances, matchBits), and their matchingRatios and cohensKappas. """
+    relTable1 = extractRelations(source1)
+    relTable2 = extractRelations(source2)
+    return TableComparer().run(relTable1, relTable2)
+
+
+def openSession(source1, source2) -> AgreementSession:
+    """ AgreementSession of the RST trees of both sources, which updates its
+        association and metrics incrementally, while relations are edited
+        (e.g. by an annotation tool) """
+    return AgreementSession(extractRelations(source1),
+                            extractRelations(source2))
+
+
+def compareSets(pairs, jobs: int = 1,
+                tableSetComparer: TableSetComparer = None) -> CompareSetTable:
+    """ Compares each pair of sources and evaluates all comparisons.
+        pairs: iterable of tuples (name, source1, source2), whereby the
+        sources of 'jobs' > 1 must be picklable (e.g. paths or bytes).
+        The rows of the resulting dataFrame follow the order of pairs. """
+    if tableSetComparer is None:
+        tableSetComparer = TableSetComparer()
+    pairs = list(pairs)
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(comparePair, pairs))
+    else:
+        results = [comparePair(pair) for pair in pairs]
+    rows = [row for row, _ in results]
+    agreementCountsList = [counts for _, counts in results]
+    return tableSetComparer.runOnMetrics(rows, agreementCountsList)
+
+
+# Support functions
+
+
+def createRstInput(source) -> IRstInput:
+    """ IRstInput for a path, the content of a rs3-file, a binary or text
+        file object, or an IRstInput """
+    if isinstance(source, IRstInput):
+        return source
+    elif isinstance(source, (bytes, bytearray)):
+        return RstBytesParser(bytes(source))
+    elif isinstance(source, (str, PathLike)):
+        return RstTreeParser(str(source))
+    elif hasattr(source, "read"):
+        return RstFileObjectParser(source)
+    else:
+        raise TypeError("Unsupported source of RST tree: "
+                        + type(source).__name__)
+
+
+def extractRelations(source) -> RelTable:
+    return AnalyseInteractor(createRstInput(source), []).run()
+
+
+def comparePair(pair: tuple) -> tuple:
+    """ Metrics row and AgreementCounts of a pair (name, source1, source2) """
+    name, source1, source2 = pair
+    metrics = TableComparer().runMetrics(extractRelations(source1),
+                                         extractRelations(source2))
+    row = createMetricsRow(name, metrics.matchingRatios,
+                           metrics.cohensKappas)
+    return row, metrics.agreementCounts
+
+
+def createRelationFrame(relTable: RelTable) -> pd.DataFrame:
+    columns = RelColumns(relTable)
+    nuclearity = pd.Categorical.from_codes(columns.direction,
+                                           ["multi", "right", "left"])
+    return pd.DataFrame({
+        "Relation": columns.name,
+        "MultiNuclear": columns.isMultiNuclear,
+        "Nuclearity": nuclearity,
+        "C1": columns.constituent[:, 0],
+        "C2": columns.constituent[:, 1],
+        "CN": columns.constituent[:, 2].astype(bool),
+        "A1": columns.attachmentPoint[:, 0],
+        "A2": columns.attachmentPoint[:, 1],
+        "AN": columns.attachmentPoint[:, 2].astype(bool),
+        "CS": [[(int(relElem.minID), int(relElem.maxID))
+                for relElem in rel.centralSubconstituent]
+               for rel in relTable]},
+        columns=RELATION_COLUMNS)
@@ -6,21 +6,152 @@ Created on Sat Jul 14 14:40:01 2018
 """
 
 import click
+import logging
+import sys
+from logging.handlers import MemoryHandler
 
 from rsttace.controller.interactors import AnalyseInteractor
 from rsttace.controller.interactors import CompareInteractor
 from rsttace.controller.interactors import CompareSetInteractor
-from rsttace.input import RstTreeParser
+from rsttace.controller.interactors import CompareManySetsInteractor
+from rsttace.controller.interactors import MergeInteractor
+from rsttace.core import TableSetComparer, WindowedComparer
+from rsttace.core import defaultDistanceCache
+from rsttace.input import RstTreeParser, PartialResultsReader
+from rsttace.input import InvalidPartialResultsFile
+from rsttace.input import isRstSet, openRstSet
 from rsttace.output import RelTableLogger, RelTableCliOutput
 from rsttace.output import CompTableLogger, CompTableCliOutput
-from rsttace.output import CompTableDummyOutput
 from rsttace.output import CompareSetTableLogger, CompareSetTableCliOutput
+from rsttace.output import CompareSetPartialLogger
+from rsttace.output import ProgressCliOutput, TimingLogger
+from rsttace.output import RelTableJsonLogger, CompTableJsonLogger
+from rsttace.output import CompareSetTableJsonLogger
+from rsttace.output import PairErrorLogger, PairErrorCliOutput
+from rsttace.output import CheckpointLog, InvalidCheckpointFile
+
+
+logger = logging.getLogger(__name__)
+
+# Number of buffered log records, written at once to stderr
+LOG_BUFFER_CAPACITY = 1000
+
+# Extensions of archives, which are accepted in place of directories
+ARCHIVE_EXTENSIONS = [".tar.gz", ".tar.bz2", ".tar.xz", ".tgz", ".tar", ".zip"]
+
+
+def parseShard(ctx, param, value):
+    """ Parses the shard option 'INDEX/COUNT' into a tuple of integers """
+    if value is None:
+        return None
+    try:
+        index, count = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise click.BadParameter("expected format INDEX/COUNT, e.g. 1/4")
+    if count < 1 or index < 1 or index > count:
+        raise click.BadParameter("INDEX must be between 1 and COUNT")
+    return (index, count)
+
+
+def parseSegments(ctx, param, value):
+    """ Parses the segments option 'MIN-MAX' into a tuple of integers """
+    if value is None:
+        return None
+    try:
+        minID, maxID = (int(x) for x in value.split("-"))
+    except ValueError:
+        raise click.BadParameter("expected format MIN-MAX, e.g. 100-250")
+    if minID > maxID:
+        raise click.BadParameter("MIN must not be greater than MAX")
+    return (minID, maxID)
+
+
+def tableOptions(command):
+    """ Options of the result tables, shared by all commands """
+    return addOptions(command, [
+        click.option("--max-rows",
+                     default=None,
+                     type=click.IntRange(min=0),
+                     help="Print at most MAX_ROWS rows of each table on \
+command line."),
+        click.option("--format", "outputFormat",
+                     default="csv",
+                     type=click.Choice(["csv", "jsonl"]),
+                     help="Format of the result files: CSV tables (default) \
+or JSON Lines with one typed record per relation or comparison.")])
+
+
+def evaluationOptions(scope: str = "",
+                      jobsHelp: str = "Number of worker processes."):
+    """ Options of the overall evaluation of RST tree pair sets: bootstrap
+        intervals and worker processes. scope is appended to the help of
+        '--bootstrap'. """
+    options = [
+        click.option("--bootstrap", "-b",
+                     default=0,
+                     type=click.IntRange(min=0),
+                     metavar="REPLICATES",
+                     help="Add bootstrap confidence intervals of the overall \
+metrics, based on REPLICATES replicates" + scope + "."),
+        click.option("--confidence",
+                     default=0.95,
+                     type=click.FloatRange(min=0, max=1, min_open=True,
+                                           max_open=True),
+                     help="Confidence level of bootstrap intervals."),
+        click.option("--seed",
+                     default=None,
+                     type=int,
+                     help="Random seed of bootstrap resampling."),
+        click.option("--jobs", "-j",
+                     default=1,
+                     type=click.IntRange(min=1),
+                     help=jobsHelp)]
+    return lambda command: addOptions(command, options)
+
+
+def addOptions(command, options: list):
+    """ Applies the click options to command, listed in the given order """
+    for option in reversed(options):
+        command = option(command)
+    return command
 
 
 @click.group()
-def cli():
+@click.option("--quiet", "-q", is_flag=True,
+              help="Report only warnings and errors, no progress messages.")
+@click.option("--log-level",
+              default="INFO",
+              type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"],
+                                case_sensitive=False),
+              help="Minimum level of reported messages (default: INFO, \
+DEBUG additionally reports each processed RST tree pair).")
+def cli(quiet: bool, log_level: str):
     """ This tool analyses, compares, and evaluates RST-trees. """
-    pass
+    configureLogging("WARNING" if quiet else log_level.upper())
+    click.get_current_context().call_on_close(flushLogging)
+
+
+def configureLogging(level: str):
+    """ Reports the messages of all rsttace loggers with at least the given
+        level on stderr. Messages are buffered and written in blocks, errors
+        are written immediately. """
+    rootLogger = logging.getLogger("rsttace")
+    for handler in list(rootLogger.handlers):
+        handler.close()
+        rootLogger.removeHandler(handler)
+    streamHandler = logging.StreamHandler(sys.stderr)
+    streamHandler.setFormatter(logging.Formatter("%(message)s"))
+    rootLogger.addHandler(MemoryHandler(LOG_BUFFER_CAPACITY,
+                                        flushLevel=logging.ERROR,
+                                        target=streamHandler))
+    rootLogger.setLevel(level)
+    rootLogger.propagate = False
+
+
+def flushLogging():
+    """ Writes all buffered log records """
+    for handler in logging.getLogger("rsttace").handlers:
+        handler.flush()
 
 
 @cli.command('analyse', short_help="Parse a single RST tree, analyse and list\
@@ -32,9 +163,12 @@ def cli():
               help="Write the result files to the directory OUTPUTDIR.")
 @click.option('--verbose', '-v', is_flag=True,
               help="Print results on command line")
+@tableOptions
 def analyse(rstfile: str,
             output: str,
-            verbose: bool):
+            verbose: bool,
+            max_rows: int,
+            outputFormat: str):
     """ Parse the RST-tree from RSTFILE, and create a list of the rethorical \
 relations annotated inside it. """
     rstParser = RstTreeParser(rstfile)
@@ -43,13 +177,16 @@ relations annotated inside it. """
     if output != "":
         checkAndMakeDir(output)
         filename = extractFileName(rstfile)
-        outputfile = "Analysis_" + filename + ".csv"
+        outputfile = "Analysis_" + filename + "." + outputFormat
         outputpath = joinPaths(output, outputfile)
-        tableOutputs.append(RelTableLogger(outputpath))
+        if outputFormat == "jsonl":
+            tableOutputs.append(RelTableJsonLogger(outputpath))
+        else:
+            tableOutputs.append(RelTableLogger(outputpath))
     if(verbose or output == ""):
-        tableOutputs.append(RelTableCliOutput())
+        tableOutputs.append(RelTableCliOutput(max_rows))
 
-    print("\nAnalyse and list relations of RST tree in: " + rstfile)
+    logger.info("Analyse and list relations of RST tree in: " + rstfile)
     interactor = AnalyseInteractor(rstParser, tableOutputs)
     interactor.run()
 
@@ -64,104 +201,509 @@ relations annotated inside it. """
               help="Write the result files to the directory OUTPUTDIR.")
 @click.option('--verbose', '-v', is_flag=True,
               help="Print results on command line")
+@tableOptions
+@evaluationOptions(" (only for directories)")
+@click.option("--shard",
+              default=None,
+              callback=parseShard,
+              metavar="INDEX/COUNT",
+              help="Compare only the INDEX-th of COUNT disjoint shards of \
+the RST tree pairs and write their partial results to OUTPUTDIR, to be \
+combined with the 'merge' command, which also calculates the bootstrap \
+intervals (only for directories).")
+@click.option("--progress", is_flag=True,
+              help="Show a live progress line with rate, ETA and slowest \
+pairs on stderr (only for directories).")
+@click.option("--timing-log",
+              default="",
+              metavar="TIMINGFILE",
+              help="Write the parse, extract, compare and write durations \
+and the peak distance matrix bytes of each pair to the CSV file TIMINGFILE \
+(only for directories).")
+@click.option("--timeout",
+              default=None,
+              type=click.FloatRange(min=0, min_open=True),
+              metavar="SECONDS",
+              help="Abort the comparison of a single RST tree pair after \
+SECONDS; each pair is then compared in a supervised worker process (only for \
+directories).")
+@click.option("--max-memory",
+              default=None,
+              type=click.IntRange(min=1),
+              metavar="MB",
+              help="Limit the memory (address space) of each worker process \
+to MB megabytes; pairs exceeding it fail (only for directories).")
+@click.option("--checkpoint", is_flag=True,
+              help="Record the results of the pairs in a checkpoint file in \
+OUTPUTDIR while comparing, so that an interrupted run can be continued with \
+'--resume' (only for directories).")
+@click.option("--resume", is_flag=True,
+              help="Continue an interrupted run with the same OUTPUTDIR: \
+pairs recorded in its checkpoint file are not compared again (only for \
+directories).")
+@click.option("--window-size",
+              default=None,
+              type=click.IntRange(min=1),
+              metavar="SEGMENTS",
+              help="Compare long RST trees window by window, each window \
+of at most SEGMENTS segments (cut between top-level spans if possible), \
+using '--jobs' processes (only for files). The total matching distance is \
+the same as without windows, but where several associations are equally \
+good, another one may be chosen, so that the metrics can differ.")
+@click.option("--segments",
+              default=None,
+              callback=parseSegments,
+              metavar="MIN-MAX",
+              help="Compare only the relations inside the segments MIN to \
+MAX, e.g. 100-250 (only for files).")
 def compare(inputpath1: str,
             inputpath2: str,
             output: str,
-            verbose: bool):
+            verbose: bool,
+            max_rows: int,
+            outputFormat: str,
+            bootstrap: int,
+            confidence: float,
+            seed: int,
+            jobs: int,
+            shard: tuple,
+            progress: bool,
+            timing_log: str,
+            timeout: float,
+            max_memory: int,
+            checkpoint: bool,
+            resume: bool,
+            window_size: int,
+            segments: tuple):
     """ Parse two RST-trees (or two sets of RST-tree pairs), \
 from INPUTPATH1 and INPUTPATH2 respectively, compare their annotated \
 relations, and create comparison tables. If INPUTPATH1 and INPUTPATH2 \
 both point to files then both single files will be compared with \
 each other. If INPUTPATH1 and INPUTPATH2 both point to directories \
 then all '.rs3' files in both directories will be compared with each other. \
+Tar or zip archives of '.rs3' files can be used in place of directories. \
 If '-o' is set, then the results will be written to OUTPUTPATH. Otherwise,
-the results will be printed back on the command line. """
-    if isFile(inputpath1) and isFile(inputpath2):
-        compareTwoFiles(inputpath1, inputpath2, output, verbose)
-    elif isDirectory(inputpath1) and isDirectory(inputpath2):
-        compareTwoFolders(inputpath1, inputpath2, output, verbose)
+the results will be printed back on the command line. RST tree pairs whose \
+comparison fails (e.g. invalid files, '--timeout') are skipped and listed \
+in 'Comparison_Errors.csv'. With '--checkpoint', the results of the pairs \
+are recorded in 'Comparison_Checkpoint.jsonl' while comparing, so that an \
+interrupted run can be continued with '--resume'. Long RST trees can be \
+compared window by window with '--window-size', or only within a range of \
+segments with '--segments'. """
+    maxMemory = None if max_memory is None else max_memory * 1024 * 1024
+    if shard is not None and (output == "" or not isRstSet(inputpath1)
+                              or not isRstSet(inputpath2)):
+        logger.error("Error: '--shard' requires two directories (or "
+                     "archives) and '-o'. -> Abort")
+    elif shard is not None and bootstrap > 0:
+        logger.error("Error: '--bootstrap' cannot be applied to a shard, "
+                     "use it with 'merge'. -> Abort")
+    elif (checkpoint or resume) and (output == ""
+                                     or not isRstSet(inputpath1)
+                                     or not isRstSet(inputpath2)):
+        logger.error("Error: '--checkpoint' and '--resume' require two "
+                     "directories (or archives) and '-o'. -> Abort")
+    elif (window_size is not None or segments is not None) \
+            and not (isFile(inputpath1) and isFile(inputpath2)):
+        logger.error("Error: '--window-size' and '--segments' require two "
+                     "files. -> Abort")
+    elif shard is not None:
+        try:
+            compareFolderShard(inputpath1, inputpath2, output, verbose, shard,
+                               buildProgressOutputs(progress, timing_log),
+                               max_rows, outputFormat, jobs, timeout,
+                               maxMemory, checkpoint, resume)
+        except InvalidCheckpointFile as error:
+            logger.error("Error: " + str(error) + " -> Abort")
+    elif isRstSet(inputpath1) and isRstSet(inputpath2):
+        tableSetComparer = TableSetComparer(bootstrap, confidence, seed, jobs)
+        try:
+            compareTwoFolders(inputpath1, inputpath2, output, verbose,
+                              tableSetComparer,
+                              buildProgressOutputs(progress, timing_log),
+                              max_rows, outputFormat, jobs, timeout,
+                              maxMemory, checkpoint, resume)
+        except InvalidCheckpointFile as error:
+            logger.error("Error: " + str(error) + " -> Abort")
+    elif isFile(inputpath1) and isFile(inputpath2):
+        tableComparer = None
+        if window_size is not None:
+            tableComparer = WindowedComparer(window_size, jobs=jobs)
+        compareTwoFiles(inputpath1, inputpath2, output, verbose, max_rows,
+                        outputFormat, tableComparer, segments)
     else:
-        print("Error: INPUTPATH1 and INPUTPATH2 must either both point to files or \
-both to directories. -> Abort")
+        logger.error("Error: INPUTPATH1 and INPUTPATH2 must either both \
+point to files or both to directories. -> Abort")
         pass
 
 
-def compareTwoFiles(rstfile1, rstfile2, outputdir, verbose):
+def compareTwoFiles(rstfile1, rstfile2, outputdir, verbose, maxRows=None,
+                    outputFormat="csv", tableComparer=None, segments=None):
     rstParser1 = RstTreeParser(rstfile1)
     rstParser2 = RstTreeParser(rstfile2)
 
     tableOutputs = []
     if(verbose or outputdir == ""):
-        tableOutputs.append(CompTableCliOutput())
+        tableOutputs.append(CompTableCliOutput(maxRows))
     if outputdir != "":
         checkAndMakeDir(outputdir)
         filename1 = extractFileName(rstfile1)
         filename2 = extractFileName(rstfile2)
-        compfile = "Comparison_" + filename1 + "+" + filename2 + "_Table.csv"
+        compfile = "Comparison_" + filename1 + "+" + filename2 \
+            + "_Table." + outputFormat
         comppath = joinPaths(outputdir, compfile)
-        evalfile = "Comparison_" + filename1 + "+" + filename2 + "_Metrics.csv"
-        evalpath = joinPaths(outputdir, evalfile)
-        tableOutputs.append(CompTableLogger(comppath, evalpath))
-
-    print("\nComparing the following two RST trees:")
-    print("RST tree A: " + rstfile1)
-    print("RST tree B: " + rstfile2)
-    interactor = CompareInteractor(rstParser1, rstParser2, tableOutputs)
+        if outputFormat == "jsonl":
+            tableOutputs.append(CompTableJsonLogger(comppath))
+        else:
+            evalfile = "Comparison_" + filename1 + "+" + filename2 \
+                + "_Metrics.csv"
+            evalpath = joinPaths(outputdir, evalfile)
+            tableOutputs.append(CompTableLogger(comppath, evalpath))
+
+    logger.info("Comparing the following two RST trees:")
+    logger.info("RST tree A: " + rstfile1)
+    logger.info("RST tree B: " + rstfile2)
+    if segments is not None:
+        logger.info("Only segments " + str(segments[0]) + " to "
+                    + str(segments[1]))
+    interactor = CompareInteractor(rstParser1, rstParser2, tableOutputs,
+                                   tableComparer, segments)
     interactor.run()
     return
 
 
-def compareTwoFolders(inputdir1, inputdir2, outputdir, verbose):
-    print("\nComparing the following two RST-Tree sets:")
-    print("RST tree set A: " + inputdir1)
-    print("RST tree set B: " + inputdir2)
+def compareTwoFolders(inputdir1, inputdir2, outputdir, verbose,
+                      tableSetComparer=None, progressOutputs=None,
+                      maxRows=None, outputFormat="csv", jobs=1,
+                      timeout=None, maxMemory=None, checkpoint=False,
+                      resume=False):
+    logger.info("Comparing the following two RST-Tree sets:")
+    logger.info("RST tree set A: " + inputdir1)
+    logger.info("RST tree set B: " + inputdir2)
 
     # prepare input and output classes
     pairTupleList = buildPairTupleList(inputdir1,
                                        inputdir2,
                                        outputdir,
-                                       verbose)
-    tableOutputs = buildEvalTableOutputs(outputdir, verbose)
-
-    print("\nFollowing RST tree pairs have been found and will be compared:")
+                                       verbose,
+                                       maxRows=maxRows,
+                                       outputFormat=outputFormat)
+    tableOutputs = buildEvalTableOutputs(outputdir, verbose, maxRows,
+                                         outputFormat)
+
+    logger.info(str(len(pairTupleList))
+                + " RST tree pairs have been found and will be compared")
     for touple in pairTupleList:
-        print(touple[-1])
+        logger.debug(touple[-1])
+
+    interactor = CompareSetInteractor(pairTupleList,
+                                      tableOutputs,
+                                      tableSetComparer,
+                                      progressOutputs,
+                                      jobs=jobs,
+                                      errorOutputs=buildErrorOutputs(
+                                          outputdir, "Comparison_Errors.csv"),
+                                      timeout=timeout,
+                                      maxMemory=maxMemory,
+                                      checkpoint=buildCheckpoint(
+                                          outputdir,
+                                          "Comparison_Checkpoint.jsonl",
+                                          checkpoint,
+                                          resume,
+                                          describeInputs(inputdir1,
+                                                         inputdir2,
+                                                         pairTupleList)))
+    interactor.run()
 
-    interactor = CompareSetInteractor(pairTupleList, tableOutputs)
+    # the counters only cover comparisons of this process
+    if jobs == 1 and timeout is None and maxMemory is None:
+        logger.info("Distance cache: " + str(defaultDistanceCache.hits)
+                    + " hits, " + str(defaultDistanceCache.misses)
+                    + " misses")
+    return
+
+
+def compareFolderShard(inputdir1, inputdir2, outputdir, verbose, shard,
+                       progressOutputs=None, maxRows=None,
+                       outputFormat="csv", jobs=1, timeout=None,
+                       maxMemory=None, checkpoint=False, resume=False):
+    logger.info("Comparing shard " + str(shard[0]) + "/" + str(shard[1])
+                + " of the following two RST-Tree sets:")
+    logger.info("RST tree set A: " + inputdir1)
+    logger.info("RST tree set B: " + inputdir2)
+
+    checkAndMakeDir(outputdir)
+    pairTupleList = buildPairTupleList(inputdir1,
+                                       inputdir2,
+                                       outputdir,
+                                       verbose,
+                                       shard,
+                                       maxRows,
+                                       outputFormat)
+    shardname = str(shard[0]) + "-of-" + str(shard[1])
+    partialfile = "Comparison_Partial_" + shardname + ".json"
+    tableOutputs = [CompareSetPartialLogger(joinPaths(outputdir, partialfile),
+                                            shard)]
+    if verbose:
+        tableOutputs.append(CompareSetTableCliOutput(maxRows))
+
+    logger.info(str(len(pairTupleList))
+                + " RST tree pairs have been found and will be compared")
+    for touple in pairTupleList:
+        logger.debug(touple[-1])
+
+    interactor = CompareSetInteractor(pairTupleList,
+                                      tableOutputs,
+                                      progressOutputs=progressOutputs,
+                                      keepAgreementCounts=True,
+                                      jobs=jobs,
+                                      errorOutputs=buildErrorOutputs(
+                                          outputdir,
+                                          "Comparison_Errors_" + shardname
+                                          + ".csv"),
+                                      timeout=timeout,
+                                      maxMemory=maxMemory,
+                                      checkpoint=buildCheckpoint(
+                                          outputdir,
+                                          "Comparison_Checkpoint_"
+                                          + shardname + ".jsonl",
+                                          checkpoint,
+                                          resume,
+                                          describeInputs(inputdir1,
+                                                         inputdir2,
+                                                         pairTupleList)))
     interactor.run()
+    return
+
 
+@cli.command('merge', short_help="Merge the partial results of sharded \
+                                  comparisons.")
+@click.argument("PARTIALFILES", nargs=-1, required=True)
+@click.option("--output", "-o",
+              default="",
+              metavar="OUTPUTDIR",
+              help="Write the result files to the directory OUTPUTDIR.")
+@click.option('--verbose', '-v', is_flag=True,
+              help="Print results on command line")
+@tableOptions
+@evaluationOptions()
+def merge(partialfiles: tuple,
+          output: str,
+          verbose: bool,
+          max_rows: int,
+          outputFormat: str,
+          bootstrap: int,
+          confidence: float,
+          seed: int,
+          jobs: int):
+    """ Merge the PARTIALFILES written by 'compare --shard' into the \
+overall evaluation of the whole RST tree pair set. The result equals the \
+one of a single unsharded 'compare' run. If '-o' is set, then the results \
+will be written to OUTPUTDIR. Otherwise, the results will be printed back \
+on the command line. """
+    logger.info("Merging the partial results of sharded comparisons:")
+    try:
+        partialInputs = []
+        for path in partialfiles:
+            logger.debug(path)
+            partialInputs.append(PartialResultsReader(path))
+
+        tableSetComparer = TableSetComparer(bootstrap, confidence, seed,
+                                            jobs)
+        tableOutputs = buildEvalTableOutputs(output, verbose, max_rows,
+                                             outputFormat)
+        interactor = MergeInteractor(partialInputs,
+                                     tableOutputs,
+                                     tableSetComparer)
+        interactor.run()
+    except (FileNotFoundError, InvalidPartialResultsFile,
+            ValueError) as error:
+        logger.error("Error: " + str(error) + " -> Abort")
     return
 
 
-def buildPairTupleList(inputdir1, inputdir2, outputdir, verbose):
-    pairTupleList = []
-    for file in listDirectory(inputdir1):
-        if file.endswith(".rs3") and file in listDirectory(inputdir2):
+@cli.command('compare-many', short_help="Compare one reference set of RST \
+                                         trees with many candidate sets.")
+@click.argument("REFERENCEDIR")
+@click.argument("CANDIDATEDIRS", nargs=-1, required=True)
+@click.option("--output", "-o",
+              default="",
+              metavar="OUTPUTDIR",
+              help="Write the result files to the directory OUTPUTDIR.")
+@click.option('--verbose', '-v', is_flag=True,
+              help="Print results on command line")
+@tableOptions
+@evaluationOptions(jobsHelp="Number of candidate sets compared in "
+                            "parallel.")
+def compareMany(referencedir: str,
+                candidatedirs: tuple,
+                output: str,
+                verbose: bool,
+                max_rows: int,
+                outputFormat: str,
+                bootstrap: int,
+                confidence: float,
+                seed: int,
+                jobs: int):
+    """ Compare the '.rs3' files in REFERENCEDIR with the equally named \
+files in each of the CANDIDATEDIRS (directories or tar/zip archives). The \
+reference set is parsed and indexed \
+only once and reused for all candidate sets. If '-o' is set, then the \
+results of each candidate set will be written to a sub-directory of \
+OUTPUTDIR, named like the candidate directory. Otherwise, the results \
+will be printed back on the command line. """
+    for path in (referencedir,) + candidatedirs:
+        if not isRstSet(path):
+            logger.error("Error: " + path + " is neither a directory nor an "
+                         "archive. -> Abort")
+            return
+
+    logger.info("Comparing the reference RST-tree set: " + referencedir)
+    referenceSet = openRstSet(referencedir)
+    referenceInputs = {}
+    for file in referenceSet.listFiles():
+        referenceInputs[extractFileName(file)] = referenceSet.createInput(file)
+
+    candidateSetList = []
+    for setName, candidatedir in zip(buildSetNames(candidatedirs),
+                                     candidatedirs):
+        logger.info("With candidate RST-tree set: " + candidatedir)
+        setOutputdir = joinPaths(output, setName) if output != "" else ""
+        candidateSet = openRstSet(candidatedir)
+        candidateInputs = {}
+        for file in candidateSet.listFiles():
             filename = extractFileName(file)
-            rstParser1 = RstTreeParser(joinPaths(inputdir1, file))
-            rstParser2 = RstTreeParser(joinPaths(inputdir2, file))
-            if outputdir != "":
-                compfile = "Comparison_" + filename + "_Table.csv"
-                comppath = joinPaths(outputdir, compfile)
-                compTableOutput = CompTableLogger(comppath)
-            elif verbose:
-                compTableOutput = CompTableCliOutput()
-            else:
-                compTableOutput = CompTableDummyOutput()
-
-            pairTuple = (rstParser1, rstParser2, compTableOutput, filename)
-            pairTupleList.append(pairTuple)
-    return sorted(pairTupleList, key=lambda tuple: tuple[-1])
-
-
-def buildEvalTableOutputs(outputdir: str, verbose: bool):
+            if filename in referenceInputs:
+                rstParser = candidateSet.createInput(file)
+                compTableOutput = buildCompTableOutput(setOutputdir,
+                                                       filename,
+                                                       verbose,
+                                                       max_rows,
+                                                       outputFormat)
+                candidateInputs[filename] = (rstParser, compTableOutput)
+        tableOutputs = buildEvalTableOutputs(setOutputdir, verbose,
+                                             max_rows, outputFormat)
+        candidateSetList.append((candidateInputs, tableOutputs, setName))
+
+    # candidate sets are already compared in parallel
+    tableSetComparer = TableSetComparer(bootstrap, confidence, seed, jobs=1)
+    interactor = CompareManySetsInteractor(referenceInputs,
+                                           candidateSetList,
+                                           jobs,
+                                           tableSetComparer)
+    interactor.run()
+    return
+
+
+def buildSetNames(dirs: tuple) -> list:
+    """ Unique names of directories (or archives), based on their base
+        names without archive extensions """
+    from os.path import basename, normpath
+    names = []
+    for path in dirs:
+        name = stripArchiveExtension(basename(normpath(path)))
+        uniqueName = name
+        suffix = 2
+        while uniqueName in names:
+            uniqueName = name + "_" + str(suffix)
+            suffix += 1
+        names.append(uniqueName)
+    return names
+
+
+def buildPairTupleList(inputdir1, inputdir2, outputdir, verbose, shard=None,
+                       maxRows=None, outputFormat="csv"):
+    """ Pairs of equally named '.rs3' files, sorted by name. If shard is
+        a tuple (index, count), only every count-th pair starting with the
+        index-th one is taken, and only those files are read. """
+    rstSet1 = openRstSet(inputdir1)
+    rstSet2 = openRstSet(inputdir2)
+    files2 = set(rstSet2.listFiles())
+    files = sorted((file for file in rstSet1.listFiles() if file in files2),
+                   key=extractFileName)
+    if shard is not None:
+        index, count = shard
+        files = files[index-1::count]
+
+    pairTupleList = []
+    for file in files:
+        filename = extractFileName(file)
+        rstParser1 = rstSet1.createInput(file)
+        rstParser2 = rstSet2.createInput(file)
+        compTableOutput = buildCompTableOutput(outputdir,
+                                               filename,
+                                               verbose,
+                                               maxRows,
+                                               outputFormat)
+
+        pairTuple = (rstParser1, rstParser2, compTableOutput, filename)
+        pairTupleList.append(pairTuple)
+    return pairTupleList
+
+
+def buildCompTableOutput(outputdir: str, filename: str, verbose: bool,
+                         maxRows: int = None, outputFormat: str = "csv"):
+    """ Output of the comparison table of a pair. None if the table is not
+        needed, so that only the metrics of the pair are calculated. """
+    if outputdir != "":
+        compfile = "Comparison_" + filename + "_Table." + outputFormat
+        comppath = joinPaths(outputdir, compfile)
+        if outputFormat == "jsonl":
+            return CompTableJsonLogger(comppath)
+        return CompTableLogger(comppath)
+    elif verbose:
+        return CompTableCliOutput(maxRows)
+    else:
+        return None
+
+
+def buildProgressOutputs(progress: bool, timingLog: str):
+    progressOutputs = []
+    if progress:
+        progressOutputs.append(ProgressCliOutput())
+    if timingLog != "":
+        progressOutputs.append(TimingLogger(timingLog))
+    return progressOutputs
+
+
+def buildCheckpoint(outputdir: str, checkpointfile: str, checkpoint: bool,
+                    resume: bool, inputs: dict = None):
+    """ Checkpoint of a comparison run, only if it is requested by
+        '--checkpoint' or '--resume' """
+    if outputdir == "" or not (checkpoint or resume):
+        return None
+    checkAndMakeDir(outputdir)
+    return CheckpointLog(joinPaths(outputdir, checkpointfile), resume, inputs)
+
+
+def describeInputs(inputpath1: str, inputpath2: str, pairTupleList: list):
+    """ Inputs of a comparison run as recorded in its checkpoint: the
+        absolute input paths and the names of the RST-tree pairs """
+    from os.path import abspath
+    return {"paths": [abspath(inputpath1), abspath(inputpath2)],
+            "pairs": [pairTuple[3] for pairTuple in pairTupleList]}
+
+
+def buildErrorOutputs(outputdir: str, errorfile: str):
+    errorOutputs = [PairErrorCliOutput()]
+    if outputdir != "":
+        errorOutputs.append(PairErrorLogger(joinPaths(outputdir, errorfile)))
+    return errorOutputs
+
+
+def buildEvalTableOutputs(outputdir: str, verbose: bool, maxRows=None,
+                          outputFormat="csv"):
     tableOutputs = []
     if(verbose or outputdir == ""):
-        tableOutputs.append(CompareSetTableCliOutput())
+        tableOutputs.append(CompareSetTableCliOutput(maxRows))
     if outputdir != "":
         checkAndMakeDir(outputdir)
-        outputfile = joinPaths(outputdir, "Comparison_OverallMetrics.csv")
-        tableOutputs.append(CompareSetTableLogger(outputfile))
+        outputfile = joinPaths(outputdir,
+                               "Comparison_OverallMetrics." + outputFormat)
+        if outputFormat == "jsonl":
+            tableOutputs.append(CompareSetTableJsonLogger(outputfile))
+        else:
+            tableOutputs.append(CompareSetTableLogger(outputfile))
     return tableOutputs
 
 
@@ -189,6 +731,14 @@ def isDirectory(path: str):
     return isdir(path)
 
 
+def stripArchiveExtension(name: str):
+    """ Removes extensions like '.zip', '.tar' or '.tar.gz' from name """
+    for extension in ARCHIVE_EXTENSIONS:
+        if name.endswith(extension) and len(name) > len(extension):
+            return name[:-len(extension)]
+    return name
+
+
 def extractFileName(path: str):
     """ Extracts the file name of a file path """
     from os.path import basename, splitext
@@ -199,7 +749,7 @@ def checkAndMakeDir(path: str):
     from os.path import exists
     from os import makedirs
     if not exists(path):
-        print("Output directory does not exist. Create: " + path)
+        logger.info("Output directory does not exist. Create: " + path)
         makedirs(path)
 
 
@@ -8,6 +8,9 @@ from abc import ABC, abstractmethod
 from rsttace.core import RstTree, RelTable, ComparisonTable, CompareSetTable
 from rsttace.core import TableGenerator, TableComparer, TableSetComparer
 
+# Steps of a comparison, whose durations are reported to IProgressOutput
+TIMING_STEPS = ["parse", "extract", "compare", "write"]
+
 # Interface definitions ######################################################
 
 
@@ -16,6 +19,23 @@ class IRstInput(ABC):
     def read(self) -> RstTree:
         pass
 
+    def size(self) -> int:
+        """ Cheap estimate of the size of the RST tree (number of segments)
+            without parsing it, 0 if unknown """
+        return 0
+
+
+class IPartialResultsInput(ABC):
+    @abstractmethod
+    def read(self) -> list:
+        """ List of tuples (metrics row, AgreementCounts) per comparison """
+        pass
+
+    @abstractmethod
+    def shard(self) -> tuple:
+        """ Tuple (index, count) of the shard of the results """
+        pass
+
 
 class IRelTableOutput(ABC):
     @abstractmethod
@@ -33,3 +53,56 @@ class ICompareSetTableOutput(ABC):
     @abstractmethod
     def write(self, compSetTable: CompareSetTable):
         pass
+
+
+class IPairMetricsOutput(ABC):
+    @abstractmethod
+    def writePair(self, row: list):
+        """ row: metrics of one RST-tree pair (see 'createMetricsRow'),
+            written as soon as the pair is evaluated """
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+
+class IProgressOutput(ABC):
+    @abstractmethod
+    def start(self, total: int):
+        pass
+
+    @abstractmethod
+    def update(self, name: str, timings: dict, matrixBytes: int = 0):
+        """ timings: dict with TIMING_STEPS -> duration in seconds
+            matrixBytes: peak bytes of the distance matrices of the pair """
+        pass
+
+    @abstractmethod
+    def finish(self):
+        pass
+
+
+class IPairErrorOutput(ABC):
+    @abstractmethod
+    def write(self, errors: list):
+        """ errors: list of tuples (name, error message) of the RST-tree
+            pairs whose comparison failed """
+        pass
+
+
+class ICheckpoint(ABC):
+    @abstractmethod
+    def read(self) -> list:
+        """ List of tuples (metrics row, AgreementCounts) of the comparisons
+            recorded so far """
+        pass
+
+    @abstractmethod
+    def write(self, row: list, agreementCounts):
+        """ Records the result of one comparison durably """
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
@@ -1,5 +1,19 @@
-from rsttace.controller import IRstInput
+from rsttace.controller import IRstInput, ICheckpoint, IPairMetricsOutput
 from rsttace.core import TableGenerator, TableComparer, TableSetComparer
+from rsttace.core import RelIndex, CompareSetTable, MetricsAccumulator
+from rsttace.core import SharedRelTables
+from rsttace.core.windowedcomparer import selectSegments
+from rsttace.core.comparesettable import createMetricsRow
+from rsttace.controller.scheduler import estimatePairCost, createBatches
+from rsttace.controller.supervisor import SupervisedWorkers, formatError
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from time import perf_counter
+import logging
+
+
+logger = logging.getLogger(__name__)
 
 
 class AnalyseInteractor:
@@ -19,20 +33,31 @@ class AnalyseInteractor:
 
 
 class CompareInteractor:
+    """ Compares two RST-trees by the tableComparer (e.g. a
+        'WindowedComparer'). If segments (minID, maxID) are given, then only
+        the relations inside those segments are compared. """
     def __init__(self,
                  rstInput1: IRstInput,
                  rstInput2: IRstInput,
-                 tableOutputs: list):
+                 tableOutputs: list,
+                 tableComparer: TableComparer = None,
+                 segments: tuple = None):
         self.rstInput1 = rstInput1
         self.rstInput2 = rstInput2
-        self.tableComparer = TableComparer()
+        if tableComparer is None:
+            tableComparer = TableComparer()
+        self.tableComparer = tableComparer
         self.tableOutputs = tableOutputs
+        self.segments = segments
 
     def run(self):
         analyse1 = AnalyseInteractor(self.rstInput1, [])
         analyse2 = AnalyseInteractor(self.rstInput2, [])
         relTable1 = analyse1.run()
         relTable2 = analyse2.run()
+        if self.segments is not None:
+            relTable1 = selectSegments(relTable1, *self.segments)
+            relTable2 = selectSegments(relTable2, *self.segments)
         compTable = self.tableComparer.run(relTable1, relTable2)
         for output in self.tableOutputs:
             output.write(compTable)
@@ -40,23 +65,447 @@ class CompareInteractor:
 
 
 class CompareSetInteractor:
+    """ Compares each RST-tree pair of pairTupleList and evaluates all
+        comparisons. Pairs with None as IComparisonTableOutput are only
+        evaluated (see 'TableComparer.runMetrics'), without building their
+        comparison tables. The durations of the steps of each comparison are
+        reported to the progressOutputs (see IProgressOutput).
+        Each finished comparison only contributes its metrics to a
+        'MetricsAccumulator' and is released immediately, so that memory
+        does not grow with the comparisons. The AgreementCounts of each
+        comparison are only kept if keepAgreementCounts is set (as needed
+        e.g. by 'CompareSetPartialLogger'). The stats of the comparisons
+        finished so far are available at any time via 'currentStats'.
+        With jobs > 1, the pairs are compared by that many processes: the
+        most expensive pairs first (see 'createBatches'), cheap pairs in
+        batches. The comparison tables are written by the processes, the
+        metrics are still evaluated in the order of pairTupleList.
+        If errorOutputs (see IPairErrorOutput) are given, a failing pair
+        does not abort the run: it is skipped in the evaluation and reported
+        to the errorOutputs (in the order of pairTupleList, available as
+        'errors' afterwards). With a timeout (seconds per pair) or maxMemory
+        (bytes per process), each pair is compared in a supervised worker
+        process (see 'SupervisedWorkers'), which is replaced if it exceeds
+        them.
+        The result of each finished comparison is recorded durably in the
+        checkpoint (see ICheckpoint), if given. Pairs whose results are
+        already recorded in it (by an earlier, interrupted run) are not
+        compared again, their recorded metrics are evaluated instead.
+        tableOutputs which are also IPairMetricsOutputs get the metrics of
+        each pair as soon as it is evaluated. """
     def __init__(self,
                  pairTupleList: list,
-                 tableOutputs: list):
+                 tableOutputs: list,
+                 tableSetComparer: TableSetComparer = None,
+                 progressOutputs: list = None,
+                 keepAgreementCounts: bool = False,
+                 jobs: int = 1,
+                 errorOutputs: list = None,
+                 timeout: float = None,
+                 maxMemory: int = None,
+                 checkpoint: ICheckpoint = None):
         self.pairTupleList = pairTupleList
         self.tableOutputs = tableOutputs
-        self.tableSetComparer = TableSetComparer()
+        if tableSetComparer is None:
+            tableSetComparer = TableSetComparer()
+        self.tableSetComparer = tableSetComparer
+        if progressOutputs is None:
+            progressOutputs = []
+        self.progressOutputs = progressOutputs
+        self.keepAgreementCounts = keepAgreementCounts
+        self.jobs = jobs
+        self.errorOutputs = errorOutputs
+        self.timeout = timeout
+        self.maxMemory = maxMemory
+        self.checkpoint = checkpoint
+        self.accumulator = MetricsAccumulator(keepAgreementCounts)
+        self.errors = []
+        # state of a run: error messages and results of the finished pairs
+        # by index, the index of the next pair to accumulate and the indexes
+        # of the pairs to compare
+        self.failed = {}
+        self.finished = {}
+        self.nextIndex = 0
+        self.pending = []
+
+    def currentStats(self):
+        """ DataFrame with mean, std, min and max of each metric over the
+            comparisons finished so far """
+        return self.accumulator.runningStats.toDataFrame()
 
     def run(self):
-        compTables = []
-        for rstInput1, rstInput2, compTableOut, name in self.pairTupleList:
-            print("\nCompare RST-tree pair: " + name)
-            compare = CompareInteractor(rstInput1, rstInput2, [compTableOut])
-            compTable = compare.run()
-            compTable.name = name
-            compTables.append(compTable)
-        print("\nCalculate overall evaluation of all comparisons") 
-        evalTable = self.tableSetComparer.run(compTables)
+        self.accumulator = MetricsAccumulator(self.keepAgreementCounts)
+        self.failed = {}
+        self.finished = self.__readCheckpoint()
+        self.nextIndex = 0
+        self.pending = [index for index in range(len(self.pairTupleList))
+                        if index not in self.finished]
+        try:
+            for progress in self.progressOutputs:
+                progress.start(len(self.pending))
+            if self.timeout is not None or self.maxMemory is not None:
+                self.__runSupervised()
+            elif self.jobs > 1 and len(self.pending) > 1:
+                self.__runParallel()
+            else:
+                tableGenerator = TableGenerator()
+                tableComparer = TableComparer()
+                for index in self.pending:
+                    self.__addResult(*comparePairResult(
+                        index, self.pairTupleList[index], tableGenerator,
+                        tableComparer, self.isolatesFaults()))
+            self.__flushFinished()
+        finally:
+            for progress in self.progressOutputs:
+                progress.finish()
+            for output in self.__pairOutputs():
+                output.close()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+
+        self.errors = [(self.pairTupleList[index][3], self.failed[index])
+                       for index in sorted(self.failed)]
+        for output in self.errorOutputs or []:
+            output.write(self.errors)
+        logger.info("Calculate overall evaluation of all comparisons")
+        evalTable = self.tableSetComparer.runOnAccumulator(self.accumulator)
         for output in self.tableOutputs:
             output.write(evalTable)
         return evalTable
+
+    def isolatesFaults(self) -> bool:
+        return self.errorOutputs is not None
+
+    def __readCheckpoint(self) -> dict:
+        """ Results of the pairs recorded in the checkpoint, by index """
+        if self.checkpoint is None:
+            return {}
+        recorded = {row[0]: (row, counts)
+                    for row, counts in self.checkpoint.read()}
+        finished = {index: recorded[pairTuple[3]]
+                    for index, pairTuple in enumerate(self.pairTupleList)
+                    if pairTuple[3] in recorded}
+        if finished:
+            logger.info(str(len(finished)) + " RST-tree pairs are recorded "
+                        "in the checkpoint and will not be compared again")
+        return finished
+
+    def __runParallel(self):
+        costs = self.__estimateCosts()
+        batches = createBatches(costs, self.jobs)
+        logger.debug("Compare " + str(len(costs)) + " RST-tree pairs in "
+                     + str(len(batches)) + " batches")
+
+        with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            futures = [pool.submit(compareBatch,
+                                   [self.__createTask(position)
+                                    for position in batch],
+                                   self.isolatesFaults())
+                       for batch in batches]
+            for future in as_completed(futures):
+                for result in future.result():
+                    self.__addResult(*result)
+
+    def __runSupervised(self):
+        # each pair is a task of its own, so that a timeout only hits it
+        costs = self.__estimateCosts()
+        order = sorted(range(len(costs)),
+                       key=lambda position: (-costs[position], position))
+        workers = SupervisedWorkers(compareIsolatedPair, self.jobs,
+                                    self.timeout, self.maxMemory)
+        for (index, _), result, error in workers.run(
+                [self.__createTask(position) for position in order]):
+            if error is not None:
+                result = (index, None, None, {}, 0, error)
+            self.__addResult(*result)
+
+    def __createTask(self, position: int) -> tuple:
+        """ Tuple (index, pairTuple) of the position-th pending pair """
+        index = self.pending[position]
+        return (index, self.pairTupleList[index])
+
+    def __estimateCosts(self) -> list:
+        """ Costs of the pending pairs """
+        return [estimatePairCost(*self.pairTupleList[index][:2])
+                for index in self.pending]
+
+    def __addResult(self, index: int, row: list, counts, timings: dict,
+                    matrixBytes: int, error: str):
+        """ Reports the result of a pair, the metrics are accumulated in
+            order, as soon as all previous pairs are finished """
+        name = self.pairTupleList[index][3]
+        if error is not None:
+            if not self.isolatesFaults():
+                raise RuntimeError("Comparison of RST-tree pair failed: "
+                                   + name + ": " + error)
+            logger.info("Comparison of RST-tree pair failed: " + name
+                        + ": " + error)
+            self.failed[index] = error
+        elif self.checkpoint is not None:
+            self.checkpoint.write(row, counts)
+
+        self.finished[index] = None if error is not None else (row, counts)
+        self.__flushFinished()
+        for progress in self.progressOutputs:
+            progress.update(name, timings, matrixBytes)
+
+    def __flushFinished(self):
+        """ Accumulates the finished pairs up to the next unfinished one """
+        while self.nextIndex in self.finished:
+            result = self.finished.pop(self.nextIndex)
+            if result is not None:
+                self.accumulator.addMetrics(*result)
+                for output in self.__pairOutputs():
+                    output.writePair(result[0])
+            self.nextIndex += 1
+
+    def __pairOutputs(self) -> list:
+        return [output for output in self.tableOutputs
+                if isinstance(output, IPairMetricsOutput)]
+
+
+class MergeInteractor:
+    """ Merges the partial results of sharded comparison runs into the
+        overall evaluation of the whole RST tree pair set. The comparisons
+        are ordered by name, so that the result equals the one of a single
+        unsharded run. 'ValueError' is raised for duplicate pair names and
+        unless the partial results are those of the shards 1 to N of the
+        same N, each exactly once. """
+    def __init__(self,
+                 partialInputs: list,
+                 tableOutputs: list,
+                 tableSetComparer: TableSetComparer = None):
+        self.partialInputs = partialInputs
+        self.tableOutputs = tableOutputs
+        if tableSetComparer is None:
+            tableSetComparer = TableSetComparer()
+        self.tableSetComparer = tableSetComparer
+
+    def run(self):
+        self.__checkShards()
+        results = {}
+        for partialInput in self.partialInputs:
+            for row, counts in partialInput.read():
+                name = row[0]
+                if name in results:
+                    raise ValueError("RST-tree pair contained in more than "
+                                     "one partial result: " + name)
+                results[name] = (row, counts)
+        names = sorted(results)
+        rows = [results[name][0] for name in names]
+        agreementCountsList = [results[name][1] for name in names]
+        logger.info("Calculate overall evaluation of all comparisons")
+        evalTable = self.tableSetComparer.runOnMetrics(rows,
+                                                       agreementCountsList)
+        for output in self.tableOutputs:
+            output.write(evalTable)
+        return evalTable
+
+    def __checkShards(self):
+        shards = [partialInput.shard() for partialInput in self.partialInputs]
+        counts = sorted(set(count for _, count in shards))
+        if not counts:
+            return
+        if len(counts) > 1:
+            raise ValueError("Partial results of different numbers of "
+                             "shards: " + ", ".join(map(str, counts)))
+        indexes = [index for index, _ in shards]
+        duplicates = sorted(set(index for index in indexes
+                                if indexes.count(index) > 1))
+        if duplicates:
+            raise ValueError("Shards contained more than once: "
+                             + ", ".join(map(str, duplicates)))
+        missing = sorted(set(range(1, counts[0] + 1)) - set(indexes))
+        if missing:
+            raise ValueError("Missing shards of " + str(counts[0]) + ": "
+                             + ", ".join(map(str, missing)))
+
+
+class CompareManySetsInteractor:
+    """ Compares one reference set of RST-trees with many candidate sets.
+        The reference trees are parsed and indexed only once, the candidate
+        sets are streamed through that index ('jobs' sets in parallel).
+        Worker processes get the reference relations tables via shared
+        memory (see 'SharedRelTables') and index them on first use.
+        referenceInputs: dict with name -> IRstInput
+        candidateSetList: list of tuples (candidateInputs, tableOutputs,
+                          name), with candidateInputs being a dict with
+                          name -> (IRstInput, IComparisonTableOutput), the
+                          output can be None (see CompareSetInteractor) """
+    def __init__(self,
+                 referenceInputs: dict,
+                 candidateSetList: list,
+                 jobs: int = 1,
+                 tableSetComparer: TableSetComparer = None):
+        self.referenceInputs = referenceInputs
+        self.candidateSetList = candidateSetList
+        self.jobs = jobs
+        if tableSetComparer is None:
+            tableSetComparer = TableSetComparer()
+        self.tableSetComparer = tableSetComparer
+
+    def run(self) -> list:
+        logger.info("Parse reference RST-tree set")
+        referenceTables = {}
+        for name, rstInput in self.referenceInputs.items():
+            referenceTables[name] = AnalyseInteractor(rstInput, []).run()
+
+        candidateInputsList = [candidateInputs for candidateInputs, _, _
+                               in self.candidateSetList]
+        compareSet = partial(compareCandidateSet,
+                             tableSetComparer=self.tableSetComparer)
+        if self.jobs > 1:
+            sharedTables = SharedRelTables.publish(referenceTables)
+            try:
+                with ProcessPoolExecutor(
+                        max_workers=self.jobs,
+                        initializer=attachReferenceTables,
+                        initargs=(sharedTables.handle,)) as pool:
+                    evalTables = list(pool.map(compareSet,
+                                               candidateInputsList))
+            finally:
+                sharedTables.close()
+                sharedTables.unlink()
+        else:
+            initReferenceTables(referenceTables)
+            evalTables = [compareSet(candidateInputs)
+                          for candidateInputs in candidateInputsList]
+
+        for evalTable, (_, tableOutputs, name) in zip(evalTables,
+                                                      self.candidateSetList):
+            logger.info("Overall evaluation of candidate set: " + name)
+            for output in tableOutputs:
+                output.write(evalTable)
+        return evalTables
+
+
+class StepTimer:
+    """ Measures the durations of consecutive steps in seconds """
+    def __init__(self):
+        self.timings = {}
+        self.last = perf_counter()
+
+    def stop(self, step: str):
+        """ Ends the current step, the next step starts immediately """
+        now = perf_counter()
+        self.timings[step] = now - self.last
+        self.last = now
+
+
+def comparePairTuple(pairTuple: tuple,
+                     tableGenerator: TableGenerator,
+                     tableComparer: TableComparer) -> tuple:
+    """ Compares and writes a pair (rstInput1, rstInput2, compTableOut,
+        name). Returns its ComparisonTable (or ComparisonMetrics), the
+        durations of its steps and the peak bytes of its distance matrix. """
+    rstInput1, rstInput2, compTableOut, name = pairTuple
+    logger.debug("Compare RST-tree pair: " + name)
+    timer = StepTimer()
+    rstTree1 = rstInput1.read()
+    rstTree2 = rstInput2.read()
+    timer.stop("parse")
+    relTable1 = tableGenerator.run(rstTree1)
+    relTable2 = tableGenerator.run(rstTree2)
+    timer.stop("extract")
+    compTable = comparePair(tableComparer, RelIndex(relTable1),
+                            RelIndex(relTable2), compTableOut, name)
+    timer.stop("compare")
+    if compTableOut is not None:
+        compTableOut.write(compTable)
+    timer.stop("write")
+    return (compTable, timer.timings, tableComparer.peakMatrixBytes)
+
+
+def comparePairResult(index: int,
+                      pairTuple: tuple,
+                      tableGenerator: TableGenerator,
+                      tableComparer: TableComparer,
+                      isolateFaults: bool = False) -> tuple:
+    """ Compares a pair (see 'comparePairTuple'). Returns a tuple (index,
+        metrics row, AgreementCounts, timings, matrix bytes, error), with
+        error None. If isolateFaults is set, a failing comparison returns
+        its error message (row and AgreementCounts None) instead of
+        raising it. """
+    try:
+        compTable, timings, matrixBytes = \
+            comparePairTuple(pairTuple, tableGenerator, tableComparer)
+    except Exception as error:
+        if not isolateFaults:
+            raise
+        return (index, None, None, {}, 0, formatError(error))
+    row = createMetricsRow(compTable.name, compTable.matchingRatios,
+                           compTable.cohensKappas)
+    return (index, row, compTable.agreementCounts, timings, matrixBytes,
+            None)
+
+
+def compareBatch(batch: list, isolateFaults: bool = False) -> list:
+    """ Compares a batch of tuples (index, pairTuple) in a worker process,
+        returns the results of 'comparePairResult' """
+    tableGenerator = TableGenerator()
+    tableComparer = TableComparer()
+    return [comparePairResult(index, pairTuple, tableGenerator,
+                              tableComparer, isolateFaults)
+            for index, pairTuple in batch]
+
+
+def compareIsolatedPair(task: tuple) -> tuple:
+    """ Compares a tuple (index, pairTuple) in a supervised worker """
+    index, pairTuple = task
+    return comparePairResult(index, pairTuple, TableGenerator(),
+                             TableComparer(), isolateFaults=True)
+
+
+def comparePair(tableComparer: TableComparer,
+                relIndex1: RelIndex,
+                relIndex2: RelIndex,
+                compTableOut,
+                name: str):
+    """ ComparisonTable of both relation indexes, or only their
+        ComparisonMetrics if there is no output (compTableOut is None) """
+    if compTableOut is None:
+        compTable = tableComparer.runIndexedMetrics(relIndex1, relIndex2)
+    else:
+        compTable = tableComparer.runIndexed(relIndex1, relIndex2)
+    compTable.name = name
+    return compTable
+
+
+# Reference relations tables of the current (worker) process: a dict or
+# 'SharedRelTables' (name -> RelTable), indexed on first use
+referenceTables = {}
+referenceIndexes = {}
+
+
+def initReferenceTables(tables):
+    global referenceTables, referenceIndexes
+    referenceTables = tables
+    referenceIndexes = {}
+
+
+def attachReferenceTables(handle: tuple):
+    initReferenceTables(SharedRelTables.attach(handle))
+
+
+def getReferenceIndex(name: str) -> RelIndex:
+    if name not in referenceIndexes:
+        referenceIndexes[name] = RelIndex(referenceTables.get(name))
+    return referenceIndexes[name]
+
+
+def compareCandidateSet(candidateInputs: dict,
+                        tableSetComparer: TableSetComparer) -> CompareSetTable:
+    """ Compares a candidate set with the reference indexes of the current
+        process, candidates without reference counterpart are skipped """
+    tableComparer = TableComparer()
+    accumulator = MetricsAccumulator()
+    for name in sorted(candidateInputs):
+        if name in referenceTables:
+            rstInput, compTableOut = candidateInputs[name]
+            relTable = AnalyseInteractor(rstInput, []).run()
+            compTable = comparePair(tableComparer, getReferenceIndex(name),
+                                    RelIndex(relTable), compTableOut, name)
+            if compTableOut is not None:
+                compTableOut.write(compTable)
+            accumulator.add(compTable)
+    return tableSetComparer.runOnAccumulator(accumulator)
@@ -0,0 +1,39 @@
+from rsttace.controller import IRstInput
+
+# Pairs are grouped into about this many batches per worker process, so that
+# the workers stay balanced while the batches amortize inter-process calls
+BATCHES_PER_JOB = 8
+
+# Maximal number of pairs per batch
+MAX_BATCH_SIZE = 64
+
+
+def estimatePairCost(rstInput1: IRstInput, rstInput2: IRstInput) -> int:
+    """ The distance matrix of a pair grows with the product of the sizes
+        of both trees, inputs of unknown size count as size 1 """
+    return max(rstInput1.size(), 1) * max(rstInput2.size(), 1)
+
+
+def createBatches(costs: list, jobs: int) -> list:
+    """ Groups the pair indexes of costs into batches, ordered by their cost
+        (largest first): pairs are batched until the batch reaches the
+        target cost sum(costs) // (jobs * BATCHES_PER_JOB) (at least 1) or
+        MAX_BATCH_SIZE pairs, so that pairs of at least the target cost get
+        a batch of their own. Ties are ordered by index, so that the batches
+        only depend on the costs. """
+    order = sorted(range(len(costs)), key=lambda index: (-costs[index], index))
+    batchCost = max(1, sum(costs) // max(1, jobs * BATCHES_PER_JOB))
+
+    batches = []
+    batch = []
+    cost = 0
+    for index in order:
+        batch.append(index)
+        cost += costs[index]
+        if cost >= batchCost or len(batch) >= MAX_BATCH_SIZE:
+            batches.append(batch)
+            batch = []
+            cost = 0
+    if batch:
+        batches.append(batch)
+    return batches
@@ -0,0 +1,152 @@
+from collections import deque
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+from time import monotonic
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for workers to stop before they are terminated
+STOP_TIMEOUT = 5
+
+
+class SupervisedWorkers:
+    """ Runs function(task) for each task in 'jobs' worker processes. Each
+        call may take at most 'timeout' seconds and each worker may use at
+        most 'maxMemory' bytes of address space (where supported by the
+        platform). Workers which exceed the timeout, or die, are replaced by
+        new ones; their task is reported as failed and all other tasks are
+        still run. function and the tasks have to be picklable. """
+    def __init__(self, function, jobs: int = 1, timeout: float = None,
+                 maxMemory: int = None):
+        self.function = function
+        self.jobs = jobs
+        self.timeout = timeout
+        self.maxMemory = maxMemory
+
+    def run(self, tasks):
+        """ Yields a tuple (task, result, error) per task, in the order of
+            completion: error is None on success, otherwise result is None
+            and error the message of the failure """
+        tasks = deque(tasks)
+        workers = [self.__startWorker()
+                   for _ in range(min(self.jobs, len(tasks)))]
+        running = {}  # worker -> (task, deadline)
+        try:
+            while tasks or running:
+                for worker in workers:
+                    if worker not in running and tasks:
+                        task = tasks.popleft()
+                        worker.connection.send(task)
+                        running[worker] = (task, self.__createDeadline())
+
+                for worker, result, error in self.__waitForResults(running):
+                    task, _ = running.pop(worker)
+                    if not worker.process.is_alive():
+                        workers[workers.index(worker)] = \
+                            self.__restartWorker(worker)
+                    yield (task, result, error)
+        finally:
+            for worker in workers:
+                stopWorker(worker)
+
+    def __waitForResults(self, running: dict) -> list:
+        """ Waits for the next finished (or timed out) tasks, returns a
+            tuple (worker, result, error) for each of them """
+        deadlines = [deadline for _, deadline in running.values()
+                     if deadline is not None]
+        timeout = None
+        if deadlines:
+            timeout = max(0, min(deadlines) - monotonic())
+        ready = wait([worker.connection for worker in running], timeout)
+
+        results = []
+        for worker, (task, deadline) in running.items():
+            if worker.connection in ready:
+                try:
+                    succeeded, value = worker.connection.recv()
+                except (EOFError, OSError):
+                    worker.process.join(STOP_TIMEOUT)
+                    results.append((worker, None,
+                                    "Worker process died (exit code "
+                                    + str(worker.process.exitcode) + ")"))
+                    continue
+                if succeeded:
+                    results.append((worker, value, None))
+                else:
+                    results.append((worker, None, value))
+            elif deadline is not None and monotonic() >= deadline:
+                worker.process.terminate()
+                worker.process.join()
+                results.append((worker, None,
+                                "Timeout after {:g} seconds"
+                                .format(self.timeout)))
+        return results
+
+    def __createDeadline(self):
+        if self.timeout is None:
+            return None
+        return monotonic() + self.timeout
+
+    def __startWorker(self) -> "SupervisedWorker":
+        connection, workerConnection = Pipe()
+        process = Process(target=runWorker,
+                          args=(workerConnection, self.function,
+                                self.maxMemory),
+                          daemon=True)
+        process.start()
+        workerConnection.close()
+        return SupervisedWorker(process, connection)
+
+    def __restartWorker(self, worker: "SupervisedWorker"):
+        stopWorker(worker)
+        return self.__startWorker()
+
+
+class SupervisedWorker:
+    def __init__(self, process: Process, connection):
+        self.process = process
+        self.connection = connection
+
+
+def stopWorker(worker: SupervisedWorker):
+    if worker.process.is_alive():
+        try:
+            worker.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        worker.process.join(STOP_TIMEOUT)
+    if worker.process.is_alive():
+        worker.process.terminate()
+        worker.process.join()
+    worker.connection.close()
+
+
+def runWorker(connection, function, maxMemory: int = None):
+    """ Main loop of a worker process: receives tasks until None, sends a
+        tuple (succeeded, result or error message) per task """
+    limitMemory(maxMemory)
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        try:
+            connection.send((True, function(task)))
+        except Exception as error:
+            connection.send((False, formatError(error)))
+    connection.close()
+
+
+def limitMemory(maxMemory: int = None):
+    if maxMemory is None:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (maxMemory, maxMemory))
+    except (ImportError, ValueError, OSError) as error:
+        logger.warning("Memory limit is not supported: " + str(error))
+
+
+def formatError(error: Exception) -> str:
+    return type(error).__name__ + ": " + str(error)
@@ -6,10 +6,16 @@ Created on Sat Nov 23 00:49:01 2018
 """
 
 from .rsttree import RstTree, RstType, RstNode
-from .relationstable import RelTable, Relation, RelElement
+from .relationstable import RelTable, Relation, RelElement, RelColumns
+from .relationindex import RelIndex
 from .reltablegenerator import TableGenerator
 from .comparisontable import ComparisonTable, Comparison,\
-                             MatchingDistance, Equivalency
-from .comptablegenerator import TableComparer
+                             MatchingDistance, MatchBits, Equivalency,\
+                             AgreementCounts, ComparisonMetrics
+from .comptablegenerator import TableComparer, DistanceCache,\
+                                defaultDistanceCache, MAX_DENSE_CELLS
 from .comparesettable import CompareSetTable
-from .comparesettablegenerator import TableSetComparer
+from .sharedtables import SharedRelTables
+from .comparesettablegenerator import TableSetComparer, MetricsAccumulator
+from .agreementsession import AgreementSession
+from .windowedcomparer import WindowedComparer
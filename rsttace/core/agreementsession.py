@@ -0,0 +1,397 @@
+from .relationstable import RelTable, Relation, RelElement, RelColumns
+from .relationstable import createSignature
+from .relationindex import SpanBuckets
+from .comparisontable import ComparisonTable, Comparison, AgreementCounts
+from .comparisontable import MatchingDistance, DIMENSIONS, PATTERN_WEIGHTS
+from .comparisontable import calcMatchBits, calcKappas, createMatchBits
+from .comparisontable import createDimensionMatches
+from .comptablegenerator import DistanceCache, defaultDistanceCache
+
+from scipy.optimize import linear_sum_assignment
+from numpy import array, full, argsort, int64
+from bisect import bisect_left, insort
+from collections import Counter
+from copy import copy
+
+# Sides of a session: the relations tables of annotation 1 and 2
+SIDES = (1, 2)
+
+# Labels of a relation without matching counterpart (see 'LabelCoding')
+NO_LABELS = ("None",) * len(DIMENSIONS)
+
+
+class AgreementSession():
+    """ Comparison of two relations tables, which is kept up to date while
+        their relations are edited, e.g. by an annotation tool.
+        The relations of each side (1 or 2) are addressed by IDs, which are
+        their positions in the initial tables; added relations get new IDs.
+        Like 'solveSparse', relations which are connected by matching
+        distances other than NO_MATCHING form blocks that are associated
+        separately; the remaining relations are associated in order of their
+        IDs. An edit only associates the blocks of the edited relation
+        again, and updates the agreementCounts by the label pairs of those
+        blocks, so that its latency depends on the size of those blocks (and
+        the difference of the numbers of relations of both sides), not on
+        the size of the trees. The total matching distance equals the one
+        of a 'TableComparer' of both tables (see 'relTable'), but equally
+        good associations are chosen as by its block-wise association (see
+        'maxDenseCells'), not as by its default dense one: for tables with
+        such ties, matchingRatios and cohensKappas can differ from those of
+        the default 'TableComparer'. """
+
+    def __init__(self, relTable1: RelTable, relTable2: RelTable,
+                 distanceCache: DistanceCache = None):
+        if distanceCache is None:
+            distanceCache = defaultDistanceCache
+        self.distanceCache = distanceCache
+        self.agreementCounts = AgreementCounts()
+        self.__expected = [0] * len(DIMENSIONS)
+        self.__relations = {side: {} for side in SIDES}
+        self.__signatures = {side: {} for side in SIDES}
+        self.__labels = {side: {} for side in SIDES}
+        self.__buckets = {side: SpanBuckets() for side in SIDES}
+        # side -> relID -> {relID of the other side: matching distance}
+        self.__distances = {side: {} for side in SIDES}
+        # side -> relID -> (relID of the other side, matching distance)
+        self.__partners = {side: {} for side in SIDES}
+        # sorted IDs of the relations, which are not associated in a block
+        self.__freeIDs = {side: [] for side in SIDES}
+        # free relations without counterpart, as the other side has less
+        self.__excluded = set()
+        self.__nextIDs = {1: relTable1.length(), 2: relTable2.length()}
+
+        for side, relTable in [(1, relTable1), (2, relTable2)]:
+            for relID, rel in enumerate(relTable):
+                self.__insert(side, relID, rel)
+        self.__associate({(side, relID)
+                          for side in SIDES
+                          for relID in self.__relations[side]})
+        self.__updateExcluded()
+
+    @property
+    def matchingRatios(self) -> dict:
+        return self.agreementCounts.calcMatchingRatios()
+
+    @property
+    def cohensKappas(self) -> dict:
+        return calcKappas(self.agreementCounts.total(),
+                          self.agreementCounts.agreements,
+                          self.__expected)
+
+    def relationIDs(self, side: int) -> list:
+        return sorted(self.__getRelations(side))
+
+    def getRelation(self, side: int, relID: int) -> Relation:
+        return self.__getRelations(side)[relID]
+
+    def getPartner(self, side: int, relID: int) -> tuple:
+        """ ID of the relation of the other side, which relID is matched
+            with, and their matching distance, None if it is unmatched """
+        self.getRelation(side, relID)
+        partner = self.__partners[side].get(relID)
+        if partner is None or partner[1] == MatchingDistance.NO_MATCHING:
+            return None
+        return partner
+
+    def addRelation(self, side: int, rel: Relation) -> int:
+        """ Adds rel to side, returns its new ID """
+        self.__getRelations(side)
+        relID = self.__nextIDs[side]
+        self.__nextIDs[side] += 1
+        self.__update(side, relID, rel)
+        return relID
+
+    def removeRelation(self, side: int, relID: int):
+        self.getRelation(side, relID)
+        self.__update(side, relID, None)
+
+    def replaceRelation(self, side: int, relID: int, rel: Relation):
+        """ Replaces relation relID of side by rel, keeping its ID """
+        self.getRelation(side, relID)
+        self.__update(side, relID, rel)
+
+    def relabelRelation(self, side: int, relID: int, name: str):
+        """ Renames relation relID of side. The name does not change any
+            matching distance, so that the association is kept. """
+        rel = copy(self.getRelation(side, relID))
+        rel.name = name
+        rel.subtreeHash = None
+        node = (side, relID)
+        self.__countNode(node, -1)
+        self.__relations[side][relID] = rel
+        self.__labels[side][relID] = createLabels(rel)
+        self.__countNode(node, 1)
+
+    def moveAttachment(self, side: int, relID: int,
+                       attachmentPoint: RelElement):
+        """ Attaches relation relID of side to attachmentPoint """
+        rel = copy(self.getRelation(side, relID))
+        rel.attachmentPoint = attachmentPoint
+        rel.subtreeHash = None
+        self.__update(side, relID, rel)
+
+    def relTable(self, side: int) -> RelTable:
+        """ Current relations of side, ordered by their IDs """
+        relations = self.__getRelations(side)
+        relTable = RelTable()
+        for relID in sorted(relations):
+            relTable.append(relations[relID])
+        return relTable
+
+    def comparisonTable(self) -> ComparisonTable:
+        """ Current association of both relations tables (see 'relTable')
+            as ComparisonTable, with its metrics """
+        positions = {side: {relID: position for position, relID
+                            in enumerate(self.relationIDs(side))}
+                     for side in SIDES}
+        relIDs1 = []
+        relIDs2 = []
+        distances = []
+        for relID1, (relID2, dist) in self.__partners[1].items():
+            relIDs1.append(positions[1][relID1])
+            relIDs2.append(positions[2][relID2])
+            distances.append(dist)
+        freeIDs1 = [relID for relID in self.__freeIDs[1]
+                    if (1, relID) not in self.__excluded]
+        freeIDs2 = [relID for relID in self.__freeIDs[2]
+                    if (2, relID) not in self.__excluded]
+        for relID1, relID2 in zip(freeIDs1, freeIDs2):
+            relIDs1.append(positions[1][relID1])
+            relIDs2.append(positions[2][relID2])
+            distances.append(MatchingDistance.NO_MATCHING)
+
+        order = argsort(array(relIDs1, dtype=int64), kind="stable")
+        relIDs1 = array(relIDs1, dtype=int64)[order]
+        relIDs2 = array(relIDs2, dtype=int64)[order]
+        relTable1 = self.relTable(1)
+        relTable2 = self.relTable(2)
+        columns1 = RelColumns(relTable1)
+        columns2 = RelColumns(relTable2)
+        compTable = ComparisonTable(relTable1, relTable2, relIDs1, relIDs2,
+                                    array(distances, dtype=int64)[order],
+                                    calcMatchBits(columns1, columns2,
+                                                  relIDs1, relIDs2),
+                                    columns1, columns2)
+        compTable.runStatAnalysis()
+        return compTable
+
+    def __getRelations(self, side: int) -> dict:
+        if side not in SIDES:
+            raise ValueError("Side of a session has to be 1 or 2, not "
+                             + str(side))
+        return self.__relations[side]
+
+    def __update(self, side: int, relID: int, rel: Relation):
+        """ Sets relation relID of side to rel (removes it if None) and
+            associates the blocks of its old and new matches again """
+        node = (side, relID)
+        nodes = set()
+        if relID in self.__relations[side]:
+            nodes = self.__findBlock(node)
+        distances = {}
+        if rel is not None:
+            distances = self.__calcDistances(side, createSignature(rel))
+            for otherID in distances:
+                otherNode = (otherSide(side), otherID)
+                if otherNode not in nodes:
+                    nodes |= self.__findBlock(otherNode)
+
+        self.__detach(nodes)
+        if relID in self.__relations[side]:
+            self.__delete(side, relID)
+        nodes.discard(node)
+        if rel is not None:
+            self.__insert(side, relID, rel, distances)
+            nodes.add(node)
+        self.__associate(nodes)
+        self.__updateExcluded()
+
+    def __insert(self, side: int, relID: int, rel: Relation,
+                 distances: dict = None):
+        signature = createSignature(rel)
+        if distances is None:
+            distances = self.__calcDistances(side, signature)
+        self.__relations[side][relID] = rel
+        self.__signatures[side][relID] = signature
+        self.__labels[side][relID] = createLabels(rel)
+        self.__buckets[side].addRelation(relID, signature)
+        self.__distances[side][relID] = distances
+        for otherID, dist in distances.items():
+            self.__distances[otherSide(side)][otherID][relID] = dist
+
+    def __delete(self, side: int, relID: int):
+        self.__buckets[side].removeRelation(relID,
+                                            self.__signatures[side][relID])
+        for otherID in self.__distances[side].pop(relID):
+            del self.__distances[otherSide(side)][otherID][relID]
+        del self.__relations[side][relID]
+        del self.__signatures[side][relID]
+        del self.__labels[side][relID]
+
+    def __calcDistances(self, side: int, signature: tuple) -> dict:
+        """ Matching distances other than NO_MATCHING of a relation with
+            signature on side to the relations of the other side """
+        other = otherSide(side)
+        otherSignatures = self.__signatures[other]
+        distances = {}
+        for otherID in self.__buckets[other].findCandidates(signature):
+            if side == 1:
+                dist = self.distanceCache.get(signature,
+                                              otherSignatures[otherID])
+            else:
+                dist = self.distanceCache.get(otherSignatures[otherID],
+                                              signature)
+            if dist != MatchingDistance.NO_MATCHING:
+                distances[otherID] = int(dist)
+        return distances
+
+    def __findBlock(self, node: tuple) -> set:
+        """ Nodes (side, relID) connected to node by matching distances """
+        block = {node}
+        remaining = [node]
+        while remaining:
+            side, relID = remaining.pop()
+            for otherID in self.__distances[side][relID]:
+                otherNode = (otherSide(side), otherID)
+                if otherNode not in block:
+                    block.add(otherNode)
+                    remaining.append(otherNode)
+        return block
+
+    def __detach(self, nodes: set):
+        """ Removes the associations of nodes, and their label pairs """
+        for node in nodes:
+            side, relID = node
+            if relID in self.__partners[side]:
+                self.__countNode(node, -1)
+                otherID, _ = self.__partners[side].pop(relID)
+                del self.__partners[otherSide(side)][otherID]
+            elif removeSorted(self.__freeIDs[side], relID):
+                self.__countNode(node, -1)
+                self.__excluded.discard(node)
+
+    def __associate(self, nodes: set):
+        """ Associates each block of nodes by its best association, ties are
+            broken within the block (see 'AgreementSession') """
+        remaining = set(nodes)
+        while remaining:
+            block = self.__findBlock(remaining.pop())
+            remaining -= block
+            rows = sorted(relID for side, relID in block if side == 1)
+            cols = sorted(relID for side, relID in block if side == 2)
+            if rows and cols:
+                blockMatrix = full([len(rows), len(cols)],
+                                   float(MatchingDistance.NO_MATCHING))
+                colIDs = {relID: col for col, relID in enumerate(cols)}
+                for row, relID in enumerate(rows):
+                    for otherID, dist in self.__distances[1][relID].items():
+                        blockMatrix[row, colIDs[otherID]] = dist
+                blockIDs1, blockIDs2 = linear_sum_assignment(blockMatrix)
+                for row, col in zip(blockIDs1, blockIDs2):
+                    relID1 = rows[row]
+                    relID2 = cols[col]
+                    dist = int(blockMatrix[row, col])
+                    self.__partners[1][relID1] = (relID2, dist)
+                    self.__partners[2][relID2] = (relID1, dist)
+                    self.__countNode((1, relID1), 1)
+            for side, relID in block:
+                if relID not in self.__partners[side]:
+                    insort(self.__freeIDs[side], relID)
+                    self.__countNode((side, relID), 1)
+
+    def __updateExcluded(self):
+        """ Excludes the free relations of the side with more free relations
+            (those with the highest IDs), which are left without counterpart
+            when the free relations are associated in order of their IDs """
+        freeIDs1 = self.__freeIDs[1]
+        freeIDs2 = self.__freeIDs[2]
+        numFree = min(len(freeIDs1), len(freeIDs2))
+        excluded = {(1, relID) for relID in freeIDs1[numFree:]}
+        excluded.update((2, relID) for relID in freeIDs2[numFree:])
+        for node in self.__excluded - excluded:
+            self.__excluded.discard(node)
+            self.__countNode(node, 1)
+        for node in excluded - self.__excluded:
+            self.__countNode(node, -1)
+            self.__excluded.add(node)
+
+    def __countNode(self, node: tuple, number: int):
+        """ Adds number times the label pairs of node (those of its pair, if
+            it is associated in a block) to the agreementCounts """
+        side, relID = node
+        partner = self.__partners[side].get(relID)
+        if partner is None:
+            if node in self.__excluded:
+                return
+            labels = self.__labels[side][relID]
+            if side == 1:
+                self.__countLabelPair(labels, NO_LABELS, 0, number)
+            else:
+                self.__countLabelPair(NO_LABELS, labels, 0, number)
+            return
+
+        otherID, dist = partner
+        relID1, relID2 = (relID, otherID) if side == 1 else (otherID, relID)
+        labels1 = self.__labels[1][relID1]
+        labels2 = self.__labels[2][relID2]
+        if dist == MatchingDistance.NO_MATCHING:
+            self.__countLabelPair(labels1, NO_LABELS, 0, number)
+            self.__countLabelPair(NO_LABELS, labels2, 0, number)
+            return
+        comparison = Comparison(self.__relations[1][relID1],
+                                self.__relations[2][relID2], dist)
+        dimMatches = createDimensionMatches(
+            array([createMatchBits(comparison.evaluation)]))[:, 0]
+        pattern = int((dimMatches * PATTERN_WEIGHTS).sum())
+        self.__countLabelPair(labels1, labels2, pattern, number)
+
+    def __countLabelPair(self, labels1: tuple, labels2: tuple,
+                         pattern: int, number: int):
+        counts = self.agreementCounts
+        counts.matchPatternCounts[pattern] += number
+        for dimID, (label1, label2) in enumerate(zip(labels1, labels2)):
+            if label1 == label2:
+                counts.agreements[dimID] += number
+            # expected agreements: sum of labelCounts1 * labelCounts2
+            self.__expected[dimID] += number \
+                * counts.labelCounts2[dimID][label1]
+            updateCounter(counts.labelCounts1[dimID], label1, number)
+            self.__expected[dimID] += number \
+                * counts.labelCounts1[dimID][label2]
+            updateCounter(counts.labelCounts2[dimID], label2, number)
+
+
+def otherSide(side: int) -> int:
+    return 3 - side
+
+
+def createLabels(rel: Relation) -> tuple:
+    """ Label strings of rel for each of the DIMENSIONS, as decoded by
+        'LabelCoding' """
+    const = rel.constituent
+    attP = rel.attachmentPoint
+    if rel.isMultiNuclear:
+        nuclearity = "multi"
+    elif const.maxID < attP.minID:
+        nuclearity = "right"
+    else:
+        nuclearity = "left"
+    return (nuclearity,
+            rel.name,
+            str(const.minID) + "-" + str(const.maxID),
+            str(attP.minID) + "-" + str(attP.maxID))
+
+
+def updateCounter(counter: Counter, key, number: int):
+    """ Adds number to the count of key, removes keys counted zero times """
+    counter[key] += number
+    if counter[key] == 0:
+        del counter[key]
+
+
+def removeSorted(values: list, value) -> bool:
+    index = bisect_left(values, value)
+    if index < len(values) and values[index] == value:
+        del values[index]
+        return True
+    return False
@@ -0,0 +1,86 @@
+from .comparisontable import DIMENSIONS, PATTERN_MATCHES
+
+from concurrent.futures import ProcessPoolExecutor
+from numpy import array, zeros, full, nan, nanmean, nanpercentile
+from numpy import concatenate
+from numpy.random import SeedSequence, default_rng
+import warnings
+
+# Replicates are drawn in chunks of fixed size, each with its own random
+# stream, so that results only depend on the seed (not on the processes)
+CHUNK_SIZE = 250
+
+# Upper bound for the number of values resampled at once
+MAX_RESAMPLED_VALUES = 2 ** 22
+
+
+def bootstrapConfidenceIntervals(values: array,
+                                 patternCounts: array,
+                                 replicates: int,
+                                 confidenceLevel: float = 0.95,
+                                 seed: int = None,
+                                 jobs: int = 1) -> tuple:
+    """ Percentile bootstrap confidence intervals for corpus metrics.
+        values: per document metrics (rows: documents)
+        patternCounts: per document label pair counts by pattern of matching
+                       dimensions (see 'AgreementCounts.matchPatternCounts')
+        Returns lower and upper bounds of
+        - the means of all metrics, resampled over documents
+        - the micro-averaged matching ratios of all DIMENSIONS and their
+          average, resampled over the pooled label pairs of all documents """
+    pooledCounts = patternCounts.sum(axis=0)
+    chunkSizes = [min(CHUNK_SIZE, replicates - start)
+                  for start in range(0, replicates, CHUNK_SIZE)]
+    seeds = SeedSequence(seed).spawn(len(chunkSizes))
+    tasks = [(values, pooledCounts, size, chunkSeed)
+             for size, chunkSeed in zip(chunkSizes, seeds)]
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(drawReplicates, tasks))
+    else:
+        results = [drawReplicates(task) for task in tasks]
+    means = concatenate([result[0] for result in results])
+    microRatios = concatenate([result[1] for result in results])
+
+    alpha = 1. - confidenceLevel
+    percentiles = [100. * alpha / 2., 100. * (1. - alpha / 2.)]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return (nanpercentile(means, percentiles, axis=0),
+                nanpercentile(microRatios, percentiles, axis=0))
+
+
+def drawReplicates(task: tuple) -> tuple:
+    """ Draws a chunk of bootstrap replicates of the document means and
+        the micro-averaged matching ratios """
+    values, pooledCounts, replicates, seed = task
+    rng = default_rng(seed)
+
+    # resample documents in blocks, limiting the memory consumption
+    numDocs, numColumns = values.shape
+    if numDocs > 0:
+        blockSize = max(1, MAX_RESAMPLED_VALUES // (numDocs * numColumns))
+        blocks = []
+        for start in range(0, replicates, blockSize):
+            size = min(blockSize, replicates - start)
+            docIDs = rng.integers(0, numDocs, size=(size, numDocs))
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                blocks.append(nanmean(values[docIDs], axis=1))
+        means = concatenate(blocks)
+    else:
+        means = full([replicates, numColumns], nan)
+
+    # resampling the pooled label pairs with replacement is equivalent to
+    # drawing the numbers of pairs per matching pattern from a multinomial
+    total = int(pooledCounts.sum())
+    microRatios = zeros([replicates, len(DIMENSIONS) + 1])
+    if total > 0:
+        counts = rng.multinomial(total, pooledCounts / total, size=replicates)
+        microRatios[:, :-1] = (counts @ PATTERN_MATCHES) / total
+        microRatios[:, -1] = microRatios[:, :-1].mean(axis=1)
+    else:
+        microRatios[:] = nan
+
+    return (means, microRatios)
@@ -1,12 +1,131 @@
 
+from .comparisontable import AgreementCounts
+
+import pandas as pd
+from numpy import asarray, zeros, full, isnan, fmin, fmax, sqrt, where, nan
+from numpy import errstate, int64
+
+
+METRICS_COLUMNS = ["Name",
+                   "Nuclearity-Ratio", "Nuclearity-Kappa",
+                   "Relation-Ratio", "Relation-Kappa",
+                   "Constituent-Ratio", "Constituent-Kappa",
+                   "AttachmentPoint-Ratio", "AttachmentPoint-Kappa",
+                   "Average-Ratio", "Average-Kappa"]
+
+
 class CompareSetTable:
-    def __init__(self, dataFrame):
+    """ Metrics of each comparison (dataFrame) and their statistics (stats).
+        If the 'AgreementCounts' of each comparison are passed, then their
+        pooled counts are kept as well and the stats contain the resulting
+        micro-averaged metrics as row 'micro'. Instead of the counts of each
+        comparison, their already pooled agreementCounts can be passed, and
+        instead of calculating the stats from dataFrame, the 'RunningStats'
+        collected while comparing. """
+    def __init__(self, dataFrame, confidenceIntervals=None,
+                 agreementCountsList=None, agreementCounts=None,
+                 runningStats=None):
         self.dataFrame = dataFrame
-        self.stats = statEval(dataFrame)
+        self.agreementCountsList = agreementCountsList
+        self.agreementCounts = agreementCounts
+        if runningStats is not None:
+            self.stats = runningStats.toDataFrame()
+        else:
+            self.stats = statEval(dataFrame)
+        if agreementCounts is None and agreementCountsList is not None:
+            agreementCounts = AgreementCounts()
+            for counts in agreementCountsList:
+                agreementCounts.add(counts)
+            self.agreementCounts = agreementCounts
+        if agreementCounts is not None:
+            microRow = createMetricsRow("micro",
+                                        agreementCounts.calcMatchingRatios(),
+                                        agreementCounts.calcCohensKappas())
+            microFrame = pd.DataFrame.from_records([microRow],
+                                                   columns=METRICS_COLUMNS,
+                                                   index=["micro"])
+            self.stats = pd.concat([self.stats,
+                                    microFrame.drop(columns="Name")],
+                                   sort=False)
+        if confidenceIntervals is not None:
+            self.stats = pd.concat([self.stats, confidenceIntervals],
+                                   sort=False)
+
+
+def createMetricsRow(name: str, ratios: dict, kappas: dict) -> list:
+    """ Row of METRICS_COLUMNS, based on the matching ratios and kappas
+        of a comparison """
+    return [name,
+            ratios["Nuclearity"], kappas["Nuclearity"],
+            ratios["Relation"], kappas["Relation"],
+            ratios["Constituent"], kappas["Constituent"],
+            ratios["Attachment point"], kappas["Attachment point"],
+            ratios["Average"], kappas["Average"]]
+
+
+class RunningStats:
+    """ Mean, standard deviation, minimum and maximum of each metric column,
+        updated row by row (Welford's online algorithm), so that they are
+        available at any time while comparing. NaN values are skipped, as
+        by 'DataFrame.describe'. The running stats of several workers can
+        be merged. """
+    STATS_INDEX = ["mean", "std", "min", "max"]
+
+    def __init__(self, columns: list = None):
+        if columns is None:
+            columns = METRICS_COLUMNS[1:]
+        self.columns = list(columns)
+        self.counts = zeros(len(self.columns), dtype=int64)
+        self.means = zeros(len(self.columns))
+        self.sumSquares = zeros(len(self.columns))
+        self.mins = full(len(self.columns), nan)
+        self.maxs = full(len(self.columns), nan)
+
+    def add(self, values):
+        """ Adds the values of one row, in the order of columns """
+        values = asarray(values, dtype=float)
+        valid = ~isnan(values)
+        values = values[valid]
+        self.counts[valid] += 1
+        delta = values - self.means[valid]
+        self.means[valid] += delta / self.counts[valid]
+        self.sumSquares[valid] += delta * (values - self.means[valid])
+        self.mins[valid] = fmin(self.mins[valid], values)
+        self.maxs[valid] = fmax(self.maxs[valid], values)
+
+    def addRow(self, row: list):
+        """ Adds a row of METRICS_COLUMNS (see 'createMetricsRow') """
+        self.add(row[1:])
+
+    def merge(self, other: "RunningStats"):
+        """ Adds the values of other to these stats (in place) """
+        counts = self.counts + other.counts
+        delta = other.means - self.means
+        with errstate(divide='ignore', invalid='ignore'):
+            weights = where(counts > 0, other.counts / counts, 0.)
+        self.means = self.means + delta * weights
+        self.sumSquares = self.sumSquares + other.sumSquares \
+            + delta * delta * self.counts * weights
+        self.counts = counts
+        self.mins = fmin(self.mins, other.mins)
+        self.maxs = fmax(self.maxs, other.maxs)
+
+    def toDataFrame(self) -> pd.DataFrame:
+        """ Stats (rows) of each column, like the ones of 'statEval' """
+        with errstate(divide='ignore', invalid='ignore'):
+            means = where(self.counts > 0, self.means, nan)
+            stds = where(self.counts > 1,
+                         sqrt(self.sumSquares / (self.counts - 1)), nan)
+        return pd.DataFrame([means, stds, self.mins, self.maxs],
+                            index=self.STATS_INDEX,
+                            columns=self.columns)
 
 
 def statEval(dataFrame):
-        # statistical evaluation of dataframe
-        desc = dataFrame.describe()
-        filt_desc = desc.loc[['mean', 'std', 'min', 'max'], :]
-        return filt_desc
+    """ Mean, standard deviation, minimum and maximum of each metric column
+        of dataFrame (all columns except 'Name') """
+    columns = [column for column in dataFrame.columns if column != "Name"]
+    runningStats = RunningStats(columns)
+    for row in dataFrame[columns].itertuples(index=False, name=None):
+        runningStats.add(row)
+    return runningStats.toDataFrame()
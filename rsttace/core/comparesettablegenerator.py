@@ -1,51 +1,115 @@
-from .comparesettable import CompareSetTable
+from .comparesettable import CompareSetTable, METRICS_COLUMNS
+from .comparesettable import createMetricsRow, RunningStats
+from .comparisontable import AgreementCounts, NUM_PATTERNS
+from .bootstrap import bootstrapConfidenceIntervals
 
 import pandas as pd
+from numpy import array
 
 
 class TableSetComparer:
-    def __init__(self):
+    """ Evaluates a set of comparisons. Optionally, bootstrap confidence
+        intervals are calculated from 'bootstrapReplicates' replicates,
+        drawn by 'jobs' processes. """
+    def __init__(self,
+                 bootstrapReplicates: int = 0,
+                 confidenceLevel: float = 0.95,
+                 seed: int = None,
+                 jobs: int = 1):
+        self.bootstrapReplicates = bootstrapReplicates
+        self.confidenceLevel = confidenceLevel
+        self.seed = seed
+        self.jobs = jobs
         return
 
     def run(self, compTables: list) -> CompareSetTable:
-        # create data lists
-        nameList = []
-        nucF1List = []
-        nucKappaList = []
-        relF1List = []
-        relKappaList = []
-        conF1List = []
-        conKappaList = []
-        attF1List = []
-        attKappaList = []
-        averageF1List = []
-        averageKappaList = []
+        accumulator = MetricsAccumulator(keepAgreementCounts=True)
         for compTable in compTables:
-            ratios = compTable.matchingRatios
-            kappas = compTable.cohensKappas
-            nameList.append(compTable.name)
-            nucF1List.append(ratios["Nuclearity"])
-            nucKappaList.append(kappas["Nuclearity"])
-            relF1List.append(ratios["Relation"])
-            relKappaList.append(kappas["Relation"])
-            conF1List.append(ratios["Constituent"])
-            conKappaList.append(kappas["Constituent"])
-            attF1List.append(ratios["Attachment point"])
-            attKappaList.append(kappas["Attachment point"])
-            averageF1List.append(ratios["Average"])
-            averageKappaList.append(kappas["Average"])
-
-        # generate dataframe
-        df = pd.DataFrame({"Name": nameList,
-                           "Nuclearity-Ratio": nucF1List,
-                           "Nuclearity-Kappa": nucKappaList,
-                           "Relation-Ratio": relF1List,
-                           "Relation-Kappa": relKappaList,
-                           "Constituent-Ratio": conF1List,
-                           "Constituent-Kappa": conKappaList,
-                           "AttachmentPoint-Ratio": attF1List,
-                           "AttachmentPoint-Kappa": attKappaList,
-                           "Average-Ratio": averageF1List,
-                           "Average-Kappa": averageKappaList})
-
-        return CompareSetTable(df)
+            accumulator.add(compTable)
+        return self.runOnAccumulator(accumulator)
+
+    def runOnMetrics(self,
+                     rows: list,
+                     agreementCountsList: list) -> CompareSetTable:
+        """ Evaluates already calculated comparison metrics: one row
+            (see 'createMetricsRow') and 'AgreementCounts' per comparison """
+        accumulator = MetricsAccumulator(keepAgreementCounts=True)
+        for row, agreementCounts in zip(rows, agreementCountsList):
+            accumulator.addMetrics(row, agreementCounts)
+        return self.runOnAccumulator(accumulator)
+
+    def runOnAccumulator(self,
+                         accumulator: "MetricsAccumulator") -> CompareSetTable:
+        """ Evaluates the comparison metrics collected by accumulator """
+        df = pd.DataFrame.from_records(accumulator.rows,
+                                       columns=METRICS_COLUMNS)
+
+        intervals = None
+        if self.bootstrapReplicates > 0:
+            patternCounts = array(accumulator.patternCounts)
+            patternCounts = patternCounts.reshape(-1, NUM_PATTERNS)
+            intervals = self.__calcConfidenceIntervals(df, patternCounts)
+        return CompareSetTable(df, intervals,
+                               accumulator.agreementCountsList,
+                               accumulator.agreementCounts,
+                               accumulator.runningStats)
+
+    def __calcConfidenceIntervals(self,
+                                  df: pd.DataFrame,
+                                  patternCounts: array) -> pd.DataFrame:
+        metrics = df.drop(columns="Name")
+        meanBounds, microBounds = bootstrapConfidenceIntervals(
+            metrics.to_numpy(dtype=float),
+            patternCounts,
+            self.bootstrapReplicates,
+            self.confidenceLevel,
+            self.seed,
+            self.jobs)
+
+        # micro-averaged confidence intervals exist for ratios only
+        ratioColumns = [column for column in metrics.columns
+                        if column.endswith("-Ratio")]
+        microFrame = pd.DataFrame(microBounds, columns=ratioColumns)
+        level = "{:g}%-CI".format(100. * self.confidenceLevel)
+        intervals = pd.concat([pd.DataFrame(meanBounds,
+                                            columns=metrics.columns),
+                               microFrame],
+                              ignore_index=True, sort=False)
+        intervals.index = [level + " low", level + " high",
+                           "micro " + level + " low",
+                           "micro " + level + " high"]
+        return intervals
+
+
+class MetricsAccumulator:
+    """ Collects the metrics of comparisons one by one, without keeping the
+        comparisons themselves: their metrics rows (see 'createMetricsRow'),
+        their match pattern counts (for bootstrapping), their pooled
+        'AgreementCounts' and 'RunningStats'. The AgreementCounts of each
+        single comparison are only kept in agreementCountsList if
+        keepAgreementCounts is set (e.g. for partial results), otherwise it
+        is None. """
+    def __init__(self, keepAgreementCounts: bool = False):
+        self.rows = []
+        self.patternCounts = []
+        self.agreementCounts = AgreementCounts()
+        self.agreementCountsList = [] if keepAgreementCounts else None
+        self.runningStats = RunningStats()
+
+    def add(self, compTable):
+        """ Adds the metrics of a ComparisonTable (or ComparisonMetrics) """
+        self.addMetrics(createMetricsRow(compTable.name,
+                                         compTable.matchingRatios,
+                                         compTable.cohensKappas),
+                        compTable.agreementCounts)
+
+    def addMetrics(self, row: list, agreementCounts: AgreementCounts):
+        self.rows.append(row)
+        self.patternCounts.append(agreementCounts.matchPatternCounts)
+        self.agreementCounts.add(agreementCounts)
+        self.runningStats.addRow(row)
+        if self.agreementCountsList is not None:
+            self.agreementCountsList.append(agreementCounts)
+
+    def length(self):
+        return len(self.rows)
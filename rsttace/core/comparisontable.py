@@ -1,5 +1,10 @@
-from .relationstable import Relation, RelElement
-from enum import IntEnum
+from .relationstable import RelTable, Relation, RelElement, RelColumns
+from enum import IntEnum, IntFlag
+from collections import Counter
+from numpy import array, asarray, count_nonzero, concatenate, stack
+from numpy import zeros, full, where, unique, bincount, arange, newaxis
+from numpy import errstate
+from numpy import int8, int32, int64, uint8
 
 
 class MatchingDistance(IntEnum):
@@ -22,18 +27,39 @@ class Equivalency():
     attachmentPoint: bool
 
 
+class MatchBits(IntFlag):
+    """ Bits encoding the equivalency of a compared relation pair """
+    NUCLEARITY_DIRECTION = 1
+    NUCLEARITY_MONO_MULTI = 2
+    RELATION = 4
+    CONSTITUENT = 8
+    ATTACHMENT_POINT = 16
+
+
 class Comparison():
-    """ Describes the comparison of two RST-relations """
+    """ Describes the comparison of two RST-relations.
+        The evaluation is only calculated on first access, either from
+        the passed match bits (see 'MatchBits') or from both relations. """
     relation1: Relation
     relation2: Relation
     matchingDistance: int
-    evaluation: Equivalency
 
-    def __init__(self, rel1: Relation, rel2: Relation, dist: int):
+    def __init__(self, rel1: Relation, rel2: Relation, dist: int,
+                 matchBits: int = None):
         self.relation1 = rel1
         self.relation2 = rel2
         self.matchingDistance = dist
-        self.evaluation = self.__calcEquivalency()
+        self.__matchBits = matchBits
+        self.__evaluation = None
+
+    @property
+    def evaluation(self) -> Equivalency:
+        if self.__evaluation is None:
+            if self.__matchBits is None:
+                self.__evaluation = self.__calcEquivalency()
+            else:
+                self.__evaluation = createEquivalency(self.__matchBits)
+        return self.__evaluation
 
     def __calcEquivalency(self) -> Equivalency:
         evaluation = Equivalency()
@@ -87,123 +113,461 @@ class Comparison():
 
 
 class ComparisonTable():
-    __comparisons: list
+    """ Compact storage of relation pair comparisons: parallel arrays with
+        the IDs of both relations in their relations tables, the matching
+        distance and the match bits (see 'MatchBits') of each pair.
+        'Comparison' objects are only created on access. The column-wise
+        encodings of both relations tables are optional.
+        'runStatAnalysis' keeps the sufficient statistics of its metrics in
+        'agreementCounts'. """
+    relTable1: RelTable
+    relTable2: RelTable
+    relIDs1: array
+    relIDs2: array
+    distances: array
+    matchBits: array
+    columns1: RelColumns
+    columns2: RelColumns
+    agreementCounts: "AgreementCounts"
     matchingRatios: dict
     cohensKappas: dict
     name: str
 
-    def __init__(self):
-        self.__comparisons = []
+    def __init__(self,
+                 relTable1: RelTable = None,
+                 relTable2: RelTable = None,
+                 relIDs1: array = None,
+                 relIDs2: array = None,
+                 distances: array = None,
+                 matchBits: array = None,
+                 columns1: RelColumns = None,
+                 columns2: RelColumns = None):
+        self.relTable1 = relTable1 if relTable1 is not None else RelTable()
+        self.relTable2 = relTable2 if relTable2 is not None else RelTable()
+        self.__relIDs1 = asarray(relIDs1 if relIDs1 is not None else [],
+                                 dtype=int32)
+        self.__relIDs2 = asarray(relIDs2 if relIDs2 is not None else [],
+                                 dtype=int32)
+        self.__distances = asarray(distances if distances is not None
+                                   else [], dtype=int8)
+        self.__matchBits = asarray(matchBits if matchBits is not None
+                                   else [], dtype=uint8)
+        self.columns1 = columns1
+        self.columns2 = columns2
+        self.agreementCounts = AgreementCounts()
         self.matchingRatios = {}
         self.cohensKappas = {}
         self.name = ""
+        # (relID1, relID2, distance, match bits) of the comparisons appended
+        # since the arrays were built (see 'append')
+        self.__appended = []
+        self.__copiedTables = False
         return
 
+    @property
+    def relIDs1(self) -> array:
+        self.__buildArrays()
+        return self.__relIDs1
+
+    @property
+    def relIDs2(self) -> array:
+        self.__buildArrays()
+        return self.__relIDs2
+
+    @property
+    def distances(self) -> array:
+        self.__buildArrays()
+        return self.__distances
+
+    @property
+    def matchBits(self) -> array:
+        self.__buildArrays()
+        return self.__matchBits
+
     def get(self, index: int):
-        return self.__comparisons[index]
+        return Comparison(self.relTable1.get(self.relIDs1[index]),
+                          self.relTable2.get(self.relIDs2[index]),
+                          MatchingDistance(self.distances[index]),
+                          int(self.matchBits[index]))
 
     def append(self, e: Comparison):
-        self.__comparisons.append(e)
+        """ The relations tables are copied on the first call, so that the
+            tables passed to the constructor are not changed. The arrays are
+            only rebuilt on their next access. """
+        if not self.__copiedTables:
+            self.relTable1 = self.relTable1 + RelTable()
+            self.relTable2 = self.relTable2 + RelTable()
+            self.__copiedTables = True
+        self.relTable1.append(e.relation1)
+        self.relTable2.append(e.relation2)
+        self.__appended.append((self.relTable1.length() - 1,
+                                self.relTable2.length() - 1,
+                                e.matchingDistance,
+                                createMatchBits(e.evaluation)))
+        self.columns1 = None
+        self.columns2 = None
+
+    def __buildArrays(self):
+        if not self.__appended:
+            return
+        relIDs1, relIDs2, distances, matchBits = zip(*self.__appended)
+        self.__relIDs1 = concatenate([self.__relIDs1,
+                                      asarray(relIDs1, dtype=int32)])
+        self.__relIDs2 = concatenate([self.__relIDs2,
+                                      asarray(relIDs2, dtype=int32)])
+        self.__distances = concatenate([self.__distances,
+                                        asarray(distances, dtype=int8)])
+        self.__matchBits = concatenate([self.__matchBits,
+                                        asarray(matchBits, dtype=uint8)])
+        self.__appended = []
 
     def length(self):
-        return len(self.__comparisons)
+        return len(self.__distances) + len(self.__appended)
 
     def __iter__(self):
-        return iter(self.__comparisons)
+        return (self.get(index) for index in range(0, self.length()))
 
     def runStatAnalysis(self):
-        # re-organize data structures
-        labels1_rel = []
-        labels1_nuc = []
-        labels1_con = []
-        labels1_att = []
-
-        labels2_rel = []
-        labels2_nuc = []
-        labels2_con = []
-        labels2_att = []
-
-        matches_rel = int(0)
-        matches_nuc = int(0)
-        matches_con = int(0)
-        matches_att = int(0)
-        totalNum = int(0)
-
-        for comp in self.__comparisons:
-            if comp.matchingDistance != MatchingDistance.NO_MATCHING:
-                labels1_rel.append(comp.relation1.name)
-                labels2_rel.append(comp.relation2.name)
-
-                labels1_nuc.append(extractNuclearityType(comp.relation1))
-                labels2_nuc.append(extractNuclearityType(comp.relation2))
-
-                labels1_con.append(extractRelElementString(comp.relation1.constituent))
-                labels2_con.append(extractRelElementString(comp.relation2.constituent))
-
-                labels1_att.append(extractRelElementString(comp.relation1.attachmentPoint))
-                labels2_att.append(extractRelElementString(comp.relation2.attachmentPoint))
-
-                matches_rel += 1 if comp.evaluation.relation else 0
-                matches_nuc += 1 if comp.evaluation.nuclearity.equalDirection and \
-                                    comp.evaluation.nuclearity.equalMonoMulti else 0
-                matches_con += 1 if comp.evaluation.constituent else 0
-                matches_att += 1 if comp.evaluation.attachmentPoint else 0
-
-                totalNum += 1
-            else:
-                labels1_rel.append(comp.relation1.name)
-                labels1_rel.append("None")
-                labels2_rel.append("None")
-                labels2_rel.append(comp.relation2.name)
-
-                labels1_nuc.append(extractNuclearityType(comp.relation1))
-                labels1_nuc.append("None")
-                labels2_nuc.append("None")
-                labels2_nuc.append(extractNuclearityType(comp.relation2))
+        columns1 = self.columns1
+        columns2 = self.columns2
+        if columns1 is None or columns2 is None:
+            columns1 = RelColumns(self.relTable1)
+            columns2 = RelColumns(self.relTable2)
+
+        agreementCounts, matchingRatios, cohensKappas = \
+            calcStatistics(columns1, columns2, self.relIDs1, self.relIDs2,
+                           self.distances, self.matchBits)
+        self.agreementCounts = agreementCounts
+        self.matchingRatios.clear()
+        self.matchingRatios.update(matchingRatios)
+        self.cohensKappas.clear()
+        self.cohensKappas.update(cohensKappas)
+        return
 
-                labels1_con.append(extractRelElementString(comp.relation1.constituent))
-                labels1_con.append("None")
-                labels2_con.append("None")
-                labels2_con.append(extractRelElementString(comp.relation2.constituent))
 
-                labels1_att.append(extractRelElementString(comp.relation1.attachmentPoint))
-                labels1_att.append("None")
-                labels2_att.append("None")
-                labels2_att.append(extractRelElementString(comp.relation2.attachmentPoint))
+class ComparisonMetrics():
+    """ Metrics of a comparison without its relation pairs, as calculated
+        by 'TableComparer.runMetrics': name, agreementCounts, matchingRatios
+        and cohensKappas are the same as those of a 'ComparisonTable'. """
+    agreementCounts: "AgreementCounts"
+    matchingRatios: dict
+    cohensKappas: dict
+    name: str
 
-                totalNum += 2
+    def __init__(self,
+                 agreementCounts: "AgreementCounts" = None,
+                 matchingRatios: dict = None,
+                 cohensKappas: dict = None):
+        if agreementCounts is None:
+            agreementCounts = AgreementCounts()
+        self.agreementCounts = agreementCounts
+        self.matchingRatios = matchingRatios if matchingRatios else {}
+        self.cohensKappas = cohensKappas if cohensKappas else {}
+        self.name = ""
 
-        # calculate matching ratios
-        self.matchingRatios.clear()
-        self.matchingRatios["Nuclearity"] = matches_nuc / totalNum if totalNum > 0 else 0
-        self.matchingRatios["Relation"] = matches_rel / totalNum if totalNum > 0 else 0
-        self.matchingRatios["Constituent"] = matches_con / totalNum if totalNum > 0 else 0
-        self.matchingRatios["Attachment point"] = matches_att / totalNum if totalNum > 0 else 0
-        self.matchingRatios["Average"] = calcAverageOfDictValues(self.matchingRatios)
 
-        # calculate inter annotator agreement (cohen's kappa)
-        self.cohensKappas.clear()
-        self.cohensKappas["Nuclearity"] = cohensKappa(labels1_nuc, labels2_nuc)
-        self.cohensKappas["Relation"] = cohensKappa(labels1_rel, labels2_rel)
-        self.cohensKappas["Constituent"] = cohensKappa(labels1_con, labels2_con)
-        self.cohensKappas["Attachment point"] = cohensKappa(labels1_att, labels2_att)
-        self.cohensKappas["Average"] = calcAverageOfDictValues(self.cohensKappas)
+# Order of the compared dimensions in label and match arrays
+DIMENSIONS = ["Nuclearity", "Relation", "Constituent", "Attachment point"]
 
-        return
+# Label of a relation without matching counterpart
+NO_LABEL = -1
 
+# Label pairs are grouped by their pattern of matching dimensions: the
+# pattern sets bit d (weight 2^d) if DIMENSIONS[d] matches
+NUM_PATTERNS = 2 ** len(DIMENSIONS)
+PATTERN_WEIGHTS = 2 ** arange(len(DIMENSIONS))
 
-def extractNuclearityType(rel: Relation):
-    if rel.isMultiNuclear:
-        return "multi"
-    else:
-        if rel.constituent.maxID < rel.attachmentPoint.minID:
-            return "right"
-        else:
-            return "left"
+# Whether each of the DIMENSIONS (columns) matches for a pattern (rows)
+PATTERN_MATCHES = (arange(NUM_PATTERNS)[:, newaxis] & PATTERN_WEIGHTS) != 0
 
 
-def extractRelElementString(elem: RelElement):
-    return str(elem.minID) + "-" + str(elem.maxID)
+class AgreementCounts():
+    """ Sufficient statistics of the metrics of one or more comparisons.
+        Adding the counts of several comparisons yields the counts of their
+        pooled label pairs, i.e. micro-averaged metrics.
+        - matchPatternCounts: number of label pairs by pattern of matching
+          dimensions
+        - agreements: number of label pairs with identical labels
+          for each of the DIMENSIONS
+        - labelCounts1, labelCounts2: for each of the DIMENSIONS a counter
+          of the labels (as strings) of annotation 1 and 2 respectively """
+    def __init__(self):
+        self.matchPatternCounts = zeros(NUM_PATTERNS, dtype=int64)
+        self.agreements = zeros(len(DIMENSIONS), dtype=int64)
+        self.labelCounts1 = [Counter() for _ in DIMENSIONS]
+        self.labelCounts2 = [Counter() for _ in DIMENSIONS]
+
+    @staticmethod
+    def fromLabels(labels1: array,
+                   labels2: array,
+                   labelCoding: "LabelCoding",
+                   matchPatternCounts: array) -> "AgreementCounts":
+        counts = AgreementCounts()
+        counts.matchPatternCounts = asarray(matchPatternCounts, dtype=int64)
+        counts.agreements = count_nonzero(labels1 == labels2, axis=1)
+        for dimID in range(0, len(DIMENSIONS)):
+            for labels, labelCounts in [(labels1, counts.labelCounts1),
+                                        (labels2, counts.labelCounts2)]:
+                keys, numbers = unique(labels[dimID], return_counts=True)
+                for key, number in zip(keys, numbers):
+                    labelCounts[dimID][labelCoding.decode(dimID, key)] = \
+                        int(number)
+        return counts
+
+    def add(self, other: "AgreementCounts"):
+        """ Adds the counts of other to these counts (in place) """
+        self.matchPatternCounts = self.matchPatternCounts \
+            + other.matchPatternCounts
+        self.agreements = self.agreements + other.agreements
+        for dimID in range(0, len(DIMENSIONS)):
+            self.labelCounts1[dimID].update(other.labelCounts1[dimID])
+            self.labelCounts2[dimID].update(other.labelCounts2[dimID])
+
+    def __add__(self, other: "AgreementCounts") -> "AgreementCounts":
+        counts = AgreementCounts()
+        counts.add(self)
+        counts.add(other)
+        return counts
+
+    def total(self) -> int:
+        return int(self.matchPatternCounts.sum())
+
+    def toDict(self) -> dict:
+        """ Plain (e.g. JSON serializable) representation of the counts """
+        return {"matchPatternCounts": self.matchPatternCounts.tolist(),
+                "agreements": self.agreements.tolist(),
+                "labelCounts1": [dict(counts) for counts in self.labelCounts1],
+                "labelCounts2": [dict(counts) for counts in self.labelCounts2]}
+
+    @staticmethod
+    def fromDict(d: dict) -> "AgreementCounts":
+        """ Inverse of 'toDict' """
+        counts = AgreementCounts()
+        counts.matchPatternCounts = asarray(d["matchPatternCounts"],
+                                            dtype=int64)
+        counts.agreements = asarray(d["agreements"], dtype=int64)
+        counts.labelCounts1 = [Counter(c) for c in d["labelCounts1"]]
+        counts.labelCounts2 = [Counter(c) for c in d["labelCounts2"]]
+        return counts
+
+    def matchCounts(self) -> array:
+        """ Number of matches for each of the DIMENSIONS """
+        return self.matchPatternCounts @ PATTERN_MATCHES
+
+    def calcMatchingRatios(self) -> dict:
+        total = self.total()
+        ratios = {}
+        for dimension, numMatches in zip(DIMENSIONS, self.matchCounts()):
+            ratios[dimension] = int(numMatches) / total if total > 0 else 0
+        ratios["Average"] = calcAverageOfDictValues(ratios)
+        return ratios
+
+    def calcExpectedAgreements(self) -> list:
+        """ Number of label pairs with identical labels, which are expected
+            by chance, times the total number of label pairs, for each of
+            the DIMENSIONS """
+        expected = []
+        for counts1, counts2 in zip(self.labelCounts1, self.labelCounts2):
+            expected.append(sum(number * counts2[label]
+                                for label, number in counts1.items()))
+        return expected
+
+    def calcCohensKappas(self) -> dict:
+        return calcKappas(self.total(), self.agreements,
+                          self.calcExpectedAgreements())
+
+
+class LabelCoding():
+    """ Decodes the integer label keys of 'createLabelKeys' into the label
+        strings of each dimension """
+    def __init__(self, names: array, spanBase: int):
+        self.names = names
+        self.spanBase = spanBase
+
+    def decode(self, dimID: int, key: int) -> str:
+        if key == NO_LABEL:
+            return "None"
+        elif DIMENSIONS[dimID] == "Nuclearity":
+            return ["multi", "right", "left"][key]
+        elif DIMENSIONS[dimID] == "Relation":
+            return self.names[key]
+        else:
+            return str(key // self.spanBase) + "-" + str(key % self.spanBase)
+
+
+def calcStatistics(columns1: RelColumns,
+                   columns2: RelColumns,
+                   relIDs1: array,
+                   relIDs2: array,
+                   distances: array,
+                   matchBits: array) -> tuple:
+    """ Metrics of the compared relation pairs (relIDs1[i], relIDs2[i]) with
+        their matching distances and match bits (see 'MatchBits').
+        Returns their 'AgreementCounts', matching ratios and kappas. """
+    # integer coded labels of both annotations for each dimension
+    matched = (distances != MatchingDistance.NO_MATCHING)
+    labels1, labels2, labelCoding = createLabelArrays(columns1, columns2,
+                                                      relIDs1, relIDs2,
+                                                      matched)
+    totalNum = labels1.shape[1]
+    dimMatches = createDimensionMatches(matchBits[matched])
+    matches = count_nonzero(dimMatches, axis=1)
+
+    # count label pairs by their pattern of matching dimensions
+    patterns = (dimMatches * PATTERN_WEIGHTS[:, newaxis]).sum(axis=0)
+    matchPatternCounts = bincount(patterns.astype(int64),
+                                  minlength=NUM_PATTERNS)
+    matchPatternCounts[0] += totalNum - len(patterns)
+    agreementCounts = AgreementCounts.fromLabels(labels1, labels2,
+                                                 labelCoding,
+                                                 matchPatternCounts)
+
+    # calculate matching ratios
+    matchingRatios = {}
+    for dimension, numMatches in zip(DIMENSIONS, matches):
+        matchingRatios[dimension] = (int(numMatches) / totalNum
+                                     if totalNum > 0 else 0)
+    matchingRatios["Average"] = calcAverageOfDictValues(matchingRatios)
+
+    # calculate inter annotator agreement (cohen's kappa)
+    kappas = {}
+    for dimension, kappa in zip(DIMENSIONS, cohensKappas(labels1, labels2)):
+        kappas[dimension] = float(kappa)
+    kappas["Average"] = calcAverageOfDictValues(kappas)
+
+    return (agreementCounts, matchingRatios, kappas)
+
+
+def calcMatchBits(columns1: RelColumns,
+                  columns2: RelColumns,
+                  relIDs1: array,
+                  relIDs2: array) -> array:
+    """ Match bits (see 'MatchBits') of all relation pairs
+        (relIDs1[i], relIDs2[i]) at once """
+    equalDirection = (columns1.direction[relIDs1]
+                      == columns2.direction[relIDs2])
+    equalMonoMulti = (columns1.isMultiNuclear[relIDs1]
+                      == columns2.isMultiNuclear[relIDs2])
+    equalRelation = (columns1.name[relIDs1] == columns2.name[relIDs2])
+    equalConstituent = (columns1.constituent[relIDs1]
+                        == columns2.constituent[relIDs2]).all(axis=1)
+    equalAttachmentPoint = (columns1.attachmentPoint[relIDs1]
+                            == columns2.attachmentPoint[relIDs2]).all(axis=1)
+
+    matchBits = equalDirection * MatchBits.NUCLEARITY_DIRECTION \
+        + equalMonoMulti * MatchBits.NUCLEARITY_MONO_MULTI \
+        + equalRelation * MatchBits.RELATION \
+        + equalConstituent * MatchBits.CONSTITUENT \
+        + equalAttachmentPoint * MatchBits.ATTACHMENT_POINT
+    return asarray(matchBits, dtype=uint8)
+
+
+def createMatchBits(evaluation: Equivalency) -> int:
+    matchBits = 0
+    if evaluation.nuclearity.equalDirection:
+        matchBits |= MatchBits.NUCLEARITY_DIRECTION
+    if evaluation.nuclearity.equalMonoMulti:
+        matchBits |= MatchBits.NUCLEARITY_MONO_MULTI
+    if evaluation.relation:
+        matchBits |= MatchBits.RELATION
+    if evaluation.constituent:
+        matchBits |= MatchBits.CONSTITUENT
+    if evaluation.attachmentPoint:
+        matchBits |= MatchBits.ATTACHMENT_POINT
+    return int(matchBits)
+
+
+def createEquivalency(matchBits: int) -> Equivalency:
+    evaluation = Equivalency()
+    evaluation.nuclearity = NuclearityEquivalency()
+    evaluation.nuclearity.equalDirection = \
+        bool(matchBits & MatchBits.NUCLEARITY_DIRECTION)
+    evaluation.nuclearity.equalMonoMulti = \
+        bool(matchBits & MatchBits.NUCLEARITY_MONO_MULTI)
+    evaluation.relation = bool(matchBits & MatchBits.RELATION)
+    evaluation.constituent = bool(matchBits & MatchBits.CONSTITUENT)
+    evaluation.attachmentPoint = bool(matchBits & MatchBits.ATTACHMENT_POINT)
+    return evaluation
+
+
+def createLabelKeys(columns1: RelColumns, columns2: RelColumns) -> tuple:
+    """ Integer label keys (rows: DIMENSIONS, columns: relations) of both
+        relations tables, coded consistently for both tables:
+        nuclearity type (0: multi, 1: right, 2: left), relation name,
+        and span (minID, maxID) of constituent and attachment point.
+        Returns the keys of both tables and their 'LabelCoding'. """
+    length1 = columns1.length()
+    names, nameKeys = unique(concatenate([columns1.name, columns2.name]),
+                             return_inverse=True)
+    nameKeys = nameKeys.ravel()
+    spanBase = 1 + max(columns1.constituent[:, :2].max(initial=0),
+                       columns1.attachmentPoint[:, :2].max(initial=0),
+                       columns2.constituent[:, :2].max(initial=0),
+                       columns2.attachmentPoint[:, :2].max(initial=0))
+
+    def createKeys(columns: RelColumns, nameKeys: array) -> array:
+        const = columns.constituent
+        attP = columns.attachmentPoint
+        nucType = where(columns.isMultiNuclear, 0,
+                        where(const[:, 1] < attP[:, 0], 1, 2))
+        return stack([nucType,
+                      nameKeys,
+                      const[:, 0] * spanBase + const[:, 1],
+                      attP[:, 0] * spanBase + attP[:, 1]]).astype(int64)
+
+    return (createKeys(columns1, nameKeys[:length1]),
+            createKeys(columns2, nameKeys[length1:]),
+            LabelCoding(names, spanBase))
+
+
+def createLabelArrays(columns1: RelColumns,
+                      columns2: RelColumns,
+                      relIDs1: array,
+                      relIDs2: array,
+                      matched: array) -> tuple:
+    """ Label arrays (rows: DIMENSIONS) of both annotations. Each matched
+        relation pair contributes one column, each unmatched pair two
+        columns, pairing each relation with NO_LABEL.
+        Returns both label arrays and their 'LabelCoding'. """
+    keys1, keys2, labelCoding = createLabelKeys(columns1, columns2)
+    unmatched = ~matched
+    noLabels = full([len(DIMENSIONS), count_nonzero(unmatched)], NO_LABEL,
+                    dtype=int64)
+    labels1 = concatenate([keys1[:, relIDs1[matched]],
+                           keys1[:, relIDs1[unmatched]],
+                           noLabels], axis=1)
+    labels2 = concatenate([keys2[:, relIDs2[matched]],
+                           noLabels,
+                           keys2[:, relIDs2[unmatched]]], axis=1)
+    return (labels1, labels2, labelCoding)
+
+
+def createDimensionMatches(matchBits: array) -> array:
+    """ Whether each of the DIMENSIONS (rows) matches for each match bits
+        entry (columns) """
+    nucBits = MatchBits.NUCLEARITY_DIRECTION | MatchBits.NUCLEARITY_MONO_MULTI
+    return stack([(matchBits & nucBits) == nucBits,
+                  (matchBits & MatchBits.RELATION) != 0,
+                  (matchBits & MatchBits.CONSTITUENT) != 0,
+                  (matchBits & MatchBits.ATTACHMENT_POINT) != 0])
+
+
+def calcKappas(total: int, agreements: array, expected: list) -> dict:
+    """ Cohen's kappa of each of the DIMENSIONS from the total number of
+        label pairs, their agreements and their expected agreements (see
+        'AgreementCounts.calcExpectedAgreements') """
+    kappas = {}
+    for dimID, dimension in enumerate(DIMENSIONS):
+        observed = int(agreements[dimID]) * total
+        if total == 0:
+            kappas[dimension] = 0
+        elif total * total == expected[dimID]:
+            kappas[dimension] = float("nan")
+        else:
+            kappas[dimension] = (observed - expected[dimID]) \
+                / (total * total - expected[dimID])
+    kappas["Average"] = calcAverageOfDictValues(kappas)
+    return kappas
 
 
 def calcAverageOfDictValues(d: dict):
@@ -214,6 +578,27 @@ def calcAverageOfDictValues(d: dict):
     return avgValue
 
 
-def cohensKappa(labels1: list, labels2: list):
-    from sklearn.metrics import cohen_kappa_score
-    return cohen_kappa_score(labels1, labels2)
+def cohensKappas(labels1: array, labels2: array) -> array:
+    """ Cohen's kappa for each row of two integer label arrays. Only the
+        diagonal and the marginals of each row's confusion matrix are needed,
+        all rows are counted in one pass by coding their labels jointly.
+        Undefined kappas (one single label only) are NaN. """
+    numRows, total = labels1.shape
+    if total == 0:
+        return zeros(numRows)
+    agreements = count_nonzero(labels1 == labels2, axis=1)
+
+    rowBase = 2 + max(labels1.max(), labels2.max())
+    rowOffsets = arange(numRows)[:, newaxis] * rowBase
+    jointLabels = concatenate([labels1 + 1 + rowOffsets,
+                               labels2 + 1 + rowOffsets], axis=1)
+    codes, codeIDs = unique(jointLabels, return_inverse=True)
+    codeIDs = codeIDs.reshape(numRows, 2 * total)
+    counts1 = bincount(codeIDs[:, :total].ravel(), minlength=len(codes))
+    counts2 = bincount(codeIDs[:, total:].ravel(), minlength=len(codes))
+    expected = bincount(codes // rowBase,
+                        weights=counts1 * counts2,
+                        minlength=numRows)
+
+    with errstate(divide='ignore', invalid='ignore'):
+        return (agreements * total - expected) / (total * total - expected)
@@ -1,45 +1,190 @@
-from .comparisontable import ComparisonTable, Comparison, MatchingDistance
+from .comparisontable import ComparisonTable, MatchingDistance, calcMatchBits
+from .comparisontable import ComparisonMetrics, calcStatistics
 from .relationstable import RelTable, Relation, RelElement
+from .relationindex import RelIndex
 
 from scipy.optimize import linear_sum_assignment
-from numpy import array, zeros
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from numpy import array, full, ones, zeros, arange, argsort, searchsorted
+from numpy import concatenate, flatnonzero, unique, int64, uint8
+from collections import OrderedDict
+
+# Suggested maxDenseCells of 'TableComparer' for huge pairs: distance
+# matrices with more cells are not allocated as a whole, the best
+# association is found separately for each connected block of relations
+# with matching distances other than NO_MATCHING (see 'solveSparse'). This
+# keeps the total distance, but equally good associations (and thus the
+# metrics) may be chosen differently than by the dense solver, so that the
+# block-wise association is only used on request.
+MAX_DENSE_CELLS = 2 ** 22
+
+
+class DistanceCache():
+    """ Bounded (least recently used) memoization of matching distances
+        between relation pairs, keyed on their relation signatures.
+        'hits' and 'misses' count the lookups since the last reset. """
+
+    def __init__(self, maxSize: int = 100000):
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.__distances = OrderedDict()
+
+    def get(self, sig1: tuple, sig2: tuple) -> int:
+        key = (sig1, sig2)
+        dist = self.__distances.get(key)
+        if dist is None:
+            self.misses += 1
+            dist = calcSignatureDistance(sig1, sig2)
+            self.__distances[key] = dist
+            if len(self.__distances) > self.maxSize:
+                self.__distances.popitem(last=False)
+        else:
+            self.hits += 1
+            self.__distances.move_to_end(key)
+        return dist
+
+    def length(self):
+        return len(self.__distances)
+
+    def hitRatio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.
+
+    def clear(self):
+        self.__distances.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# cache shared by all comparers of a process, so that repeated comparisons
+# against the same (gold) tree profit from each other
+defaultDistanceCache = DistanceCache()
 
 
 class TableComparer():
-    def __init__(self):
+    """ Compares two relations tables by their best association. Relations
+        of identical subtrees of both RST trees (see 'createSubtreeHash')
+        are associated directly as COMPLETE_SAME_CS, tables of identical
+        trees without any matching. Only the remaining relations are
+        associated by their matching distances: those are stored as uint8.
+        If maxDenseCells is given (e.g. MAX_DENSE_CELLS), then pairs with
+        more distances are associated block-wise, which may choose other
+        equally good associations (see 'solveSparse').
+        'peakMatrixBytes' is the peak memory of the distance matrices (incl.
+        the copies of the solver) of the last comparison. """
+    def __init__(self, distanceCache: DistanceCache = None,
+                 maxDenseCells: int = None):
+        if distanceCache is None:
+            distanceCache = defaultDistanceCache
+        self.distanceCache = distanceCache
+        self.maxDenseCells = maxDenseCells
+        self.peakMatrixBytes = 0
         return
 
     def run(self,
             relTable1: RelTable,
             relTable2: RelTable) -> ComparisonTable:
-        distanceMatrix = generateDistMatrix(relTable1, relTable2)
-        associationLists = self.__findBestAssociation(distanceMatrix)
-        return self.__buildComparisonTable(relTable1,
-                                           relTable2,
-                                           associationLists,
-                                           distanceMatrix)
-
-    def __findBestAssociation(self, distanceMatrix: array) -> list:
-        return linear_sum_assignment(distanceMatrix)
+        return self.runIndexed(RelIndex(relTable1), RelIndex(relTable2))
+
+    def runIndexed(self,
+                   relIndex1: RelIndex,
+                   relIndex2: RelIndex) -> ComparisonTable:
+        """ Same as 'run', but for already indexed relations tables """
+        associationLists = self.findBestAssociation(relIndex1, relIndex2)
+        return self.__buildComparisonTable(relIndex1,
+                                           relIndex2,
+                                           associationLists)
+
+    def runMetrics(self,
+                   relTable1: RelTable,
+                   relTable2: RelTable) -> ComparisonMetrics:
+        return self.runIndexedMetrics(RelIndex(relTable1), RelIndex(relTable2))
+
+    def runIndexedMetrics(self,
+                          relIndex1: RelIndex,
+                          relIndex2: RelIndex) -> ComparisonMetrics:
+        """ Same metrics as 'runIndexed', calculated directly from the best
+            association, without building a ComparisonTable (which keeps
+            both relations tables alive) """
+        relIDs1, relIDs2, distances = self.findBestAssociation(relIndex1,
+                                                               relIndex2)
+        matchBits = calcMatchBits(relIndex1.columns,
+                                  relIndex2.columns,
+                                  relIDs1,
+                                  relIDs2)
+        return ComparisonMetrics(*calcStatistics(relIndex1.columns,
+                                                 relIndex2.columns,
+                                                 relIDs1,
+                                                 relIDs2,
+                                                 distances,
+                                                 matchBits))
+
+    def findBestAssociation(self,
+                            relIndex1: RelIndex,
+                            relIndex2: RelIndex) -> tuple:
+        """ IDs of the associated relations of both tables (ordered by the
+            IDs of table 1) and their matching distances """
+        self.peakMatrixBytes = 0
+        if isIdenticalTree(relIndex1, relIndex2):
+            relIDs = arange(relIndex1.length())
+            return (relIDs, relIDs.copy(),
+                    zeros(len(relIDs), dtype=uint8))
+
+        pairedIDs1, pairedIDs2 = pairIdenticalRelations(relIndex1, relIndex2)
+        restIDs1 = flatnonzero(~isAssociated(pairedIDs1, relIndex1.length()))
+        restIDs2 = flatnonzero(~isAssociated(pairedIDs2, relIndex2.length()))
+        if len(restIDs1) == 0 or len(restIDs2) == 0:
+            relIDs1 = zeros(0, dtype=int64)
+            relIDs2 = zeros(0, dtype=int64)
+            distances = zeros(0, dtype=uint8)
+        elif self.maxDenseCells is None \
+                or len(restIDs1) * len(restIDs2) <= self.maxDenseCells:
+            distanceMatrix = generateIndexedDistMatrix(relIndex1,
+                                                       relIndex2,
+                                                       self.distanceCache,
+                                                       restIDs1,
+                                                       restIDs2)
+            relIDs1, relIDs2 = linear_sum_assignment(distanceMatrix)
+            # the solver works on a float64 copy of the matrix
+            self.peakMatrixBytes = 9 * distanceMatrix.nbytes
+            distances = distanceMatrix[relIDs1, relIDs2]
+        else:
+            sparseDistances = generateIndexedDistances(relIndex1,
+                                                       relIndex2,
+                                                       self.distanceCache,
+                                                       restIDs1,
+                                                       restIDs2)
+            relIDs1, relIDs2, distances, self.peakMatrixBytes = \
+                solveSparse(len(restIDs1), len(restIDs2), *sparseDistances)
+
+        if len(pairedIDs1) == 0:
+            return (restIDs1[relIDs1], restIDs2[relIDs2], distances)
+        relIDs1 = concatenate([pairedIDs1, restIDs1[relIDs1]])
+        relIDs2 = concatenate([pairedIDs2, restIDs2[relIDs2]])
+        distances = concatenate([zeros(len(pairedIDs1), dtype=uint8),
+                                 distances.astype(uint8)])
+        order = argsort(relIDs1, kind="stable")
+        return (relIDs1[order], relIDs2[order], distances[order])
 
     def __buildComparisonTable(self,
-                               relTable1: RelTable,
-                               relTable2: RelTable,
-                               associationLists: list,
-                               distanceMatrix: array) -> ComparisonTable:
-        compTable = ComparisonTable()
-        relTable1_IDs: array = associationLists[0]
-        relTable2_IDs: array = associationLists[1]
-
-        for i in range(0, len(relTable1_IDs)):
-            rel1_ID = relTable1_IDs[i]
-            rel2_ID = relTable2_IDs[i]
-
-            rel1 = relTable1.get(rel1_ID)
-            rel2 = relTable2.get(rel2_ID)
-            matchingDist = distanceMatrix[rel1_ID][rel2_ID]
-            compTable.append(Comparison(rel1, rel2, matchingDist))
-
+                               relIndex1: RelIndex,
+                               relIndex2: RelIndex,
+                               associationLists: tuple) -> ComparisonTable:
+        relTable1_IDs, relTable2_IDs, distances = associationLists
+        matchBits = calcMatchBits(relIndex1.columns,
+                                  relIndex2.columns,
+                                  relTable1_IDs,
+                                  relTable2_IDs)
+        compTable = ComparisonTable(relIndex1.relTable,
+                                    relIndex2.relTable,
+                                    relTable1_IDs,
+                                    relTable2_IDs,
+                                    distances,
+                                    matchBits,
+                                    relIndex1.columns,
+                                    relIndex2.columns)
         compTable.runStatAnalysis()
         return compTable
 
@@ -47,18 +192,197 @@ class TableComparer():
 # Relation comparison
 
 
-def generateDistMatrix(relTable1: RelTable, relTable2: RelTable) -> array:
-    length1 = relTable1.length()
-    length2 = relTable2.length()
-    distMatrix = zeros([length1, length2])
-
-    for i in range(0, length1):
-        for j in range(0, length2):
-            distMatrix[i][j] = calcDistance(relTable1.get(i), relTable2.get(j))
+def generateDistMatrix(relTable1: RelTable,
+                       relTable2: RelTable,
+                       cache: DistanceCache = None) -> array:
+    return generateIndexedDistMatrix(RelIndex(relTable1),
+                                     RelIndex(relTable2),
+                                     cache)
+
+
+def generateIndexedDistMatrix(relIndex1: RelIndex,
+                              relIndex2: RelIndex,
+                              cache: DistanceCache = None,
+                              relIDs1: array = None,
+                              relIDs2: array = None) -> array:
+    """ Only relation pairs found by 'relIndex2.findCandidates' are scored,
+        all other pairs are NO_MATCHING. The matrix is of type uint8.
+        If relIDs1 and relIDs2 are given, then the matrix only contains
+        the rows and columns of those relations (in their order). """
+    if cache is None:
+        cache = defaultDistanceCache
+    relIDs1, colIDs, numCols = selectRelations(relIndex1, relIndex2,
+                                               relIDs1, relIDs2)
+    distMatrix = full([len(relIDs1), numCols], MatchingDistance.NO_MATCHING,
+                      dtype=uint8)
+
+    # signatures have been created only once per relation by the index
+    signatures1 = relIndex1.signatures
+    signatures2 = relIndex2.signatures
+
+    for row, i in zip(distMatrix, relIDs1):
+        sig1 = signatures1[i]
+        for j in relIndex2.findCandidates(sig1):
+            col = colIDs[j]
+            if col >= 0:
+                row[col] = cache.get(sig1, signatures2[j])
 
     return distMatrix
 
 
+def generateIndexedDistances(relIndex1: RelIndex,
+                             relIndex2: RelIndex,
+                             cache: DistanceCache = None,
+                             relIDs1: array = None,
+                             relIDs2: array = None) -> tuple:
+    """ Sparse counterpart of 'generateIndexedDistMatrix': arrays with the
+        row IDs, column IDs and distances of all relation pairs with a
+        matching distance other than NO_MATCHING """
+    if cache is None:
+        cache = defaultDistanceCache
+    relIDs1, colIDs, _ = selectRelations(relIndex1, relIndex2,
+                                         relIDs1, relIDs2)
+    rows = []
+    cols = []
+    distances = []
+    signatures1 = relIndex1.signatures
+    signatures2 = relIndex2.signatures
+    for row, i in enumerate(relIDs1):
+        sig1 = signatures1[i]
+        for j in relIndex2.findCandidates(sig1):
+            col = colIDs[j]
+            if col < 0:
+                continue
+            dist = cache.get(sig1, signatures2[j])
+            if dist != MatchingDistance.NO_MATCHING:
+                rows.append(row)
+                cols.append(col)
+                distances.append(dist)
+    return (array(rows, dtype=int64),
+            array(cols, dtype=int64),
+            array(distances, dtype=uint8))
+
+
+def selectRelations(relIndex1: RelIndex, relIndex2: RelIndex,
+                    relIDs1: array = None, relIDs2: array = None) -> tuple:
+    """ Rows and columns of a distance matrix of the selected relations of
+        both tables (all if None): the relation IDs of the rows, the column
+        of each relation of table 2 (-1 if not selected) and the number of
+        columns """
+    if relIDs1 is None:
+        relIDs1 = range(relIndex1.length())
+    if relIDs2 is None:
+        return (relIDs1, range(relIndex2.length()), relIndex2.length())
+    colIDs = [-1] * relIndex2.length()
+    for col, relID in enumerate(relIDs2):
+        colIDs[relID] = col
+    return (relIDs1, colIDs, len(relIDs2))
+
+
+def isIdenticalTree(relIndex1: RelIndex, relIndex2: RelIndex) -> bool:
+    return relIndex1.treeHash is not None \
+        and relIndex1.treeHash == relIndex2.treeHash \
+        and relIndex1.length() == relIndex2.length()
+
+
+def pairIdenticalRelations(relIndex1: RelIndex, relIndex2: RelIndex) -> tuple:
+    """ IDs of the relations of both tables that belong to identical
+        subtrees (equal subtree hash and signature, see 'RelIndex'). Those
+        are equal, so that associating them directly keeps the association
+        best: a relation has a matching distance of COMPLETE_SAME_CS only to
+        relations with the same CS, of which each tree has at most one, and
+        the matching distances fulfill the triangle inequality. """
+    subtreeIDs2 = {key: relID
+                   for relID, key in enumerate(relIndex2.subtreeKeys)
+                   if key is not None}
+    relIDs1 = []
+    relIDs2 = []
+    if subtreeIDs2:
+        for relID, key in enumerate(relIndex1.subtreeKeys):
+            relID2 = subtreeIDs2.pop(key, None) if key is not None else None
+            if relID2 is not None:
+                relIDs1.append(relID)
+                relIDs2.append(relID2)
+    return (array(relIDs1, dtype=int64), array(relIDs2, dtype=int64))
+
+
+def solveSparse(length1: int, length2: int,
+                rows: array, cols: array, distances: array) -> tuple:
+    """ Best association of a sparse distance matrix (see
+        'generateIndexedDistances'). Relations, which are connected by
+        distances other than NO_MATCHING, form blocks that are associated
+        separately; as only those can be matched, the total distance equals
+        the one of the whole matrix. Equally good associations may be
+        chosen differently than by solving the whole matrix, as the solver
+        breaks ties depending on all rows, so that the metrics may differ
+        from the dense ones. The remaining relations are associated in
+        order of their IDs with distance NO_MATCHING.
+        Returns the associated IDs of both tables (ordered by the IDs of
+        table 1), their distances and the peak bytes of the blocks. """
+    # bipartite graph: nodes 0..length1-1 of table 1, then those of table 2
+    numNodes = length1 + length2
+    graph = coo_matrix((ones(len(rows), dtype=uint8),
+                        (rows, length1 + cols)),
+                       shape=(numNodes, numNodes))
+    numBlocks, blockIDs = connected_components(graph, directed=False)
+    rowOrder, rowBounds, localRows = groupByBlock(blockIDs[:length1],
+                                                  numBlocks)
+    colOrder, colBounds, localCols = groupByBlock(blockIDs[length1:],
+                                                  numBlocks)
+    edgeOrder, edgeBounds, _ = groupByBlock(blockIDs[rows], numBlocks)
+
+    peakBytes = rows.nbytes + cols.nbytes + distances.nbytes
+    assocIDs1 = []
+    assocIDs2 = []
+    assocDistances = []
+    for block in unique(blockIDs[rows]):
+        blockRows = rowOrder[rowBounds[block]:rowBounds[block + 1]]
+        blockCols = colOrder[colBounds[block]:colBounds[block + 1]]
+        edges = edgeOrder[edgeBounds[block]:edgeBounds[block + 1]]
+        # only the solved block is converted to the solver's float64
+        blockMatrix = full([len(blockRows), len(blockCols)],
+                           float(MatchingDistance.NO_MATCHING))
+        blockMatrix[localRows[rows[edges]],
+                    localCols[cols[edges]]] = distances[edges]
+        blockIDs1, blockIDs2 = linear_sum_assignment(blockMatrix)
+        assocIDs1.append(blockRows[blockIDs1])
+        assocIDs2.append(blockCols[blockIDs2])
+        assocDistances.append(blockMatrix[blockIDs1, blockIDs2])
+        peakBytes = max(peakBytes, rows.nbytes + cols.nbytes
+                        + distances.nbytes + blockMatrix.nbytes)
+
+    relIDs1 = concatenate(assocIDs1 + [zeros(0, dtype=int64)])
+    relIDs2 = concatenate(assocIDs2 + [zeros(0, dtype=int64)])
+    freeIDs1 = flatnonzero(~isAssociated(relIDs1, length1))
+    freeIDs2 = flatnonzero(~isAssociated(relIDs2, length2))
+    numFree = min(len(freeIDs1), len(freeIDs2))
+    relIDs1 = concatenate([relIDs1, freeIDs1[:numFree]])
+    relIDs2 = concatenate([relIDs2, freeIDs2[:numFree]])
+    pairDistances = concatenate(assocDistances
+                                + [full(numFree,
+                                        MatchingDistance.NO_MATCHING)])
+
+    order = argsort(relIDs1, kind="stable")
+    return (relIDs1[order], relIDs2[order],
+            pairDistances[order].astype(uint8), peakBytes)
+
+
+def groupByBlock(blockIDs: array, numBlocks: int) -> tuple:
+    """ IDs ordered by block, the bounds of each block in that order, and
+        the index of each ID inside its block """
+    order = argsort(blockIDs, kind="stable")
+    bounds = searchsorted(blockIDs[order], arange(numBlocks + 1))
+    localIDs = zeros(len(blockIDs), dtype=int64)
+    localIDs[order] = arange(len(blockIDs)) - bounds[blockIDs[order]]
+    return (order, bounds, localIDs)
+
+
+def isAssociated(relIDs: array, length: int) -> array:
+    associated = zeros(length, dtype=bool)
+    associated[relIDs] = True
+    return associated
+
+
 def calcDistance(rel1: Relation, rel2: Relation) -> int:
     noMultinuclearRelations = (not rel1.isMultiNuclear) \
                               and (not rel2.isMultiNuclear)
@@ -81,6 +405,26 @@ def calcDistance(rel1: Relation, rel2: Relation) -> int:
                     return MatchingDistance.PARTIALLY_SAME_CS
 
 
+def calcSignatureDistance(sig1: tuple, sig2: tuple) -> int:
+    """ Same as 'calcDistance', but based on relation signatures
+        (see 'createSignature') """
+    multiNuc1, cSpan1, aSpan1, csSpans1 = sig1
+    multiNuc2, cSpan2, aSpan2, csSpans2 = sig2
+
+    if csSpans1 == csSpans2:
+        return MatchingDistance.COMPLETE_SAME_CS
+    elif cSpan1 == cSpan2 and aSpan1 == aSpan2:
+        return MatchingDistance.SAME_C_SAME_A
+    elif cSpan1 == aSpan2 and aSpan1 == cSpan2:
+        return MatchingDistance.SWITCHED_C_AND_A
+    elif (not multiNuc1) and (not multiNuc2):
+        return MatchingDistance.NO_MATCHING
+    elif csSpans1.isdisjoint(csSpans2):
+        return MatchingDistance.NO_MATCHING
+    else:
+        return MatchingDistance.PARTIALLY_SAME_CS
+
+
 def oldCheckForEqualCS(rel1: Relation, rel2: Relation) -> bool:
     len1 = len(rel1.centralSubconstituent)
     len2 = len(rel2.centralSubconstituent)
@@ -0,0 +1,85 @@
+from .relationstable import RelTable, RelColumns, createSignature
+
+from collections import defaultdict
+
+
+class SpanBuckets():
+    """ Relation IDs bucketed by the spans of their CS elements,
+        constituents and attachment points, for looking up the relations
+        which can be matched to a relation (see 'findCandidates').
+        Relations with an empty CS are bucketed in 'csBuckets[None]'. """
+
+    def __init__(self):
+        self.csBuckets = defaultdict(list)
+        self.constituentBuckets = defaultdict(list)
+        self.attachmentBuckets = defaultdict(list)
+
+    def addRelation(self, relID: int, signature: tuple):
+        _, constituentSpan, attachmentSpan, csSpans = signature
+        for span in csSpans:
+            self.csBuckets[span].append(relID)
+        if not csSpans:
+            self.csBuckets[None].append(relID)
+        self.constituentBuckets[constituentSpan].append(relID)
+        self.attachmentBuckets[attachmentSpan].append(relID)
+
+    def removeRelation(self, relID: int, signature: tuple):
+        """ Inverse of 'addRelation' """
+        _, constituentSpan, attachmentSpan, csSpans = signature
+        for span in csSpans:
+            removeFromBucket(self.csBuckets, span, relID)
+        if not csSpans:
+            removeFromBucket(self.csBuckets, None, relID)
+        removeFromBucket(self.constituentBuckets, constituentSpan, relID)
+        removeFromBucket(self.attachmentBuckets, attachmentSpan, relID)
+
+    def findCandidates(self, signature: tuple) -> set:
+        """ IDs of all bucketed relations which can have a matching distance
+            other than NO_MATCHING to a relation with the given signature:
+            at least one shared CS element (COMPLETE_SAME_CS or
+            PARTIALLY_SAME_CS), the same constituent (SAME_C_SAME_A) or the
+            constituent as attachment point (SWITCHED_C_AND_A) """
+        _, constituentSpan, _, csSpans = signature
+        candidates = set(self.constituentBuckets.get(constituentSpan, ()))
+        candidates.update(self.attachmentBuckets.get(constituentSpan, ()))
+        for span in csSpans:
+            candidates.update(self.csBuckets.get(span, ()))
+        if not csSpans:
+            candidates.update(self.csBuckets.get(None, ()))
+        return candidates
+
+
+class RelIndex(SpanBuckets):
+    """ Precomputed lookup structures of a relations table: its column-wise
+        encoding, the signature of each relation (see 'createSignature')
+        and the relation IDs bucketed by their spans (see 'SpanBuckets').
+        Building the index once allows to reuse it for many comparisons.
+        Relations of identical subtrees of two tables are found via
+        'subtreeKeys' (see 'pairIdenticalRelations'). """
+
+    def __init__(self, relTable: RelTable):
+        super().__init__()
+        self.relTable = relTable
+        self.columns = RelColumns(relTable)
+        self.signatures = []
+        self.treeHash = relTable.treeHash
+        self.subtreeKeys = []
+
+        for relID, rel in enumerate(relTable):
+            signature = createSignature(rel)
+            self.signatures.append(signature)
+            if rel.subtreeHash is None:
+                self.subtreeKeys.append(None)
+            else:
+                self.subtreeKeys.append((rel.subtreeHash, signature))
+            self.addRelation(relID, signature)
+
+    def length(self):
+        return len(self.signatures)
+
+
+def removeFromBucket(buckets: dict, span, relID: int):
+    bucket = buckets[span]
+    bucket.remove(relID)
+    if not bucket:
+        del buckets[span]
@@ -1,3 +1,5 @@
+from numpy import array, zeros
+
 
 class RelElement():
     """ Describes one of the two (or more) elements belonging to a relation """
@@ -15,6 +17,9 @@ class Relation():
         self.constituent = RelElement()
         self.attachmentPoint = RelElement()
         self.centralSubconstituent = []
+        # hash of the smallest subtree containing the relation, None if
+        # unknown (see 'createSubtreeHash')
+        self.subtreeHash = None
 
 
 class RelTable():
@@ -22,6 +27,8 @@ class RelTable():
 
     def __init__(self):
         self.__relations = []
+        # hash of the whole RST tree, None if unknown
+        self.treeHash = None
 
     def get(self, index: int):
         return self.__relations[index]
@@ -43,3 +50,46 @@ class RelTable():
         newTable._RelTable__relations += self.__relations
         newTable._RelTable__relations += relTable._RelTable__relations
         return newTable
+
+
+def createSignature(rel: Relation) -> tuple:
+    """ Compact hashable signature of all relation properties relevant for
+        the matching distance: (multi-nuclear, C span, A span, CS spans) """
+    csSpans = frozenset((elem.minID, elem.maxID)
+                        for elem in rel.centralSubconstituent)
+    return (rel.isMultiNuclear,
+            (rel.constituent.minID, rel.constituent.maxID),
+            (rel.attachmentPoint.minID, rel.attachmentPoint.maxID),
+            csSpans)
+
+
+class RelColumns():
+    """ Column-wise (NumPy) encoding of a relations table, one array entry
+        per relation. 'direction' encodes the nuclearity: 0 for
+        multi-nuclear (or overlapping C and A), 1 for C before A,
+        2 for C after A """
+    def __init__(self, relTable: RelTable):
+        length = relTable.length()
+        self.name = array([rel.name for rel in relTable], dtype=object)
+        self.isMultiNuclear = zeros(length, dtype=bool)
+        self.constituent = zeros([length, 3], dtype=int)
+        self.attachmentPoint = zeros([length, 3], dtype=int)
+        self.direction = zeros(length, dtype=int)
+
+        for relID, rel in enumerate(relTable):
+            const = rel.constituent
+            attP = rel.attachmentPoint
+            self.isMultiNuclear[relID] = rel.isMultiNuclear
+            self.constituent[relID] = (const.minID, const.maxID,
+                                       const.isNuclear)
+            self.attachmentPoint[relID] = (attP.minID, attP.maxID,
+                                           attP.isNuclear)
+            if rel.isMultiNuclear:
+                self.direction[relID] = 0
+            elif const.maxID < attP.minID:
+                self.direction[relID] = 1
+            elif const.minID > attP.maxID:
+                self.direction[relID] = 2
+
+    def length(self):
+        return len(self.name)
@@ -22,6 +22,7 @@ class TableGenerator():
             relation.attachmentPoint = extractRelElement(node=monoNuc.end,
                                                          isNuclear=True)
             relation.centralSubconstituent = cs
+            relation.subtreeHash = findMonoNucOwner(monoNuc).subtreeHash
             monoRelTable.append(relation)
 
         # process multi-nuclear relations
@@ -42,13 +43,25 @@ class TableGenerator():
                                                          isNuclear=True)
                 relation.attachmentPoint = extractRelElement(node=pseudoNode,
                                                              isNuclear=True)
+                relation.subtreeHash = multiNuc.parent.subtreeHash
                 multiRelTable.append(relation)
 
         # sort relations table
         monoRelTable.sort(key=sortRels)
         multiRelTable.sort(key=sortRels)
 
-        return monoRelTable + multiRelTable
+        relTable = monoRelTable + multiRelTable
+        if rstTree.root is not None:
+            relTable.treeHash = rstTree.root.subtreeHash
+        return relTable
+
+
+def findMonoNucOwner(monoNuc: MonoNucRelation) -> RstNode:
+    """ Root of the smallest subtree containing a mono-nuclear relation:
+        the span of satellite and nucleus, otherwise the nucleus itself """
+    if isinstance(monoNuc.start.toParent, Span):
+        return monoNuc.start.toParent.parent
+    return monoNuc.end
 
 
 def sortRels(rel: Relation):
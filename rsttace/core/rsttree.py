@@ -1,6 +1,10 @@
 from enum import IntEnum
+from hashlib import blake2b
 from typing import List
 
+# Bytes of the structural hashes of subtrees (see 'createSubtreeHash')
+SUBTREE_HASH_SIZE = 16
+
 
 class RstType(IntEnum):
     MONO_NUCLEAR = 0
@@ -15,6 +19,7 @@ class RstNode():
     toChildren = None
     text = None
     segmentID = None
+    subtreeHash = None
 
 
 class MonoNucRelation():
@@ -59,3 +64,32 @@ class RstTree():
         self.monoNucs = monoNucs
         self.multiNucs = multiNucs
         return
+
+
+def createSubtreeHash(node: RstNode) -> bytes:
+    """ Structural (Merkle) hash of the subtree of node: its segment span,
+        whether it is a segment, the type and relation of its children, the
+        relations and nuclei of its satellites, and the hashes of its
+        children and satellites, which have to be created first. The text
+        of the segments is not hashed, so that equal hashes imply equal
+        relations of both subtrees. """
+    digest = blake2b(digest_size=SUBTREE_HASH_SIZE)
+    digest.update(repr((node.segmentID, node.text is not None)).encode())
+    if isinstance(node.toChildren, Span):
+        digest.update(b"span")
+    elif isinstance(node.toChildren, MultiNucRelation):
+        digest.update(repr(("multinuc", node.toChildren.relation)).encode())
+    children = [] if node.toChildren is None else node.toChildren.children
+    for child in children:
+        digest.update(child.subtreeHash)
+        monoNuc = child.toSibling
+        if monoNuc is not None and monoNuc.start is child:
+            digest.update(repr(("rst", monoNuc.relation,
+                                monoNuc.end.segmentID)).encode())
+    # satellites outside of spans are part of the subtree of their nucleus
+    monoNuc = node.toSibling
+    if monoNuc is not None and monoNuc.end is node \
+            and not isinstance(node.toParent, Span):
+        digest.update(repr(("satellite", monoNuc.relation)).encode())
+        digest.update(monoNuc.start.subtreeHash)
+    return digest.digest()
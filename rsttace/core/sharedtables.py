@@ -0,0 +1,199 @@
+from .relationstable import RelTable, Relation, RelElement
+from .rsttree import SUBTREE_HASH_SIZE
+
+from multiprocessing.shared_memory import SharedMemory
+from numpy import array, ndarray, zeros, cumsum, frombuffer, dtype
+from numpy import int32, int64, uint8
+
+# Columns of the encoded relations: relation name ID, multi-nuclearity and
+# the (minID, maxID, isNuclear, isLeaf) of constituent and attachment point
+RELATION_COLUMNS = 10
+
+# Columns of the encoded central subconstituent elements
+ELEMENT_COLUMNS = 4
+
+# Columns of the encoded subtree hashes: 1 if the hash is known, its bytes
+HASH_COLUMNS = 1 + SUBTREE_HASH_SIZE
+
+
+class SharedRelTables():
+    """ Relations tables of a set of RST trees (name -> RelTable), encoded
+        as flat NumPy arrays in one block of shared memory. The tables are
+        published once by 'publish', other processes attach to the block by
+        its picklable 'handle' without copying it (see 'attach') and decode
+        single tables on demand ('get').
+        The publishing process has to 'unlink' the block after use, each
+        process has to 'close' it. """
+
+    def __init__(self, sharedMemory: SharedMemory, layout: dict):
+        self.sharedMemory = sharedMemory
+        self.layout = layout
+        self.arrays = {}
+        for field, (offset, dtypeName, shape) in layout.items():
+            fieldType = dtype(dtypeName)
+            count = int(array(shape).prod())
+            self.arrays[field] = frombuffer(sharedMemory.buf,
+                                            dtype=fieldType,
+                                            count=count,
+                                            offset=offset).reshape(shape)
+        self.tableNames = decodeStrings(self.arrays["tableNames"],
+                                        self.arrays["tableNameOffsets"])
+        self.relationNames = decodeStrings(self.arrays["relationNames"],
+                                           self.arrays["relationNameOffsets"])
+        self.tableIDs = {name: tableID
+                         for tableID, name in enumerate(self.tableNames)}
+
+    @staticmethod
+    def publish(relTables: dict) -> "SharedRelTables":
+        """ Encodes relTables into a new block of shared memory """
+        arrays = encodeRelTables(relTables)
+        layout = {}
+        size = 0
+        for field, values in arrays.items():
+            # keep all arrays aligned to 8 bytes
+            size += -size % 8
+            layout[field] = (size, values.dtype.str, values.shape)
+            size += values.nbytes
+        sharedMemory = SharedMemory(create=True, size=max(size, 1))
+        for field, values in arrays.items():
+            offset = layout[field][0]
+            sharedMemory.buf[offset:offset + values.nbytes] = \
+                values.tobytes()
+        return SharedRelTables(sharedMemory, layout)
+
+    @staticmethod
+    def attach(handle: tuple) -> "SharedRelTables":
+        """ Attaches to the block of shared memory of handle """
+        name, layout = handle
+        return SharedRelTables(SharedMemory(name=name), layout)
+
+    @property
+    def handle(self) -> tuple:
+        return (self.sharedMemory.name, self.layout)
+
+    def names(self) -> list:
+        return list(self.tableNames)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.tableIDs
+
+    def get(self, name: str) -> RelTable:
+        """ Decodes the relations table of name """
+        tableID = self.tableIDs[name]
+        tableOffsets = self.arrays["tableOffsets"]
+        relations = self.arrays["relations"]
+        elements = self.arrays["elements"]
+        elementOffsets = self.arrays["elementOffsets"]
+
+        relationHashes = self.arrays["relationHashes"]
+
+        relTable = RelTable()
+        relTable.treeHash = decodeHash(self.arrays["tableHashes"][tableID])
+        for relID in range(tableOffsets[tableID], tableOffsets[tableID + 1]):
+            row = relations[relID].tolist()
+            rel = Relation()
+            rel.name = self.relationNames[row[0]]
+            rel.isMultiNuclear = bool(row[1])
+            rel.constituent = decodeRelElement(row[2:6])
+            rel.attachmentPoint = decodeRelElement(row[6:10])
+            rel.centralSubconstituent = [
+                decodeRelElement(element)
+                for element in elements[elementOffsets[relID]:
+                                        elementOffsets[relID + 1]].tolist()]
+            rel.subtreeHash = decodeHash(relationHashes[relID])
+            relTable.append(rel)
+        return relTable
+
+    def close(self):
+        # views on the buffer have to be released before closing it
+        self.arrays = {}
+        self.sharedMemory.close()
+
+    def unlink(self):
+        self.sharedMemory.unlink()
+
+
+def encodeRelTables(relTables: dict) -> dict:
+    """ Flat arrays of relTables (see 'SharedRelTables') """
+    relationNames = {}
+    relations = []
+    elements = []
+    numRelations = []
+    numElements = []
+    tableHashes = []
+    relationHashes = []
+    for relTable in relTables.values():
+        numRelations.append(relTable.length())
+        tableHashes.append(encodeHash(relTable.treeHash))
+        for rel in relTable:
+            relationHashes.append(encodeHash(rel.subtreeHash))
+            nameID = relationNames.setdefault(rel.name, len(relationNames))
+            relations.append([nameID, rel.isMultiNuclear]
+                             + encodeRelElement(rel.constituent)
+                             + encodeRelElement(rel.attachmentPoint))
+            numElements.append(len(rel.centralSubconstituent))
+            elements.extend(encodeRelElement(element)
+                            for element in rel.centralSubconstituent)
+
+    tableNames, tableNameOffsets = encodeStrings(list(relTables))
+    names, nameOffsets = encodeStrings(list(relationNames))
+    return {"tableNames": tableNames,
+            "tableNameOffsets": tableNameOffsets,
+            "relationNames": names,
+            "relationNameOffsets": nameOffsets,
+            "tableOffsets": createOffsets(numRelations),
+            "relations": array(relations, dtype=int32)
+            .reshape(-1, RELATION_COLUMNS),
+            "elementOffsets": createOffsets(numElements),
+            "elements": array(elements, dtype=int32)
+            .reshape(-1, ELEMENT_COLUMNS),
+            "tableHashes": frombuffer(b"".join(tableHashes), dtype=uint8)
+            .reshape(-1, HASH_COLUMNS),
+            "relationHashes": frombuffer(b"".join(relationHashes),
+                                         dtype=uint8)
+            .reshape(-1, HASH_COLUMNS)}
+
+
+def encodeRelElement(relElem: RelElement) -> list:
+    return [relElem.minID, relElem.maxID,
+            relElem.isNuclear, relElem.isLeaf]
+
+
+def decodeRelElement(values: list) -> RelElement:
+    relElem = RelElement()
+    relElem.minID = values[0]
+    relElem.maxID = values[1]
+    relElem.isNuclear = bool(values[2])
+    relElem.isLeaf = bool(values[3])
+    return relElem
+
+
+def encodeHash(subtreeHash: bytes) -> bytes:
+    if subtreeHash is None:
+        return bytes(HASH_COLUMNS)
+    return b"\x01" + subtreeHash
+
+
+def decodeHash(values: ndarray) -> bytes:
+    if values[0] == 0:
+        return None
+    return values[1:].tobytes()
+
+
+def createOffsets(lengths: list) -> ndarray:
+    offsets = zeros(len(lengths) + 1, dtype=int64)
+    offsets[1:] = cumsum(lengths)
+    return offsets
+
+
+def encodeStrings(strings: list) -> tuple:
+    """ UTF-8 bytes of all strings and their offsets """
+    encoded = [string.encode("utf-8") for string in strings]
+    return (frombuffer(b"".join(encoded), dtype=uint8).copy(),
+            createOffsets([len(string) for string in encoded]))
+
+
+def decodeStrings(buffer: ndarray, offsets: ndarray) -> list:
+    content = buffer.tobytes()
+    return [content[start:end].decode("utf-8")
+            for start, end in zip(offsets[:-1], offsets[1:])]
@@ -0,0 +1,239 @@
+from .relationstable import RelTable, Relation
+from .relationindex import RelIndex
+from .comparisontable import MatchingDistance
+from .comptablegenerator import TableComparer, DistanceCache
+from .comptablegenerator import isAssociated
+
+from concurrent.futures import ProcessPoolExecutor
+from numpy import array, zeros, full, argsort, concatenate, flatnonzero
+from numpy import cumsum, int64, uint8
+from bisect import bisect_right
+
+# Default maximal number of segments of a window (see 'createWindows')
+DEFAULT_WINDOW_SIZE = 200
+
+
+class WindowedComparer(TableComparer):
+    """ Compares two relations tables window by window, e.g. for very long
+        documents: the segment IDs are partitioned into windows (the given
+        windows (minID, maxID), otherwise see 'createWindows'), and the
+        relations inside each window are associated independently (by
+        'jobs' processes). Relations that cross the bounds of the windows,
+        and all relations connected to them by matching distances other than
+        NO_MATCHING (see 'findBoundaryRelations'), are associated separately
+        in a reconciliation pass. Relations of different windows cannot be
+        matched, so that the total distance (and the number of associated
+        relation pairs) equals the one of 'TableComparer'. Equally good
+        associations may be chosen differently though, so that for tables
+        with such ties the metrics can differ from those of 'TableComparer'.
+        Unmatched relations are associated in order of their IDs.
+        'peakMatrixBytes' is the maximum of all windows. """
+    def __init__(self, windowSize: int = DEFAULT_WINDOW_SIZE,
+                 windows: list = None,
+                 jobs: int = 1,
+                 distanceCache: DistanceCache = None,
+                 maxDenseCells: int = None):
+        super().__init__(distanceCache, maxDenseCells)
+        self.windowSize = windowSize
+        self.windows = windows
+        self.jobs = jobs
+        # windows of the last comparison
+        self.lastWindows = []
+
+    def findBestAssociation(self,
+                            relIndex1: RelIndex,
+                            relIndex2: RelIndex) -> tuple:
+        windows = self.windows
+        if windows is None:
+            windows = createWindows(relIndex1.relTable, relIndex2.relTable,
+                                    self.windowSize)
+        windows = sorted(windows)
+        checkWindows(windows)
+        self.lastWindows = windows
+
+        windowIDs1 = assignWindows(relIndex1.relTable, windows)
+        windowIDs2 = assignWindows(relIndex2.relTable, windows)
+        boundary1, boundary2 = findBoundaryRelations(
+            relIndex1, relIndex2,
+            flatnonzero(windowIDs1 < 0), flatnonzero(windowIDs2 < 0),
+            self.distanceCache)
+        # the reconciliation pass is the group of window -1
+        windowIDs1[boundary1] = -1
+        windowIDs2[boundary2] = -1
+
+        groups = []
+        for windowID in range(-1, len(windows)):
+            groupIDs1 = flatnonzero(windowIDs1 == windowID)
+            groupIDs2 = flatnonzero(windowIDs2 == windowID)
+            if len(groupIDs1) > 0 and len(groupIDs2) > 0:
+                groups.append((groupIDs1, groupIDs2))
+        tasks = [(createSubTable(relIndex1.relTable, groupIDs1),
+                  createSubTable(relIndex2.relTable, groupIDs2),
+                  self.maxDenseCells)
+                 for groupIDs1, groupIDs2 in groups]
+
+        if self.jobs > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                results = list(pool.map(associateWindow, tasks))
+        else:
+            results = [associateWindow(task, self.distanceCache)
+                       for task in tasks]
+
+        self.peakMatrixBytes = max([peakBytes for *_, peakBytes in results],
+                                   default=0)
+        return mergeAssociations(relIndex1.length(), relIndex2.length(),
+                                 groups, results)
+
+
+def createWindows(relTable1: RelTable, relTable2: RelTable,
+                  windowSize: int = DEFAULT_WINDOW_SIZE) -> list:
+    """ Partition of the segment IDs of both tables into windows (minID,
+        maxID) of at most windowSize segments. Each window is cut in its
+        second half, between the segments crossed by the fewest relations,
+        i.e. between top-level spans if possible. """
+    spans = [relationSpan(rel) for relTable in (relTable1, relTable2)
+             for rel in relTable]
+    if not spans:
+        return []
+    firstID = min(minID for minID, _ in spans)
+    lastID = max(maxID for _, maxID in spans)
+
+    # crossings[b]: number of relations crossing the cut after segment
+    # firstID + b
+    changes = zeros(lastID - firstID + 2, dtype=int64)
+    for minID, maxID in spans:
+        changes[minID - firstID] += 1
+        changes[maxID - firstID] -= 1
+    crossings = cumsum(changes)
+
+    windows = []
+    start = firstID
+    while lastID - start + 1 > windowSize:
+        cuts = range(start + max(windowSize // 2, 1) - 1,
+                     start + windowSize)
+        # prefer the last of equally good cuts
+        cut = min(reversed(cuts),
+                  key=lambda cut: crossings[cut - firstID])
+        windows.append((start, cut))
+        start = cut + 1
+    windows.append((start, lastID))
+    return windows
+
+
+def checkWindows(windows: list):
+    """ Raises a ValueError if the sorted windows are invalid or overlap """
+    for index, (minID, maxID) in enumerate(windows):
+        if minID > maxID:
+            raise ValueError("Invalid window of segments: "
+                             + str(minID) + "-" + str(maxID))
+        if index > 0 and minID <= windows[index - 1][1]:
+            raise ValueError("Overlapping windows of segments: "
+                             + str(windows[index - 1]) + " and "
+                             + str((minID, maxID)))
+
+
+def relationSpan(rel: Relation) -> tuple:
+    """ Segment IDs (minID, maxID) covered by rel """
+    elements = [rel.constituent, rel.attachmentPoint] \
+        + rel.centralSubconstituent
+    return (min(elem.minID for elem in elements),
+            max(elem.maxID for elem in elements))
+
+
+def assignWindows(relTable: RelTable, windows: list) -> array:
+    """ Index of the window of each relation of relTable, -1 for relations
+        which are not inside any of the (sorted) windows """
+    starts = [minID for minID, _ in windows]
+    windowIDs = full(relTable.length(), -1, dtype=int64)
+    for relID, rel in enumerate(relTable):
+        minID, maxID = relationSpan(rel)
+        windowID = bisect_right(starts, minID) - 1
+        if windowID >= 0 and maxID <= windows[windowID][1]:
+            windowIDs[relID] = windowID
+    return windowIDs
+
+
+def findBoundaryRelations(relIndex1: RelIndex,
+                          relIndex2: RelIndex,
+                          crossingIDs1: array,
+                          crossingIDs2: array,
+                          cache: DistanceCache) -> tuple:
+    """ IDs of the relations of both tables, which are connected to the
+        crossing relations by matching distances other than NO_MATCHING
+        (including those). Only the neighbourhood of the crossing relations
+        is searched, not the whole tables. """
+    indexes = (relIndex1, relIndex2)
+    found = (set(int(relID) for relID in crossingIDs1),
+             set(int(relID) for relID in crossingIDs2))
+    remaining = [(0, relID) for relID in found[0]] \
+        + [(1, relID) for relID in found[1]]
+    while remaining:
+        side, relID = remaining.pop()
+        other = 1 - side
+        signature = indexes[side].signatures[relID]
+        for otherID in indexes[other].findCandidates(signature):
+            if otherID in found[other]:
+                continue
+            otherSignature = indexes[other].signatures[otherID]
+            if side == 0:
+                dist = cache.get(signature, otherSignature)
+            else:
+                dist = cache.get(otherSignature, signature)
+            if dist != MatchingDistance.NO_MATCHING:
+                found[other].add(otherID)
+                remaining.append((other, otherID))
+    return (array(sorted(found[0]), dtype=int64),
+            array(sorted(found[1]), dtype=int64))
+
+
+def createSubTable(relTable: RelTable, relIDs: array) -> RelTable:
+    subTable = RelTable()
+    for relID in relIDs:
+        subTable.append(relTable.get(relID))
+    return subTable
+
+
+def associateWindow(task: tuple, distanceCache: DistanceCache = None) -> tuple:
+    """ Best association of the relations tables of a window (see
+        'TableComparer.findBestAssociation') and its peak matrix bytes """
+    relTable1, relTable2, maxDenseCells = task
+    tableComparer = TableComparer(distanceCache, maxDenseCells)
+    relIDs1, relIDs2, distances = tableComparer.findBestAssociation(
+        RelIndex(relTable1), RelIndex(relTable2))
+    return (relIDs1, relIDs2, distances, tableComparer.peakMatrixBytes)
+
+
+def mergeAssociations(length1: int, length2: int,
+                      groups: list, results: list) -> tuple:
+    """ Association of both tables from the matched relation pairs of the
+        associations of their groups of relations; the remaining relations
+        are associated in order of their IDs with distance NO_MATCHING """
+    assocIDs1 = [zeros(0, dtype=int64)]
+    assocIDs2 = [zeros(0, dtype=int64)]
+    assocDistances = [zeros(0, dtype=uint8)]
+    for (groupIDs1, groupIDs2), (relIDs1, relIDs2, distances, _) \
+            in zip(groups, results):
+        matched = (distances != MatchingDistance.NO_MATCHING)
+        assocIDs1.append(groupIDs1[relIDs1[matched]])
+        assocIDs2.append(groupIDs2[relIDs2[matched]])
+        assocDistances.append(distances[matched].astype(uint8))
+
+    relIDs1 = concatenate(assocIDs1)
+    relIDs2 = concatenate(assocIDs2)
+    freeIDs1 = flatnonzero(~isAssociated(relIDs1, length1))
+    freeIDs2 = flatnonzero(~isAssociated(relIDs2, length2))
+    numFree = min(len(freeIDs1), len(freeIDs2))
+    relIDs1 = concatenate([relIDs1, freeIDs1[:numFree]])
+    relIDs2 = concatenate([relIDs2, freeIDs2[:numFree]])
+    distances = concatenate(assocDistances
+                            + [full(numFree, MatchingDistance.NO_MATCHING,
+                                    dtype=uint8)])
+
+    order = argsort(relIDs1, kind="stable")
+    return (relIDs1[order], relIDs2[order], distances[order])
+
+
+def selectSegments(relTable: RelTable, minID: int, maxID: int) -> RelTable:
+    """ Relations of relTable inside the segments minID to maxID """
+    windowIDs = assignWindows(relTable, [(minID, maxID)])
+    return createSubTable(relTable, flatnonzero(windowIDs == 0))
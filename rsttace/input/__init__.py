@@ -6,4 +6,10 @@ Created on Sat Nov 23 00:49:01 2018
 """
 
 from .parser import RstTreeParser
+from .parser import RstBytesParser
+from .parser import RstFileObjectParser
 from .parser import InvalidRstFile
+from .partials import PartialResultsReader
+from .partials import InvalidPartialResultsFile
+from .rstsets import RstDirectory, RstArchive
+from .rstsets import isArchive, isRstSet, openRstSet
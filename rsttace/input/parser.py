@@ -1,6 +1,7 @@
 from rsttace.controller import IRstInput
 from rsttace.core import RstTree, RstType, RstNode
 from rsttace.core.rsttree import MonoNucRelation, MultiNucRelation, Span
+from rsttace.core.rsttree import createSubtreeHash
 
 from errno import ENOENT
 from os import strerror
@@ -15,28 +16,64 @@ class InvalidRstFile(Exception):
 
 class RstTreeParser(IRstInput):
     """ Parser that reads a rs3-file and generates a RST-tree.
-        File content is read into internal buffer during initialization.
-        'FileNotFoundError' is raised if file does not exist."""
+        Only the path is kept, the file is read and parsed on each call of
+        'read', so that many of these parsers (e.g. for all files of a
+        directory) need little memory and can be passed cheaply to other
+        processes. 'FileNotFoundError' is raised if file does not exist."""
 
     def __init__(self, filePath: str):
-        """ File content is read into internal buffer
-            during initialization. """
         if fileExists(filePath):
-            self.fileContent = readFile(filePath)
+            self.filePath = filePath
         else:
             raise FileNotFoundError(ENOENT, strerror(ENOENT), filePath)
 
     def read(self) -> RstTree:
-        """ Reads and parses the contents of the internal buffer.
+        """ Reads and parses the file.
             'InvalidRstFile' is raised for wrong file format. """
-        xmlData = self.fileContent.getroot()
-        if 'rst' == xmlData.tag:
-            relations = parseHeader(xmlData)
-            segmentList = parseBody(xmlData)
-            treeGenerator = TreeGenerator(relations)
-            return treeGenerator.run(segmentList)
-        else:
-            raise InvalidRstFile("Unexpected XML root, expected the following tag: <rst>")
+        return createRstTree(readFile(self.filePath))
+
+    def size(self) -> int:
+        with open(self.filePath, "rb") as file:
+            return file.read().count(b"<segment")
+
+
+class RstBytesParser(IRstInput):
+    """ Parser that generates a RST-tree from the in-memory content of a
+        rs3-file, given as bytes or str. Only the raw content is kept, the
+        XML is parsed on each call of 'read', so that many of these parsers
+        (e.g. for all files of an archive) need little memory.
+        'InvalidRstFile' is raised for wrong file format. """
+
+    def __init__(self, content):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self.content = bytes(content)
+
+    def read(self) -> RstTree:
+        return createRstTree(parseXml(self.content))
+
+    def size(self) -> int:
+        return self.content.count(b"<segment")
+
+
+class RstFileObjectParser(RstBytesParser):
+    """ Parser that generates a RST-tree from a binary (or text) file-like
+        object, e.g. a database blob or an opened archive member. The
+        content is read into internal buffer during initialization. """
+
+    def __init__(self, fileObject):
+        RstBytesParser.__init__(self, fileObject.read())
+
+
+def createRstTree(xmlTree) -> RstTree:
+    xmlData = xmlTree.getroot()
+    if 'rst' == xmlData.tag:
+        relations = parseHeader(xmlData)
+        segmentList = parseBody(xmlData)
+        treeGenerator = TreeGenerator(relations)
+        return treeGenerator.run(segmentList)
+    else:
+        raise InvalidRstFile("Unexpected XML root, expected the following tag: <rst>")
 
 
 class BodyEntry():
@@ -106,6 +143,14 @@ def readFile(filePath: str):
         raise InvalidRstFile("Parsing of XML file failed")
 
 
+def parseXml(content: bytes):
+    """ Function parsing the in-memory content of an XML-file """
+    try:
+        return et.ElementTree(et.fromstring(content))
+    except et.ParseError:
+        raise InvalidRstFile("Parsing of XML content failed")
+
+
 def parseHeader(xmlData) -> dict:
     for xmlBlock in xmlData:
         if 'header' == xmlBlock.tag:
@@ -269,6 +314,7 @@ class TreeGenerator():
         if not correct:
             raise InvalidRstFile("Entry has wrong group or segment type")
         else:
+            rstNode.subtreeHash = createSubtreeHash(rstNode)
             return
 
 
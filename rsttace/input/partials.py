@@ -0,0 +1,66 @@
+from rsttace.controller import IPartialResultsInput
+from rsttace.core import AgreementCounts
+
+from errno import ENOENT
+from os import strerror
+from os.path import isfile
+import json
+
+
+PARTIAL_RESULTS_FORMAT = "rsttace-partial-results"
+
+
+class InvalidPartialResultsFile(Exception):
+    pass
+
+
+class PartialResultsReader(IPartialResultsInput):
+    """ Reads the partial results of a sharded comparison run, as written by
+        'CompareSetPartialLogger'. File content is read into internal
+        buffer during initialization.
+        'FileNotFoundError' is raised if file does not exist,
+        'InvalidPartialResultsFile' if it contains no valid JSON."""
+
+    def __init__(self, filePath: str):
+        if isfile(filePath):
+            try:
+                with open(filePath, encoding="utf-8") as file:
+                    self.fileContent = json.load(file)
+            except (ValueError, UnicodeDecodeError) as error:
+                raise InvalidPartialResultsFile(
+                    "Invalid JSON in partial results file " + filePath
+                    + ": " + str(error))
+            self.filePath = filePath
+        else:
+            raise FileNotFoundError(ENOENT, strerror(ENOENT), filePath)
+
+    def read(self) -> list:
+        """ List of tuples (metrics row, AgreementCounts) per comparison.
+            'InvalidPartialResultsFile' is raised for wrong file format. """
+        content = self.__checkFormat()
+        try:
+            return [(pair["metrics"],
+                     AgreementCounts.fromDict(pair["counts"]))
+                    for pair in content["pairs"]]
+        except (KeyError, TypeError, ValueError) as error:
+            raise InvalidPartialResultsFile("Invalid partial results file "
+                                            + self.filePath + ": "
+                                            + repr(error))
+
+    def shard(self) -> tuple:
+        """ 'InvalidPartialResultsFile' is raised for wrong file format """
+        shard = self.__checkFormat().get("shard")
+        if not isinstance(shard, list) or len(shard) != 2 \
+                or not all(isinstance(value, int) for value in shard) \
+                or not 1 <= shard[0] <= shard[1]:
+            raise InvalidPartialResultsFile("Invalid shard in partial "
+                                            "results file: " + self.filePath)
+        return tuple(shard)
+
+    def __checkFormat(self) -> dict:
+        content = self.fileContent
+        if not isinstance(content, dict) \
+                or content.get("format") != PARTIAL_RESULTS_FORMAT:
+            raise InvalidPartialResultsFile("Not a partial results file: "
+                                            + self.filePath)
+        return content
@@ -0,0 +1,75 @@
+from rsttace.controller import IRstInput
+from .parser import RstTreeParser, RstBytesParser
+
+from os import listdir
+from os.path import basename, isdir, isfile, join
+import tarfile
+import zipfile
+
+
+class RstDirectory:
+    """ Set of the rs3-files inside a directory """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def listFiles(self) -> list:
+        """ Names of all rs3-files of the set """
+        return [file for file in listdir(self.path) if file.endswith(".rs3")]
+
+    def createInput(self, fileName: str) -> IRstInput:
+        return RstTreeParser(join(self.path, fileName))
+
+
+class RstArchive:
+    """ Set of the rs3-files inside a tar (optionally compressed) or zip
+        archive, without extracting them to the filesystem. The members are
+        read in a single pass during initialization and identified by their
+        file names; of several members with equal file name, the first one
+        is taken. """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.contents = {}
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for member in archive.infolist():
+                    if self.isNewRs3File(member.filename, member.is_dir()):
+                        self.contents[basename(member.filename)] = \
+                            archive.read(member)
+        else:
+            with tarfile.open(path) as archive:
+                for member in archive:
+                    if self.isNewRs3File(member.name, not member.isfile()):
+                        self.contents[basename(member.name)] = \
+                            archive.extractfile(member).read()
+
+    def isNewRs3File(self, memberName: str, isDirectory: bool) -> bool:
+        return not isDirectory and memberName.endswith(".rs3") \
+            and basename(memberName) not in self.contents
+
+    def listFiles(self) -> list:
+        """ Names of all rs3-files of the set """
+        return list(self.contents)
+
+    def createInput(self, fileName: str) -> IRstInput:
+        return RstBytesParser(self.contents[fileName])
+
+
+def isArchive(path: str) -> bool:
+    """ Checks whether path points to a tar or zip archive """
+    return isfile(path) and (zipfile.is_zipfile(path)
+                             or tarfile.is_tarfile(path))
+
+
+def isRstSet(path: str) -> bool:
+    """ Checks whether path points to a directory or an archive """
+    return isdir(path) or isArchive(path)
+
+
+def openRstSet(path: str):
+    """ RstDirectory or RstArchive for path """
+    if isdir(path):
+        return RstDirectory(path)
+    else:
+        return RstArchive(path)
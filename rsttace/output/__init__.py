@@ -14,3 +14,15 @@ from .tableoutputs import CompTableDummyOutput
 from .tableoutputs import CompareSetTableLogger
 from .tableoutputs import CompareSetTableCliOutput
 from .tableoutputs import CompareSetTableDummyOutput
+from .tableoutputs import CompareSetPartialLogger
+from .progressoutputs import ProgressCliOutput
+from .progressoutputs import TimingLogger
+from .progressoutputs import ProgressDummyOutput
+from .jsonoutputs import RelTableJsonLogger
+from .jsonoutputs import CompTableJsonLogger
+from .jsonoutputs import CompareSetTableJsonLogger
+from .erroroutputs import PairErrorLogger
+from .erroroutputs import PairErrorCliOutput
+from .erroroutputs import PairErrorDummyOutput
+from .checkpoint import CheckpointLog
+from .checkpoint import InvalidCheckpointFile
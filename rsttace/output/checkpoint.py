@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+
+from rsttace.core import AgreementCounts
+from rsttace.controller import ICheckpoint
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FORMAT = "rsttace-checkpoint"
+
+
+class InvalidCheckpointFile(Exception):
+    pass
+
+
+class CheckpointLog(ICheckpoint):
+    """ JSON Lines log of the results of a comparison run: a header record,
+        followed by one record per finished comparison with its metrics row
+        and AgreementCounts (as in the partial results of
+        'CompareSetPartialLogger'). Each record is flushed to disk before
+        'write' returns, so that the log survives a crash of the run.
+        If resume is set, then 'read' returns the records of an existing log
+        and new records are appended to it (a record which was cut off by a
+        crash is dropped). Otherwise, an existing log is replaced.
+        The inputs (e.g. the input paths and the names of the compared pairs)
+        are recorded in the header; a log of other inputs cannot be resumed,
+        so that its results are not mixed up with the ones of the run. """
+    def __init__(self, outputFile="", resume=False, inputs: dict = None):
+        self.outputFile = outputFile
+        self.resume = resume
+        self.inputs = inputs
+        self.validBytes = 0
+        self.file = None
+
+    def read(self) -> list:
+        """ 'InvalidCheckpointFile' is raised for wrong file format, corrupt
+            records or a log of other inputs """
+        if not self.resume or not os.path.isfile(self.outputFile):
+            return []
+        logger.info("Read checkpoint of previous run: " + self.outputFile)
+        results = []
+        with open(self.outputFile, "rb") as file:
+            for lineID, line in enumerate(file):
+                if not line.endswith(b"\n"):
+                    logger.warning("Drop incomplete record of checkpoint: "
+                                   + self.outputFile)
+                    break
+                record = self.parseRecord(lineID, line)
+                if lineID == 0:
+                    self.checkHeader(record)
+                else:
+                    results.append(self.parseResult(lineID, record))
+                self.validBytes += len(line)
+        return results
+
+    def parseRecord(self, lineID: int, line: bytes) -> dict:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            raise InvalidCheckpointFile("Corrupt record in line "
+                                        + str(lineID + 1) + " of checkpoint: "
+                                        + self.outputFile)
+        return record
+
+    def checkHeader(self, record: dict):
+        if record.get("format") != CHECKPOINT_FORMAT:
+            raise InvalidCheckpointFile("Not a checkpoint file: "
+                                        + self.outputFile)
+        if record.get("inputs") != self.inputs:
+            raise InvalidCheckpointFile("Checkpoint was recorded for other "
+                                        "inputs: " + self.outputFile)
+
+    def parseResult(self, lineID: int, record: dict) -> tuple:
+        try:
+            row = record["metrics"]
+            if not isinstance(row, list) or not row \
+                    or not isinstance(row[0], str):
+                raise ValueError("metrics row without pair name")
+            return (row, AgreementCounts.fromDict(record["counts"]))
+        except (KeyError, TypeError, ValueError) as error:
+            raise InvalidCheckpointFile("Invalid record in line "
+                                        + str(lineID + 1) + " of checkpoint "
+                                        + self.outputFile + ": "
+                                        + repr(error))
+
+    def write(self, row: list, agreementCounts: AgreementCounts):
+        if self.file is None:
+            self.open()
+        self.writeRecord({"metrics": row, "counts": agreementCounts.toDict()})
+
+    def open(self):
+        if self.resume and self.validBytes > 0:
+            self.file = open(self.outputFile, "r+b")
+            self.file.truncate(self.validBytes)
+            self.file.seek(self.validBytes)
+        else:
+            self.file = open(self.outputFile, "wb")
+            self.writeRecord({"format": CHECKPOINT_FORMAT,
+                              "inputs": self.inputs})
+
+    def writeRecord(self, record: dict):
+        self.file.write(json.dumps(record).encode("utf-8") + b"\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
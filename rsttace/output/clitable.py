@@ -0,0 +1,187 @@
+from math import isinf, isnan
+
+# Column types, ordered from least to most generic (as in 'tabulate')
+NONE_TYPE, BOOL_TYPE, INT_TYPE, FLOAT_TYPE, STR_TYPE = range(5)
+
+# Spaces between columns and minimal padding of the headers
+COLUMN_SEPARATOR = "  "
+MIN_PADDING = 2
+
+
+class RstTableRenderer:
+    """ Renders a table in reStructuredText format, like tabulate's 'rst'
+        format (numbers aligned at their decimal point, all other values
+        aligned left), without holding the whole table in memory.
+        rowFactory is a callable returning a new iterator over the rows on
+        each call: the types and widths of the columns are determined in a
+        first pass over the rows, the lines are written in a second pass.
+        If maxRows is set, then only the first maxRows rows are rendered. """
+    def __init__(self, headers: list, rowFactory, maxRows: int = None):
+        self.headers = [escapeFirstCell(str(header), i)
+                        for i, header in enumerate(headers)]
+        self.rowFactory = rowFactory
+        self.maxRows = maxRows
+
+    def render(self, stream):
+        """ Writes the lines of the table to stream """
+        columns = [ColumnLayout(header) for header in self.headers]
+        numRows = 0
+        numHiddenRows = 0
+        for row in self.rowFactory():
+            if self.maxRows is not None and numRows >= self.maxRows:
+                numHiddenRows += 1
+                continue
+            numRows += 1
+            for i, (column, value) in enumerate(zip(columns, row)):
+                column.add(escapeFirstCell(value, i))
+
+        widths = [column.width() for column in columns]
+        border = COLUMN_SEPARATOR.join("=" * width for width in widths)
+        stream.write(border + "\n")
+        stream.write(joinCells(column.alignHeader(width)
+                               for column, width in zip(columns, widths)))
+        stream.write(border + "\n")
+        for rowID, row in enumerate(self.rowFactory()):
+            if rowID >= numRows:
+                break
+            stream.write(joinCells(column.align(escapeFirstCell(value, i),
+                                                width)
+                                   for i, (column, value, width)
+                                   in enumerate(zip(columns, row, widths))))
+        stream.write(border + "\n")
+        if numHiddenRows > 0:
+            stream.write("... " + str(numHiddenRows)
+                         + " more rows not shown\n")
+
+
+class ColumnLayout:
+    """ Type and width of a column, determined by adding its values """
+    def __init__(self, header: str):
+        self.header = header
+        self.type = BOOL_TYPE
+        self.maxStrWidth = 0
+        self.maxIntWidth = 0
+        # width before the decimal point and digits after it
+        self.maxIntegralWidth = 0
+        self.maxDecimals = -1
+
+    def add(self, value):
+        valueType = detectType(value)
+        self.type = max(self.type, valueType)
+        if valueType == NONE_TYPE:
+            # empty cells are padded like numbers without decimal point
+            self.maxIntegralWidth = max(self.maxIntegralWidth, 1)
+            return
+        self.maxStrWidth = max(self.maxStrWidth, len(formatStr(value)))
+        self.maxIntWidth = max(self.maxIntWidth, len(formatInt(value)))
+        string = formatFloat(value)
+        decimals = countDecimals(string)
+        self.maxIntegralWidth = max(self.maxIntegralWidth,
+                                    len(string) - decimals)
+        self.maxDecimals = max(self.maxDecimals, decimals)
+
+    def isNumeric(self) -> bool:
+        return self.type in (INT_TYPE, FLOAT_TYPE)
+
+    def width(self) -> int:
+        if self.type == INT_TYPE:
+            width = self.maxIntWidth
+        elif self.type == FLOAT_TYPE:
+            width = self.maxIntegralWidth + self.maxDecimals
+        else:
+            width = self.maxStrWidth
+        return max(width, len(self.header) + MIN_PADDING)
+
+    def alignHeader(self, width: int) -> str:
+        if self.isNumeric():
+            return self.header.rjust(width)
+        else:
+            return self.header.ljust(width)
+
+    def align(self, value, width: int) -> str:
+        if detectType(value) == NONE_TYPE:
+            string = ""
+        elif self.type == FLOAT_TYPE:
+            string = formatFloat(value)
+        elif self.type == INT_TYPE:
+            string = formatInt(value)
+        else:
+            string = formatStr(value)
+
+        if self.isNumeric():
+            decimals = self.maxDecimals - countDecimals(string)
+            return (string + " " * decimals).rjust(width)
+        else:
+            return string.ljust(width)
+
+
+def detectType(value) -> int:
+    """ Least generic column type of value, empty values have no type """
+    if value is None or (isinstance(value, str) and not value):
+        return NONE_TYPE
+    elif isinstance(value, bool) or value in ("True", "False"):
+        return BOOL_TYPE
+    elif isInt(value):
+        return INT_TYPE
+    elif isNumber(value):
+        return FLOAT_TYPE
+    else:
+        return STR_TYPE
+
+
+def isInt(value) -> bool:
+    if isinstance(value, float):
+        return False
+    try:
+        int(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def isNumber(value) -> bool:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return False
+    if isinstance(value, str) and (isinf(number) or isnan(number)):
+        return value.lower() in ("inf", "-inf", "nan")
+    return True
+
+
+def formatStr(value) -> str:
+    return str(value).strip()
+
+
+def formatInt(value) -> str:
+    return (value if isinstance(value, str) else format(value, "")).strip()
+
+
+def formatFloat(value) -> str:
+    """ Formats value as float, if possible """
+    try:
+        return format(float(value), "g")
+    except (TypeError, ValueError):
+        return formatStr(value)
+
+
+def countDecimals(string: str) -> int:
+    """ Number of characters after the decimal point (or exponent),
+        -1 for integers and non-numbers """
+    if not isNumber(string) or isInt(string):
+        return -1
+    pos = string.rfind(".")
+    pos = string.lower().rfind("e") if pos < 0 else pos
+    return len(string) - pos - 1 if pos >= 0 else -1
+
+
+def escapeFirstCell(value, columnID: int):
+    """ Empty cells of the first column are marked with '..' (otherwise the
+        rows would not be valid reStructuredText) """
+    if columnID == 0 and isinstance(value, str) and not value.strip():
+        return ".."
+    return value
+
+
+def joinCells(cells) -> str:
+    return COLUMN_SEPARATOR.join(cells).rstrip() + "\n"
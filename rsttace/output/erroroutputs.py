@@ -0,0 +1,45 @@
+import csv
+import logging
+import sys
+
+from rsttace.controller import IPairErrorOutput
+
+
+logger = logging.getLogger(__name__)
+
+
+class PairErrorLogger(IPairErrorOutput):
+    """ Writes one CSV row (Name, Error) per failed RST-tree pair. The file
+        is only written if any comparison failed. """
+    def __init__(self, outputFile=""):
+        self.outputFile = outputFile
+
+    def write(self, errors: list):
+        if not errors:
+            return
+        logger.info("Write failed RST-tree pairs to: " + self.outputFile)
+        with open(self.outputFile, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Name", "Error"])
+            writer.writerows(errors)
+        logger.debug("Output file written successfully.")
+
+
+class PairErrorCliOutput(IPairErrorOutput):
+    """ Lists the failed RST-tree pairs after the comparison """
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stderr
+
+    def write(self, errors: list):
+        if not errors:
+            return
+        self.stream.write("\nFailed RST-tree pairs (" + str(len(errors))
+                          + "), skipped in the overall evaluation:\n")
+        for name, error in errors:
+            self.stream.write("  " + name + ": " + error + "\n")
+        self.stream.flush()
+
+
+class PairErrorDummyOutput(IPairErrorOutput):
+    def write(self, errors: list):
+        pass
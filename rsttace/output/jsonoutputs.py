@@ -0,0 +1,208 @@
+import json
+import logging
+from math import isnan
+
+from rsttace.core import RelTable, Relation, RelElement
+from rsttace.core import ComparisonTable, Comparison
+from rsttace.core import CompareSetTable
+from rsttace.core import MatchingDistance, Equivalency
+from rsttace.core.comparisontable import DIMENSIONS
+from rsttace.core.comparesettable import METRICS_COLUMNS
+from rsttace.controller import IRelTableOutput
+from rsttace.controller import IComparisonTableOutput
+from rsttace.controller import ICompareSetTableOutput
+from rsttace.controller import IPairMetricsOutput
+
+
+logger = logging.getLogger(__name__)
+
+# Dimensions of the METRICS_COLUMNS (e.g. 'AttachmentPoint-Ratio'), mapped
+# to the dimension names of the comparison metrics (e.g. 'Attachment point')
+METRICS_DIMENSIONS = {dimension.title().replace(" ", ""): dimension
+                      for dimension in DIMENSIONS + ["Average"]}
+
+
+# JSON Lines outputs: one JSON record per line, each with a field "type"
+
+
+class RelTableJsonLogger(IRelTableOutput):
+    """ Writes one record per relation """
+    def __init__(self, outputFile=""):
+        self.outputFile = outputFile
+
+    def write(self, relTable: RelTable):
+        logger.info("Write relations of RST tree analysis to: "
+                    + self.outputFile)
+        with open(self.outputFile, "w", encoding="utf-8") as file:
+            for relID, rel in enumerate(relTable):
+                record = {"type": "relation", "id": relID + 1}
+                record.update(createRelationRecord(rel))
+                writeRecord(file, record)
+        logger.debug("Output file written successfully.")
+
+
+class CompTableJsonLogger(IComparisonTableOutput):
+    """ Writes one record per comparison of two relations, followed by one
+        record with the metrics of the whole RST tree pair """
+    def __init__(self, outputFile=""):
+        self.outputFile = outputFile
+
+    def write(self, compTable: ComparisonTable):
+        logger.debug("Write comparisons of RST tree pair to: "
+                     + self.outputFile)
+        pairName = compTable.name or None
+        with open(self.outputFile, "w", encoding="utf-8") as file:
+            for compID, comp in enumerate(compTable):
+                record = {"type": "comparison",
+                          "pair": pairName,
+                          "id": compID + 1}
+                record.update(createComparisonRecord(comp))
+                writeRecord(file, record)
+            writeRecord(file, {"type": "metrics",
+                               "pair": pairName,
+                               "matchingRatios": compTable.matchingRatios,
+                               "cohensKappas": compTable.cohensKappas})
+        logger.debug("Output file written successfully.")
+
+
+class CompareSetTableJsonLogger(ICompareSetTableOutput, IPairMetricsOutput):
+    """ Writes one record with the metrics of each RST tree pair, followed by
+        one record per statistic over all pairs (mean, std, micro, ...).
+        The records of the pairs are written and flushed one by one as the
+        pairs are evaluated (see 'writePair'), if given that way, otherwise
+        they are written with the statistics. """
+    def __init__(self, outputFile=""):
+        self.outputFile = outputFile
+        self.file = None
+        self.pairsWritten = False
+
+    def writePair(self, row: list):
+        if self.file is None:
+            logger.debug("Write metrics of RST tree pairs to: "
+                         + self.outputFile)
+            mode = "a" if self.pairsWritten else "w"
+            self.file = open(self.outputFile, mode, encoding="utf-8")
+            self.pairsWritten = True
+        values = dict(zip(METRICS_COLUMNS, row))
+        writeRecord(self.file, createPairMetricsRecord(values,
+                                                       METRICS_COLUMNS[1:]))
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def write(self, compSetTable: CompareSetTable):
+        logger.info("Write overall results of RST tree pair set to: "
+                    + self.outputFile)
+        self.close()
+        dataFrame = compSetTable.dataFrame
+        stats = compSetTable.stats
+        metricsColumns = [column for column in dataFrame.columns
+                          if column != "Name"]
+        mode = "a" if self.pairsWritten else "w"
+        with open(self.outputFile, mode, encoding="utf-8") as file:
+            if not self.pairsWritten:
+                for row in dataFrame.itertuples(index=False, name=None):
+                    values = dict(zip(dataFrame.columns, row))
+                    writeRecord(file, createPairMetricsRecord(
+                        values, metricsColumns))
+            for row in stats.itertuples(index=True, name=None):
+                values = dict(zip(stats.columns, row[1:]))
+                record = {"type": "statistic", "statistic": row[0]}
+                record.update(createMetricsRecord(values, metricsColumns))
+                writeRecord(file, record)
+        self.pairsWritten = False
+        logger.debug("Output file written successfully.")
+
+
+# Support functions
+
+
+def writeRecord(file, record: dict):
+    file.write(json.dumps(replaceNaN(record), ensure_ascii=False,
+                          allow_nan=False) + "\n")
+
+
+def replaceNaN(value):
+    """ Replaces NaN (not valid in JSON) by None, also in nested values """
+    if isinstance(value, dict):
+        return {key: replaceNaN(item) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [replaceNaN(item) for item in value]
+    elif isinstance(value, float) and isnan(value):
+        return None
+    else:
+        return value
+
+
+def createRelationRecord(rel: Relation) -> dict:
+    if rel is None:
+        return None
+    return {"relation": rel.name,
+            "isMultiNuclear": bool(rel.isMultiNuclear),
+            "nuclearity": createNuclearityName(rel),
+            "constituent": createRelElementRecord(rel.constituent),
+            "attachmentPoint": createRelElementRecord(rel.attachmentPoint),
+            "centralSubconstituent": [{"minID": int(relElem.minID),
+                                       "maxID": int(relElem.maxID)}
+                                      for relElem
+                                      in rel.centralSubconstituent]}
+
+
+def createRelElementRecord(relElem: RelElement) -> dict:
+    return {"minID": int(relElem.minID),
+            "maxID": int(relElem.maxID),
+            "isNuclear": bool(relElem.isNuclear)}
+
+
+def createNuclearityName(rel: Relation) -> str:
+    """ Typed counterpart of the arrows of 'createNuclearityString' """
+    if rel.isMultiNuclear:
+        return "multi"
+    elif rel.constituent.maxID < rel.attachmentPoint.minID:
+        return "right"
+    elif rel.constituent.minID > rel.attachmentPoint.maxID:
+        return "left"
+    else:
+        return "multi"
+
+
+def createComparisonRecord(comp: Comparison) -> dict:
+    distance = MatchingDistance(int(comp.matchingDistance))
+    if distance == MatchingDistance.NO_MATCHING:
+        equivalency = None
+    else:
+        equivalency = createEquivalencyRecord(comp.evaluation)
+    return {"matchingDistance": distance.name,
+            "relationA": createRelationRecord(comp.relation1),
+            "relationB": createRelationRecord(comp.relation2),
+            "equivalency": equivalency}
+
+
+def createEquivalencyRecord(eval: Equivalency) -> dict:
+    return {"nuclearityDirection": bool(eval.nuclearity.equalDirection),
+            "nuclearityMonoMulti": bool(eval.nuclearity.equalMonoMulti),
+            "relation": bool(eval.relation),
+            "constituent": bool(eval.constituent),
+            "attachmentPoint": bool(eval.attachmentPoint)}
+
+
+def createPairMetricsRecord(values: dict, metricsColumns: list) -> dict:
+    record = {"type": "metrics", "pair": values["Name"]}
+    record.update(createMetricsRecord(values, metricsColumns))
+    return record
+
+
+def createMetricsRecord(values: dict, metricsColumns: list) -> dict:
+    """ Splits metrics columns like 'Relation-Ratio' and 'Relation-Kappa'
+        into the dicts matchingRatios and cohensKappas """
+    record = {"matchingRatios": {}, "cohensKappas": {}}
+    for column in metricsColumns:
+        dimension, _, metric = column.rpartition("-")
+        key = "matchingRatios" if metric == "Ratio" else "cohensKappas"
+        value = values[column]
+        dimension = METRICS_DIMENSIONS.get(dimension, dimension)
+        record[key][dimension] = None if value is None else float(value)
+    return record
@@ -0,0 +1,106 @@
+import csv
+import sys
+from heapq import heappush, heappushpop
+from time import perf_counter
+
+from rsttace.controller import IProgressOutput, TIMING_STEPS
+
+
+class ProgressCliOutput(IProgressOutput):
+    """ Live progress line with number of compared pairs, rate, ETA and
+        the slowest pairs so far. The line is redrawn at most once per
+        'interval' seconds, so that it is cheap even for many small pairs. """
+    def __init__(self, stream=None, interval=0.5, numSlowest=3):
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        self.numSlowest = numSlowest
+        self.start(0)
+
+    def start(self, total: int):
+        self.total = total
+        self.done = 0
+        self.slowest = []  # min-heap of (duration, name)
+        self.startTime = perf_counter()
+        self.lastDraw = None
+
+    def update(self, name: str, timings: dict, matrixBytes: int = 0):
+        self.done += 1
+        duration = sum(timings.values())
+        if len(self.slowest) < self.numSlowest:
+            heappush(self.slowest, (duration, name))
+        elif self.numSlowest > 0:
+            heappushpop(self.slowest, (duration, name))
+
+        now = perf_counter()
+        if self.lastDraw is None or now - self.lastDraw >= self.interval \
+                or self.done == self.total:
+            self.lastDraw = now
+            self.stream.write("\r" + self.createProgressLine(now))
+            self.stream.flush()
+
+    def finish(self):
+        elapsed = perf_counter() - self.startTime
+        self.stream.write("\r" + self.createProgressLine(perf_counter())
+                          + "\nCompared " + str(self.done) + " pairs in "
+                          + formatDuration(elapsed) + "\n")
+        self.stream.flush()
+
+    def createProgressLine(self, now: float) -> str:
+        elapsed = now - self.startTime
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        if rate > 0:
+            eta = formatDuration((self.total - self.done) / rate)
+        else:
+            eta = "?"
+        percent = 100.0 * self.done / self.total if self.total > 0 else 100.0
+        slowest = ", ".join(name + " (" + "{:.2f}".format(duration) + "s)"
+                            for duration, name
+                            in sorted(self.slowest, reverse=True))
+        return "[{}/{}] {:5.1f}% | {:.1f} pairs/s | ETA {} | slowest: {}" \
+            .format(self.done, self.total, percent, rate, eta, slowest)
+
+
+class TimingLogger(IProgressOutput):
+    """ Writes the durations of the steps of each comparison (in seconds)
+        and the peak bytes of its distance matrices as one CSV row per pair,
+        while the comparisons are running. """
+    def __init__(self, outputFile=""):
+        self.outputFile = outputFile
+        self.file = None
+        self.writer = None
+
+    def start(self, total: int):
+        self.file = open(self.outputFile, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["Name"] + TIMING_STEPS
+                             + ["total", "matrixBytes"])
+
+    def update(self, name: str, timings: dict, matrixBytes: int = 0):
+        durations = [timings.get(step, 0.0) for step in TIMING_STEPS]
+        self.writer.writerow([name]
+                             + ["{:.6f}".format(d) for d in durations]
+                             + ["{:.6f}".format(sum(durations)),
+                                matrixBytes])
+
+    def finish(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class ProgressDummyOutput(IProgressOutput):
+    def start(self, total: int):
+        pass
+
+    def update(self, name: str, timings: dict, matrixBytes: int = 0):
+        pass
+
+    def finish(self):
+        pass
+
+
+def formatDuration(seconds: float) -> str:
+    """ Formats seconds as H:MM:SS """
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
@@ -1,5 +1,8 @@
+import json
+import logging
+import sys
+
 import pandas as pd
-from tabulate import tabulate
 
 from rsttace.core import RelTable, Relation, RelElement
 from rsttace.core import ComparisonTable, Comparison
@@ -8,6 +11,11 @@ from rsttace.core import MatchingDistance, Equivalency
 from rsttace.controller import IRelTableOutput
 from rsttace.controller import IComparisonTableOutput
 from rsttace.controller import ICompareSetTableOutput
+from rsttace.input.partials import PARTIAL_RESULTS_FORMAT
+from .clitable import RstTableRenderer
+
+
+logger = logging.getLogger(__name__)
 
 
 # RelTable outputs
@@ -21,11 +29,11 @@ class RelTableLogger(IRelTableOutput):
     def write(self, relTable: RelTable):
         writeFile = self.__isNotEmpty(self.outputFile)
         if writeFile:
-            print("\nWrite result table of RST tree analysis to: "
-                  + self.outputFile)
+            logger.info("Write result table of RST tree analysis to: "
+                        + self.outputFile)
             dataFrame = createRelationsDataframe(relTable)
             dataFrame.to_csv(self.outputFile, index=False, encoding='utf-8-sig')
-            print("Output file written successfully.")
+            logger.debug("Output file written successfully.")
 
     def __isNotEmpty(self, s: str) -> bool:
         """ Checks whether string is empty or not """
@@ -33,15 +41,14 @@ class RelTableLogger(IRelTableOutput):
 
 
 class RelTableCliOutput(IRelTableOutput):
-    def write(self, relTable: RelTable):
-        dataFrame = createRelationsDataframe(relTable)
-        cliOutput = tabulate(dataFrame,
-                             headers='keys',
-                             tablefmt="rst",
-                             showindex=False)
+    def __init__(self, maxRows: int = None):
+        self.maxRows = maxRows
 
-        print("\nResult table of RST tree analysis:")
-        print(cliOutput)
+    def write(self, relTable: RelTable):
+        writeTableToCli("\nResult table of RST tree analysis:",
+                        createRelCsvHeader(),
+                        lambda: createRelationRows(relTable),
+                        self.maxRows)
 
 
 class RelTableDummyOutput(IRelTableOutput):
@@ -61,18 +68,18 @@ class CompTableLogger(IComparisonTableOutput):
     def write(self, compTable: ComparisonTable):
         writeCompFile = self.__isNotEmpty(self.compFile)
         if writeCompFile:
-            print("Write result table of RST tree pair comparison to: "
-                  + self.compFile)
+            logger.debug("Write result table of RST tree pair comparison to: "
+                         + self.compFile)
             dataFrame = createComparisonDataframe(compTable)
             dataFrame.to_csv(self.compFile, index=False, encoding='utf-8-sig')
-            print("Output file written successfully.")
+            logger.debug("Output file written successfully.")
         writeEvalFile = self.__isNotEmpty(self.evalFile)
         if writeEvalFile:
-            print("Write result metrics of RST tree pair evalarison to: "
-                  + self.evalFile)
+            logger.debug("Write result metrics of RST tree pair comparison "
+                         "to: " + self.evalFile)
             dataFrame = createEvaluationDataframe(compTable)
             dataFrame.to_csv(self.evalFile, index=True, encoding='utf-8-sig')
-            print("Output file written successfully.")
+            logger.debug("Output file written successfully.")
 
     def __isNotEmpty(self, s: str) -> bool:
         """ Checks whether string is empty or not """
@@ -80,24 +87,17 @@ class CompTableLogger(IComparisonTableOutput):
 
 
 class CompTableCliOutput(IComparisonTableOutput):
+    def __init__(self, maxRows: int = None):
+        self.maxRows = maxRows
+
     def write(self, compTable: ComparisonTable):
-        # prepare tables
-        compTableFrame = createComparisonDataframe(compTable)
-        evalTableFrame = createEvaluationDataframe(compTable)
-        compTableCli = tabulate(compTableFrame,
-                                headers='keys',
-                                tablefmt="rst",
-                                showindex=False)
-        evalTableCli = tabulate(evalTableFrame,
-                                headers='keys',
-                                tablefmt="rst",
-                                showindex=True)
-
-        # write on CLI
-        print("\nResult table of RST tree pair comparison:")
-        print(compTableCli)
-        print("\nStatistical metrics:")
-        print(evalTableCli)
+        writeTableToCli("\nResult table of RST tree pair comparison:",
+                        createCompCsvHeader(),
+                        lambda: createComparisonRows(compTable),
+                        self.maxRows)
+        writeTableToCli("\nStatistical metrics:",
+                        [""] + list(compTable.matchingRatios),
+                        lambda: createEvaluationRows(compTable))
 
 
 class CompTableDummyOutput(IComparisonTableOutput):
@@ -116,13 +116,21 @@ class CompareSetTableLogger(ICompareSetTableOutput):
     def write(self, compSetTable: CompareSetTable):
         writeFile = self.__isNotEmpty(self.outputFile)
         if writeFile:
-            print("Write result table of RST tree pair comparison to: "
-                  + self.outputFile)
+            logger.info("Write overall results of RST tree pair set to: "
+                        + self.outputFile)
             extDataFrame = self.__appendStatsToDataFrame(compSetTable)
             extDataFrame.to_csv(self.outputFile, index=False)
-            print("Output file written successfully.")
+            logger.debug("Output file written successfully.")
         pass
 
+    def writeStats(self, stats: pd.DataFrame):
+        """ Writes only the stats block (e.g. the 'RunningStats' while
+            comparing), which is replaced by the complete results later """
+        if self.__isNotEmpty(self.outputFile):
+            statsFrame = stats.copy()
+            statsFrame.insert(0, "Name", statsFrame.index)
+            statsFrame.to_csv(self.outputFile, index=False)
+
     def __isNotEmpty(self, s: str) -> bool:
         """ Checks whether string is empty or not """
         return bool(s and s.strip())
@@ -139,24 +147,54 @@ class CompareSetTableLogger(ICompareSetTableOutput):
 
 
 class CompareSetTableCliOutput(ICompareSetTableOutput):
+    def __init__(self, maxRows: int = None):
+        self.maxRows = maxRows
+
     def write(self, compSetTable: CompareSetTable):
-        # prepare tables
-        evalTableCli = tabulate(compSetTable.dataFrame,
-                                headers='keys',
-                                tablefmt="rst",
-                                showindex=False)
-        statsTableCli = tabulate(compSetTable.stats,
-                                 headers='keys',
-                                 tablefmt="rst",
-                                 showindex=True)
-        # write on CLI
-        print("\nStatistical evaluation of the whole RST tree pair set:")
-        print("\nResults for each RST tree pair:")
-        print(evalTableCli)
-        print("\nOverall results of whole dataset:")
-        print(statsTableCli)
+        dataFrame = compSetTable.dataFrame
+        stats = compSetTable.stats
+        writeTableToCli("\nStatistical evaluation of the whole RST tree pair "
+                        "set:\n\nResults for each RST tree pair:",
+                        list(dataFrame.columns),
+                        lambda: dataFrame.itertuples(index=False, name=None),
+                        self.maxRows)
+        self.writeStats(stats, "\nOverall results of whole dataset:")
         return
 
+    def writeStats(self, stats: pd.DataFrame,
+                   title: str = "\nIntermediate results:"):
+        """ Writes only the stats block (e.g. the 'RunningStats' while
+            comparing) """
+        writeTableToCli(title,
+                        [""] + list(stats.columns),
+                        lambda: stats.itertuples(index=True, name=None))
+
+
+class CompareSetPartialLogger(ICompareSetTableOutput):
+    """ Writes the metrics and agreement counts of each comparison as partial
+        results of one shard, which can be merged with those of the other
+        shards afterwards (see 'PartialResultsReader'). """
+    def __init__(self, outputFile="", shard=(1, 1)):
+        self.outputFile = outputFile
+        self.shard = shard
+        pass
+
+    def write(self, compSetTable: CompareSetTable):
+        logger.info("Write partial results of shard " + str(self.shard[0])
+                    + "/" + str(self.shard[1]) + " to: " + self.outputFile)
+        rows = compSetTable.dataFrame.values.tolist()
+        countsList = compSetTable.agreementCountsList
+        if countsList is None:
+            raise ValueError("Partial results require the AgreementCounts "
+                             "of each comparison")
+        content = {"format": PARTIAL_RESULTS_FORMAT,
+                   "shard": list(self.shard),
+                   "pairs": [{"metrics": row, "counts": counts.toDict()}
+                             for row, counts in zip(rows, countsList)]}
+        with open(self.outputFile, "w", encoding="utf-8") as file:
+            json.dump(content, file)
+        logger.debug("Output file written successfully.")
+
 
 class CompareSetTableDummyOutput(ICompareSetTableOutput):
     def write(self, compSetTable: CompareSetTable):
@@ -166,18 +204,31 @@ class CompareSetTableDummyOutput(ICompareSetTableOutput):
 # Support functions
 
 
+def writeTableToCli(title: str, headers: list, rowFactory, maxRows=None):
+    """ Writes title and table to stdout, while the rows are produced """
+    sys.stdout.write(title + "\n")
+    RstTableRenderer(headers, rowFactory, maxRows).render(sys.stdout)
+
+
 def createRelationsDataframe(relTable: RelTable) -> pd.DataFrame:
     labels = createRelCsvHeader()
-    rows = []
-    for rel in relTable:
-        rows.append(createRelCsvEntry(rel))
+    rows = list(createRelationRows(relTable))
     return pd.DataFrame.from_records(rows, columns=labels)
 
 
+def createRelationRows(relTable: RelTable):
+    for rel in relTable:
+        yield createRelCsvEntry(rel)
+
+
 def createComparisonDataframe(compTable: ComparisonTable) -> pd.DataFrame:
     labels = createCompCsvHeader()
-    rows = []
+    rows = list(createComparisonRows(compTable))
+    return pd.DataFrame.from_records(rows, columns=labels)
 
+
+def createComparisonRows(compTable: ComparisonTable):
+    """ Rows of the comparison table, unmatched relations get own rows """
     biasID = 1
     for i in range(0, compTable.length()):
         comp: Comparison = compTable.get(i)
@@ -191,13 +242,13 @@ def createComparisonDataframe(compTable: ComparisonTable) -> pd.DataFrame:
             csvRow = [id_str, ""] + rel1_strLst + [""] + \
                 createEmptyRelCsvEntry() + ["", match_str] + \
                 createEmptyEvaluation()
-            rows.append(csvRow)
+            yield csvRow
             # own line for rel2
             id_str = str(i+biasID+1)
             csvRow = [id_str, ""] + createEmptyRelCsvEntry() + \
                 [""] + rel2_strLst + ["", match_str] + \
                 createEmptyEvaluation()
-            rows.append(csvRow)
+            yield csvRow
 
             biasID += 1
         else:
@@ -205,9 +256,13 @@ def createComparisonDataframe(compTable: ComparisonTable) -> pd.DataFrame:
             csvRow = [id_str, ""] + rel1_strLst + [""] + \
                 rel2_strLst + ["", match_str] + \
                 createEvaluationString(comp.evaluation)
-            rows.append(csvRow)
+            yield csvRow
 
-    return pd.DataFrame.from_records(rows, columns=labels)
+
+def createEvaluationRows(compTable: ComparisonTable):
+    yield ["Matching Ratios"] + list(compTable.matchingRatios.values())
+    yield ["Inter Annotator Agreement"] + \
+        [compTable.cohensKappas[key] for key in compTable.matchingRatios]
 
 
 def createEvaluationDataframe(compTable: ComparisonTable) -> pd.DataFrame:
@@ -0,0 +1,60 @@
+from unittest import TestCase
+from os.path import join
+
+from rsttace import api
+from rsttace.input import InvalidRstFile
+
+
+class TestApi(TestCase):
+    filePath = './rsttace/tests/testFiles'
+
+    def path(self, fileName: str) -> str:
+        return join(self.filePath, fileName)
+
+    def content(self, fileName: str) -> bytes:
+        with open(self.path(fileName), "rb") as file:
+            return file.read()
+
+    def test_analyseBytesEqualsAnalysePath(self):
+        fromPath = api.analyse(self.path("multiAndMonoNuc.rs3"))
+        fromBytes = api.analyse(self.content("multiAndMonoNuc.rs3"))
+
+        self.assertTrue(fromPath.equals(fromBytes))
+        self.assertEqual(api.RELATION_COLUMNS, list(fromPath.columns))
+        self.assertEqual(bool, fromPath["CN"].dtype)
+
+    def test_compareIdenticalTrees(self):
+        compTable = api.compare(self.path("multiAndMonoNuc.rs3"),
+                                self.content("multiAndMonoNuc.rs3"))
+
+        self.assertEqual(1.0, compTable.matchingRatios["Average"])
+
+    def test_sessionEqualsCompare(self):
+        session = api.openSession(self.path("multiAndMonoNuc.rs3"),
+                                  self.path("singleMultiNuc.rs3"))
+        compTable = api.compare(self.path("multiAndMonoNuc.rs3"),
+                                self.path("singleMultiNuc.rs3"))
+
+        self.assertEqual(compTable.matchingRatios, session.matchingRatios)
+
+        session.relabelRelation(1, 0, "elaboration")
+        self.assertEqual("elaboration", session.relTable(1).get(0).name)
+
+    def test_compareSetsInParallelEqualsSequential(self):
+        pairs = [(name,
+                  self.path("multiAndMonoNuc.rs3"),
+                  self.content(name + ".rs3"))
+                 for name in ["singleMonoNuc", "multiAndMonoNuc"]]
+
+        sequential = api.compareSets(pairs)
+        parallel = api.compareSets(pairs, jobs=2)
+
+        self.assertEqual(["singleMonoNuc", "multiAndMonoNuc"],
+                         list(sequential.dataFrame["Name"]))
+        self.assertTrue(sequential.dataFrame.equals(parallel.dataFrame))
+
+    def test_invalidSources(self):
+        with self.assertRaises(InvalidRstFile):
+            api.analyse(b"<rst><header>")
+        with self.assertRaises(TypeError):
+            api.analyse(42)
@@ -6,9 +6,245 @@ Created on Sat Jul 14 14:46:59 2018
 """
 
 from unittest import TestCase, skip
+from click.testing import CliRunner
+from os import listdir, mkdir
+from os.path import join
+from shutil import copyfile
+from tempfile import TemporaryDirectory
+import zipfile
 import rsttace.commandline as comline
 
 
+class TestLogging(TestCase):
+    filePath = './rsttace/tests/testFiles'
+
+    def invokeCompare(self, *options) -> str:
+        rstFile = join(self.filePath, "multiAndMonoNuc.rs3")
+        result = CliRunner().invoke(comline.cli,
+                                    list(options)
+                                    + ["compare", rstFile, rstFile])
+        self.assertEqual(0, result.exit_code)
+        return result.output
+
+    def test_defaultReportsProgressMessages(self):
+        output = self.invokeCompare()
+
+        self.assertIn("Comparing the following two RST trees:", output)
+        self.assertIn("Statistical metrics:", output)
+
+    def test_quietReportsOnlyResults(self):
+        output = self.invokeCompare("--quiet")
+
+        self.assertNotIn("Comparing the following two RST trees:", output)
+        self.assertIn("Statistical metrics:", output)
+
+
+class TestArchiveInput(TestCase):
+    filePath = './rsttace/tests/testFiles'
+    fileNames = ['multiAndMonoNuc.rs3', 'singleMonoNuc.rs3',
+                 'singleMultiNuc.rs3']
+
+    def compareSets(self, inputpath1, inputpath2, outputdir) -> str:
+        result = CliRunner().invoke(comline.cli,
+                                    ["--quiet", "compare", inputpath1,
+                                     inputpath2, "-o", outputdir])
+        self.assertEqual(0, result.exit_code)
+        with open(join(outputdir, "Comparison_OverallMetrics.csv")) as file:
+            return file.read()
+
+    def test_compare_archiveEqualsDirectory(self):
+        with TemporaryDirectory() as tempDir:
+            archivePath = join(tempDir, "set.zip")
+            with zipfile.ZipFile(archivePath, "w") as archive:
+                for fileName in self.fileNames:
+                    archive.write(join(self.filePath, fileName),
+                                  arcname=fileName)
+
+            expected = self.compareSets(self.filePath, archivePath,
+                                        join(tempDir, "directory"))
+            actual = self.compareSets(archivePath, archivePath,
+                                      join(tempDir, "archive"))
+
+        self.assertIn("multiAndMonoNuc", actual)
+        self.assertEqual(expected, actual)
+
+
+class TestFaultIsolation(TestCase):
+    filePath = './rsttace/tests/testFiles'
+
+    def test_compare_invalidFilesAreListedInErrors(self):
+        with TemporaryDirectory() as tempDir:
+            result = CliRunner().invoke(comline.cli,
+                                        ["--quiet", "compare", self.filePath,
+                                         self.filePath, "-o", tempDir,
+                                         "--timeout", "60"])
+            with open(join(tempDir, "Comparison_OverallMetrics.csv")) as file:
+                metrics = file.read()
+            with open(join(tempDir, "Comparison_Errors.csv")) as file:
+                errors = file.read()
+
+        self.assertEqual(0, result.exit_code)
+        self.assertIn("multiAndMonoNuc", metrics)
+        self.assertNotIn("invalidFile_noBody", metrics)
+        self.assertIn("invalidFile_noBody,InvalidRstFile", errors)
+        self.assertIn("Failed RST-tree pairs", result.output)
+
+    def test_compare_nonXmlFileIsListedInErrors(self):
+        for options in [[], ["--timeout", "60"]]:
+            with TemporaryDirectory() as tempDir:
+                inputDir = join(tempDir, "input")
+                outputDir = join(tempDir, "output")
+                mkdir(inputDir)
+                copyfile(join(self.filePath, "multiAndMonoNuc.rs3"),
+                         join(inputDir, "multiAndMonoNuc.rs3"))
+                with open(join(inputDir, "broken.rs3"), "w") as file:
+                    file.write("<rst><not closed")
+                result = CliRunner().invoke(comline.cli,
+                                            ["--quiet", "compare", inputDir,
+                                             inputDir, "-o", outputDir]
+                                            + options)
+                with open(join(outputDir,
+                               "Comparison_OverallMetrics.csv")) as file:
+                    metrics = file.read()
+                with open(join(outputDir, "Comparison_Errors.csv")) as file:
+                    errors = file.read()
+
+            self.assertEqual(0, result.exit_code)
+            self.assertIn("multiAndMonoNuc", metrics)
+            self.assertIn("broken,InvalidRstFile", errors)
+
+    def test_compare_checkpointOnlyOnRequest(self):
+        for options, written in [([], False), (["--checkpoint"], True)]:
+            with TemporaryDirectory() as tempDir:
+                inputDir = join(tempDir, "input")
+                outputDir = join(tempDir, "output")
+                mkdir(inputDir)
+                copyfile(join(self.filePath, "multiAndMonoNuc.rs3"),
+                         join(inputDir, "multiAndMonoNuc.rs3"))
+                result = CliRunner().invoke(comline.cli,
+                                            ["--quiet", "compare", inputDir,
+                                             inputDir, "-o", outputDir]
+                                            + options)
+                outputFiles = listdir(outputDir)
+
+            self.assertEqual(0, result.exit_code)
+            self.assertIn("Comparison_OverallMetrics.csv", outputFiles)
+            self.assertEqual(written,
+                             "Comparison_Checkpoint.jsonl" in outputFiles)
+
+    def test_compare_invalidCheckpointAborts(self):
+        with TemporaryDirectory() as tempDir:
+            with open(join(tempDir, "Comparison_Checkpoint.jsonl"),
+                      "w") as file:
+                file.write('{"format": "rsttace-checkpoint"}\n[1]\n')
+            result = CliRunner().invoke(comline.cli,
+                                        ["compare", self.filePath,
+                                         self.filePath, "-o", tempDir,
+                                         "--resume"])
+
+        self.assertEqual(0, result.exit_code)
+        self.assertIsNone(result.exception)
+        self.assertIn("Error: ", result.output)
+        self.assertIn("-> Abort", result.output)
+
+    def test_merge_missingShardAborts(self):
+        with TemporaryDirectory() as tempDir:
+            for options in [["--shard", "1/2"],
+                            ["--shard", "1/2", "--bootstrap", "10"]]:
+                result = CliRunner().invoke(comline.cli,
+                                            ["compare", self.filePath,
+                                             self.filePath, "-o", tempDir]
+                                            + options)
+                self.assertEqual(0, result.exit_code)
+            self.assertIn("'--bootstrap' cannot be applied to a shard",
+                          result.output)
+            result = CliRunner().invoke(comline.cli,
+                                        ["merge",
+                                         join(tempDir, "Comparison_Partial_"
+                                                       "1-of-2.json")])
+
+        self.assertEqual(0, result.exit_code)
+        self.assertIn("Error: Missing shards of 2: 2 -> Abort",
+                      result.output)
+
+    def test_merge_invalidPartialFilesAbort(self):
+        contents = {"broken.json": '{"format": ',
+                    "foreign.json": '{"format": "other"}',
+                    "noPairs.json": '{"format": "rsttace-partial-results"}'}
+        with TemporaryDirectory() as tempDir:
+            paths = [join(tempDir, "missing.json")]
+            for fileName, content in contents.items():
+                paths.append(join(tempDir, fileName))
+                with open(paths[-1], "w") as file:
+                    file.write(content)
+            for path in paths:
+                result = CliRunner().invoke(comline.cli, ["merge", path])
+
+                self.assertEqual(0, result.exit_code)
+                self.assertIsNone(result.exception)
+                self.assertIn("Error: ", result.output)
+                self.assertIn("-> Abort", result.output)
+
+
+class TestJsonOutput(TestCase):
+    filePath = './rsttace/tests/testFiles'
+
+    def test_compare_filesAndDirectoriesUseSameTableNames(self):
+        rstFile = join(self.filePath, "multiAndMonoNuc.rs3")
+        with TemporaryDirectory() as tempDir:
+            for inputPath, outputDir in [(rstFile, "files"),
+                                         (self.filePath, "directories")]:
+                result = CliRunner().invoke(comline.cli,
+                                            ["--quiet", "compare", inputPath,
+                                             inputPath, "-o",
+                                             join(tempDir, outputDir),
+                                             "--format", "jsonl"])
+                self.assertEqual(0, result.exit_code)
+            fileNames = [listdir(join(tempDir, outputDir))
+                         for outputDir in ["files", "directories"]]
+
+        self.assertIn("Comparison_multiAndMonoNuc+multiAndMonoNuc_Table.jsonl",
+                      fileNames[0])
+        self.assertIn("Comparison_multiAndMonoNuc_Table.jsonl", fileNames[1])
+
+
+class TestWindowedComparison(TestCase):
+    filePath = './rsttace/tests/testFiles/multiAndMonoNuc.rs3'
+
+    def compareFiles(self, outputdir, *options) -> str:
+        result = CliRunner().invoke(comline.cli,
+                                    ["--quiet", "compare", self.filePath,
+                                     self.filePath, "-o", outputdir]
+                                    + list(options))
+        self.assertEqual(0, result.exit_code)
+        fileName = "Comparison_multiAndMonoNuc+multiAndMonoNuc_Table.csv"
+        with open(join(outputdir, fileName)) as file:
+            return file.read()
+
+    def test_compare_windowedEqualsWhole(self):
+        with TemporaryDirectory() as tempDir:
+            expected = self.compareFiles(join(tempDir, "whole"))
+            actual = self.compareFiles(join(tempDir, "windowed"),
+                                       "--window-size", "2")
+
+        self.assertEqual(expected, actual)
+
+    def test_compare_onlySelectedSegments(self):
+        with TemporaryDirectory() as tempDir:
+            whole = self.compareFiles(join(tempDir, "whole"))
+            region = self.compareFiles(join(tempDir, "region"),
+                                       "--segments", "1-3")
+
+        self.assertLess(len(region.splitlines()), len(whole.splitlines()))
+
+    def test_compare_invalidSegments(self):
+        result = CliRunner().invoke(comline.cli,
+                                    ["compare", self.filePath,
+                                     self.filePath, "--segments", "3-1"])
+
+        self.assertNotEqual(0, result.exit_code)
+
+
 @skip("Tested function is obsolete and has been removed")
 class TestFolderProcessing(TestCase):
     actualNumberOfCalls: int
@@ -1,14 +1,42 @@
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 
 from rsttace.controller.interactors import AnalyseInteractor
 from rsttace.controller.interactors import CompareInteractor
 from rsttace.controller.interactors import CompareSetInteractor
+from rsttace.controller.interactors import CompareManySetsInteractor
+from rsttace.controller.interactors import MergeInteractor
 from rsttace.controller import IRstInput
 from rsttace.controller import IRelTableOutput
 from rsttace.controller import IComparisonTableOutput
 from rsttace.controller import ICompareSetTableOutput
+from rsttace.controller import IProgressOutput, TIMING_STEPS
+from rsttace.controller import IPairErrorOutput
+from rsttace.controller.scheduler import createBatches, MAX_BATCH_SIZE
 from rsttace.core import RstTree
 from rsttace.core import RelTable, ComparisonTable, CompareSetTable
+from rsttace.input import RstTreeParser, PartialResultsReader
+from rsttace.input import InvalidRstFile
+from rsttace.output import CompareSetPartialLogger, CheckpointLog
+from rsttace.output import CompareSetTableJsonLogger
+
+from concurrent.futures import ProcessPoolExecutor
+import gc
+import os
+import sys
+import time
+import weakref
+from tempfile import TemporaryDirectory
+
+from os.path import join
+from pandas import DataFrame
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+TEST_FILE_PATH = './rsttace/tests/testFiles'
 
 
 class FakeInput(IRstInput):
@@ -40,10 +68,59 @@ class FakeEvalTableOutput(ICompareSetTableOutput):
     def __init__(self):
         self.write_timesCalled = 0
 
-    def write(self, evalTable: EvaluationTable):
+    def write(self, evalTable: CompareSetTable):
         self.write_timesCalled += 1
 
 
+class FakeProgressOutput(IProgressOutput):
+    def __init__(self):
+        self.total = None
+        self.updates = []
+        self.matrixBytes = []
+        self.finish_timesCalled = 0
+
+    def start(self, total: int):
+        self.total = total
+
+    def update(self, name: str, timings: dict, matrixBytes: int = 0):
+        self.updates.append((name, timings))
+        self.matrixBytes.append(matrixBytes)
+
+    def finish(self):
+        self.finish_timesCalled += 1
+
+
+class FakeErrorOutput(IPairErrorOutput):
+    def __init__(self):
+        self.errors = None
+
+    def write(self, errors: list):
+        self.errors = errors
+
+
+class SleepingParser(RstTreeParser):
+    def read(self) -> RstTree:
+        time.sleep(60)
+
+
+class CrashingParser(RstTreeParser):
+    def read(self) -> RstTree:
+        os._exit(1)
+
+
+class AllocatingParser(RstTreeParser):
+    def read(self) -> RstTree:
+        return bytearray(2 ** 29)
+
+
+def readAddressSpace() -> int:
+    """ Current address space (bytes) of the process, only on Linux """
+    with open("/proc/self/status") as file:
+        for line in file:
+            if line.startswith("VmSize:"):
+                return int(line.split()[1]) * 1024
+
+
 class FakeGenerator():
     def __init__(self):
         self.run_timesCalled = 0
@@ -67,10 +144,15 @@ class FakeComparer():
 class FakeEvaluator():
     def __init__(self):
         self.run_timesCalled = 0
+        self.runOnAccumulator_timesCalled = 0
 
-    def run(self, compTables: list) -> EvaluationTable:
+    def run(self, compTables: list) -> CompareSetTable:
         self.run_timesCalled += 1
-        return CompareSetTable(None)
+        return CompareSetTable(DataFrame({"Name": []}))
+
+    def runOnAccumulator(self, accumulator) -> CompareSetTable:
+        self.runOnAccumulator_timesCalled += 1
+        return CompareSetTable(DataFrame({"Name": []}))
 
 
 class TestAnalyseInteractor(TestCase):
@@ -190,21 +272,22 @@ class TestEvaluateInteractor(TestCase):
         evalOutput1 = FakeEvalTableOutput()
         evalOutput2 = FakeEvalTableOutput()
 
-        pair1triple = (pair1tree1, pair1tree2, pair1compOut)
-        pair2triple = (pair2tree1, pair2tree2, pair2compOut)
-        pair3triple = (pair3tree1, pair3tree2, pair3compOut)
+        pair1triple = (pair1tree1, pair1tree2, pair1compOut, "pair1")
+        pair2triple = (pair2tree1, pair2tree2, pair2compOut, "pair2")
+        pair3triple = (pair3tree1, pair3tree2, pair3compOut, "pair3")
 
         # Operate
         interactor = CompareSetInteractor([pair1triple,
                                          pair2triple,
                                          pair3triple],
                                         [evalOutput1, evalOutput2])
-        interactor.tableEvaluator = FakeEvaluator()
+        interactor.tableSetComparer = FakeEvaluator()
 
         returnVal = interactor.run()
 
         # Check
-        self.assertEqual(interactor.tableEvaluator.run_timesCalled, 1)
+        self.assertEqual(
+            interactor.tableSetComparer.runOnAccumulator_timesCalled, 1)
         self.assertIsInstance(returnVal, CompareSetTable)
 
         self.assertEqual(pair1tree1.read_timesCalled, 1)
@@ -221,3 +304,421 @@ class TestEvaluateInteractor(TestCase):
 
         self.assertEqual(evalOutput1.write_timesCalled, 1)
         self.assertEqual(evalOutput2.write_timesCalled, 1)
+
+    def test_reportsTimingsOfEachPair(self):
+        # Build
+        pairs = [(FakeInput(), FakeInput(), FakeCompTableOutput(), name)
+                 for name in ["pair1", "pair2"]]
+        progress = FakeProgressOutput()
+
+        # Operate
+        interactor = CompareSetInteractor(pairs, [],
+                                          progressOutputs=[progress])
+        interactor.tableSetComparer = FakeEvaluator()
+        interactor.run()
+
+        # Check
+        self.assertEqual(progress.total, 2)
+        self.assertEqual(["pair1", "pair2"],
+                         [name for name, _ in progress.updates])
+        for _, timings in progress.updates:
+            self.assertEqual(TIMING_STEPS, list(timings))
+            self.assertTrue(all(t >= 0 for t in timings.values()))
+        self.assertEqual(progress.finish_timesCalled, 1)
+
+    def test_pairsWithoutOutputAreOnlyEvaluated(self):
+        # Build
+        withOutputs = buildShardTestPairs()
+        withoutOutputs = [(rstInput1, rstInput2, None, name)
+                          for rstInput1, rstInput2, _, name in withOutputs]
+
+        # Operate
+        expected = CompareSetInteractor(withOutputs, []).run()
+        actual = CompareSetInteractor(withoutOutputs, []).run()
+
+        # Check
+        self.assertTrue(expected.dataFrame.equals(actual.dataFrame))
+        self.assertTrue(expected.stats.equals(actual.stats))
+        for _, _, compTableOut, _ in withOutputs:
+            self.assertEqual(compTableOut.write_timesCalled, 1)
+
+    def test_comparisonsAreReleased(self):
+        # Build
+        class RefCompTableOutput(IComparisonTableOutput):
+            def __init__(self):
+                self.refs = []
+
+            def write(self, compTable: ComparisonTable):
+                self.refs.append(weakref.ref(compTable))
+
+        output = RefCompTableOutput()
+        pairs = [(rstInput1, rstInput2, output, name)
+                 for rstInput1, rstInput2, _, name in buildShardTestPairs()]
+
+        # Operate
+        evalTable = CompareSetInteractor(pairs, []).run()
+        gc.collect()
+
+        # Check
+        self.assertEqual(len(SHARD_TEST_FILES), len(output.refs))
+        self.assertTrue(all(ref() is None for ref in output.refs))
+        self.assertIsNone(evalTable.agreementCountsList)
+        self.assertIn("micro", evalTable.stats.index)
+
+    def test_statsAreAvailableWhileComparing(self):
+        # Build
+        class StatsProgressOutput(FakeProgressOutput):
+            def update(self, name: str, timings: dict, matrixBytes: int = 0):
+                FakeProgressOutput.update(self, name, timings, matrixBytes)
+                self.stats.append(interactor.currentStats())
+
+        progress = StatsProgressOutput()
+        progress.stats = []
+        interactor = CompareSetInteractor(buildShardTestPairs(), [],
+                                          progressOutputs=[progress])
+
+        # Operate
+        evalTable = interactor.run()
+
+        # Check
+        self.assertEqual(len(SHARD_TEST_FILES), len(progress.stats))
+        self.assertTrue(all(matrixBytes >= 0
+                            for matrixBytes in progress.matrixBytes))
+        self.assertTrue(any(matrixBytes > 0
+                            for matrixBytes in progress.matrixBytes))
+        firstRow = evalTable.dataFrame.iloc[0]
+        self.assertEqual(firstRow["Average-Ratio"],
+                         progress.stats[0]["Average-Ratio"]["mean"])
+        self.assertTrue(evalTable.stats.loc[["mean", "std", "min", "max"]]
+                        .equals(progress.stats[-1]))
+
+    def test_pairMetricsAreWrittenWhileComparing(self):
+        # Build
+        class LinesProgressOutput(FakeProgressOutput):
+            def update(self, name: str, timings: dict, matrixBytes: int = 0):
+                FakeProgressOutput.update(self, name, timings, matrixBytes)
+                with open(path, encoding="utf-8") as file:
+                    self.lines.append(len(file.readlines()))
+
+        with TemporaryDirectory() as tmpDir:
+            path = join(tmpDir, "metrics.jsonl")
+            progress = LinesProgressOutput()
+            progress.lines = []
+
+            # Operate
+            evalTable = CompareSetInteractor(
+                buildShardTestPairs(), [CompareSetTableJsonLogger(path)],
+                progressOutputs=[progress]).run()
+            with open(path, encoding="utf-8") as file:
+                streamed = file.read()
+            CompareSetTableJsonLogger(path).write(evalTable)
+            with open(path, encoding="utf-8") as file:
+                written = file.read()
+
+        # Check
+        self.assertEqual(list(range(1, len(SHARD_TEST_FILES) + 1)),
+                         progress.lines)
+        self.assertEqual(written, streamed)
+
+    def test_parallelEqualsSequential(self):
+        # Build
+        progress = FakeProgressOutput()
+
+        # Operate
+        sequential = CompareSetInteractor(buildShardTestPairs(), []).run()
+        parallel = CompareSetInteractor(buildShardTestPairs(), [],
+                                        progressOutputs=[progress],
+                                        jobs=2).run()
+
+        # Check
+        self.assertTrue(sequential.dataFrame.equals(parallel.dataFrame))
+        self.assertTrue(sequential.stats.equals(parallel.stats))
+        self.assertEqual(sorted(SHARD_TEST_FILES),
+                         sorted(name for name, _ in progress.updates))
+        self.assertEqual(progress.finish_timesCalled, 1)
+
+    def test_failingPairsAreReported(self):
+        # Build
+        validPairs = buildShardTestPairs()
+        invalidPair = (RstTreeParser(join(TEST_FILE_PATH,
+                                          "invalidFile_noBody.rs3")),
+                       validPairs[0][1], FakeCompTableOutput(), "invalid")
+
+        for jobs in [1, 2]:
+            errorOutput = FakeErrorOutput()
+
+            # Operate
+            expected = CompareSetInteractor(validPairs, []).run()
+            evalTable = CompareSetInteractor(validPairs[:2] + [invalidPair]
+                                             + validPairs[2:], [],
+                                             jobs=jobs,
+                                             errorOutputs=[errorOutput]).run()
+
+            # Check
+            self.assertTrue(expected.dataFrame.equals(evalTable.dataFrame))
+            self.assertEqual(["invalid"],
+                             [name for name, _ in errorOutput.errors])
+            self.assertIn("InvalidRstFile", errorOutput.errors[0][1])
+
+    def test_failingPairAbortsWithoutErrorOutputs(self):
+        invalidPair = (RstTreeParser(join(TEST_FILE_PATH,
+                                          "invalidFile_noBody.rs3")),
+                       RstTreeParser(join(TEST_FILE_PATH,
+                                          "singleMonoNuc.rs3")),
+                       FakeCompTableOutput(), "invalid")
+
+        progress = FakeProgressOutput()
+
+        with self.assertRaises(InvalidRstFile):
+            CompareSetInteractor([invalidPair], [],
+                                 progressOutputs=[progress]).run()
+        self.assertEqual(progress.finish_timesCalled, 1)
+
+    def test_supervisedWorkersIsolateFaults(self):
+        # Build
+        validPairs = buildShardTestPairs()
+        otherFile = join(TEST_FILE_PATH, "singleMonoNuc.rs3")
+        faultyPairs = [(SleepingParser(otherFile), RstTreeParser(otherFile),
+                        None, "sleeping"),
+                       (CrashingParser(otherFile), RstTreeParser(otherFile),
+                        None, "crashing")]
+        errorOutput = FakeErrorOutput()
+        progress = FakeProgressOutput()
+
+        # Operate
+        expected = CompareSetInteractor(validPairs, []).run()
+        start = time.monotonic()
+        evalTable = CompareSetInteractor(faultyPairs + validPairs, [],
+                                         progressOutputs=[progress],
+                                         jobs=2,
+                                         errorOutputs=[errorOutput],
+                                         timeout=2).run()
+
+        # Check
+        self.assertLess(time.monotonic() - start, 30)
+        self.assertTrue(expected.dataFrame.equals(evalTable.dataFrame))
+        errors = dict(errorOutput.errors)
+        self.assertEqual(["sleeping", "crashing"], list(errors))
+        self.assertIn("Timeout", errors["sleeping"])
+        self.assertIn("died", errors["crashing"])
+        self.assertEqual(len(faultyPairs) + len(validPairs),
+                         len(progress.updates))
+
+    @skipUnless(resource is not None and sys.platform.startswith("linux"),
+                "Memory limits are only enforced on Linux")
+    def test_memoryLimitIsolatesPair(self):
+        # the forked workers start with the address space of this process
+        maxMemory = readAddressSpace() + 2 ** 28
+        otherFile = join(TEST_FILE_PATH, "singleMonoNuc.rs3")
+        pairs = [(AllocatingParser(otherFile), RstTreeParser(otherFile),
+                  None, "allocating"),
+                 (RstTreeParser(otherFile), RstTreeParser(otherFile),
+                  None, "valid")]
+        errorOutput = FakeErrorOutput()
+
+        evalTable = CompareSetInteractor(pairs, [],
+                                         errorOutputs=[errorOutput],
+                                         maxMemory=maxMemory).run()
+
+        self.assertEqual(["valid"], list(evalTable.dataFrame["Name"]))
+        self.assertEqual("allocating", errorOutput.errors[0][0])
+        self.assertIn("MemoryError", errorOutput.errors[0][1])
+
+    def test_resumeSkipsRecordedPairs(self):
+        # Build
+        pairs = buildShardTestPairs()
+        expected = CompareSetInteractor(pairs, []).run()
+
+        with TemporaryDirectory() as tmpDir:
+            path = join(tmpDir, "checkpoint.jsonl")
+            for jobs in [1, 2]:
+                CompareSetInteractor(pairs[:3], [],
+                                     checkpoint=CheckpointLog(path)).run()
+                progress = FakeProgressOutput()
+                checkpoint = CheckpointLog(path, resume=True)
+
+                # Operate
+                evalTable = CompareSetInteractor(pairs, [],
+                                                 progressOutputs=[progress],
+                                                 jobs=jobs,
+                                                 checkpoint=checkpoint).run()
+
+                # Check
+                self.assertEqual(sorted(name for _, _, _, name in pairs[3:]),
+                                 sorted(name for name, _ in progress.updates))
+                self.assertTrue(expected.dataFrame.equals(evalTable.dataFrame))
+                self.assertTrue(expected.stats.equals(evalTable.stats))
+                self.assertEqual(len(pairs),
+                                 len(CheckpointLog(path, resume=True).read()))
+
+
+class TestCreateBatches(TestCase):
+    def test_largestPairsFirst(self):
+        costs = [1, 100, 1, 50, 1, 1]
+
+        batches = createBatches(costs, jobs=2)
+
+        self.assertEqual([1], batches[0])
+        self.assertEqual([3], batches[1])
+        self.assertEqual(list(range(len(costs))),
+                         sorted(index for batch in batches
+                                for index in batch))
+
+    def test_smallPairsAreBatched(self):
+        costs = [1] * 1000
+
+        batches = createBatches(costs, jobs=4)
+
+        self.assertLess(len(batches), len(costs))
+        self.assertTrue(all(len(batch) <= MAX_BATCH_SIZE
+                            for batch in batches))
+        self.assertEqual(list(range(len(costs))),
+                         [index for batch in batches for index in batch])
+
+
+class CountingParser(RstTreeParser):
+    def __init__(self, filePath: str):
+        RstTreeParser.__init__(self, filePath)
+        self.read_timesCalled = 0
+
+    def read(self) -> RstTree:
+        self.read_timesCalled += 1
+        return RstTreeParser.read(self)
+
+
+class TestCompareManySetsInteractor(TestCase):
+    filePath = './rsttace/tests/testFiles'
+
+    def createParser(self, fileName: str) -> CountingParser:
+        return CountingParser(join(self.filePath, fileName))
+
+    def test_referenceIsReadOnlyOnce(self):
+        # Build
+        reference = {"a": self.createParser("multiAndMonoNuc.rs3"),
+                     "b": self.createParser("singleMonoNuc.rs3")}
+        candidateSetList = []
+        for setName in ["set1", "set2"]:
+            candidates = {"a": (self.createParser("singleMultiNuc.rs3"),
+                                FakeCompTableOutput()),
+                          "b": (self.createParser("singleMonoNuc.rs3"),
+                                FakeCompTableOutput()),
+                          "c": (self.createParser("singleMonoNuc.rs3"),
+                                FakeCompTableOutput())}
+            candidateSetList.append((candidates,
+                                     [FakeEvalTableOutput()],
+                                     setName))
+
+        # Operate
+        interactor = CompareManySetsInteractor(reference, candidateSetList)
+        evalTables = interactor.run()
+
+        # Check
+        self.assertEqual(reference["a"].read_timesCalled, 1)
+        self.assertEqual(reference["b"].read_timesCalled, 1)
+        self.assertEqual(2, len(evalTables))
+        for evalTable, (candidates, evalOutputs, _) in zip(evalTables,
+                                                           candidateSetList):
+            self.assertEqual(["a", "b"], list(evalTable.dataFrame["Name"]))
+            self.assertEqual(1.0, evalTable.dataFrame["Average-Ratio"][1])
+            self.assertEqual(candidates["a"][1].write_timesCalled, 1)
+            self.assertEqual(candidates["b"][1].write_timesCalled, 1)
+            self.assertEqual(candidates["c"][0].read_timesCalled, 0)
+            self.assertEqual(evalOutputs[0].write_timesCalled, 1)
+
+    def test_parallelEqualsSequential(self):
+        # Build
+        reference = {"a": self.createParser("multiAndMonoNuc.rs3")}
+        candidateSetList = [({"a": (self.createParser(fileName),
+                                    FakeCompTableOutput())}, [], fileName)
+                            for fileName in ["singleMultiNuc.rs3",
+                                             "multiAndMonoNuc.rs3"]]
+
+        # Operate
+        sequential = CompareManySetsInteractor(reference,
+                                               candidateSetList).run()
+        parallel = CompareManySetsInteractor(reference,
+                                             candidateSetList,
+                                             jobs=2).run()
+
+        # Check
+        for seqTable, parTable in zip(sequential, parallel):
+            self.assertTrue(seqTable.dataFrame.equals(parTable.dataFrame))
+
+
+SHARD_TEST_FILES = ["capitalizedRelations.rs3", "multiAndMonoNuc.rs3",
+                    "onlyRelations.rs3", "singleMonoNuc.rs3",
+                    "singleMultiNuc.rs3"]
+
+
+def buildShardTestPairs(shard: tuple = (1, 1)) -> list:
+    """ Pairs the test files alternately with themselves and with their
+        successor, and takes the given shard of those pairs """
+    filePath = TEST_FILE_PATH
+    index, count = shard
+    pairTupleList = []
+    for i, fileName in enumerate(SHARD_TEST_FILES):
+        nextName = SHARD_TEST_FILES[(i + i % 2) % len(SHARD_TEST_FILES)]
+        pairTupleList.append((RstTreeParser(join(filePath, fileName)),
+                              RstTreeParser(join(filePath, nextName)),
+                              FakeCompTableOutput(),
+                              fileName))
+    return pairTupleList[index-1::count]
+
+
+def compareShard(shardAndPath: tuple):
+    shard, outputFile = shardAndPath
+    CompareSetInteractor(buildShardTestPairs(shard),
+                         [CompareSetPartialLogger(outputFile, shard)],
+                         keepAgreementCounts=True).run()
+    return outputFile
+
+
+class TestMergeInteractor(TestCase):
+    def test_shardedEqualsSingleRun(self):
+        # Build
+        single = CompareSetInteractor(buildShardTestPairs(), []).run()
+
+        # Operate
+        with TemporaryDirectory() as tmpDir:
+            tasks = [((i, 3), join(tmpDir, str(i) + ".json"))
+                     for i in range(1, 4)]
+            with ProcessPoolExecutor(max_workers=3) as pool:
+                partialFiles = list(pool.map(compareShard, tasks))
+            partialInputs = [PartialResultsReader(path)
+                             for path in reversed(partialFiles)]
+            output = FakeEvalTableOutput()
+            merged = MergeInteractor(partialInputs, [output]).run()
+
+        # Check
+        self.assertEqual(output.write_timesCalled, 1)
+        self.assertTrue(single.dataFrame.equals(merged.dataFrame))
+        self.assertTrue(single.stats.equals(merged.stats))
+
+    def test_duplicatePairRaisesError(self):
+        # Build
+        with TemporaryDirectory() as tmpDir:
+            path = compareShard(((1, 2), join(tmpDir, "1.json")))
+            partialInputs = [PartialResultsReader(path),
+                             PartialResultsReader(path)]
+
+        # Operate & Check
+        with self.assertRaises(ValueError):
+            MergeInteractor(partialInputs, []).run()
+
+    def test_incompleteShardsRaiseError(self):
+        # Build
+        with TemporaryDirectory() as tmpDir:
+            shardLists = [[(1, 3), (3, 3)], [(1, 2), (2, 3)]]
+            partialInputLists = [
+                [PartialResultsReader(compareShard(
+                    (shard, join(tmpDir, str(listID) + str(shard[0])
+                                 + ".json"))))
+                 for shard in shards]
+                for listID, shards in enumerate(shardLists)]
+
+        # Operate & Check
+        for partialInputs in partialInputLists:
+            output = FakeEvalTableOutput()
+            with self.assertRaises(ValueError):
+                MergeInteractor(partialInputs, [output]).run()
+            self.assertEqual(output.write_timesCalled, 0)
@@ -7,8 +7,27 @@ Created on Sat Jul 14 14:46:59 2018
 
 from unittest import TestCase, skip
 from rsttace.core import TableGenerator, TableComparer, ComparisonTable
+from rsttace.core import MatchingDistance, Comparison, RelColumns
+from rsttace.core import AgreementCounts, ComparisonMetrics, AgreementSession
+from rsttace.core import WindowedComparer
+from rsttace.core.windowedcomparer import createWindows, selectSegments
+from rsttace.core import TableSetComparer, MetricsAccumulator
+from rsttace.core.comparesettable import RunningStats, statEval
+from rsttace.core import SharedRelTables
+from rsttace.core.comparisontable import calcMatchBits, cohensKappas
+
+from rsttace.core.bootstrap import bootstrapConfidenceIntervals
+
+from rsttace.input import RstTreeParser, RstBytesParser
+from math import isnan
+from numpy import nan
+import pandas as pd
+import json
+from numpy import array
 from rsttace.core import RstTree, RstNode, RelTable, RstType
-from rsttace.core import Relation
+from rsttace.core import Relation, RelElement, DistanceCache, RelIndex
+from rsttace.core.relationstable import createSignature
+from rsttace.core.comptablegenerator import calcDistance, generateDistMatrix
 from rsttace.core.rsttree import MonoNucRelation, MultiNucRelation, Span
 
 
@@ -321,6 +340,108 @@ class TestTableComparer(TestCase):
         self.assertIsInstance(compTable, ComparisonTable)
         self.assertEqual(compTable.length(), 0)
 
+    def test_metricsEqualComparisonTableMetrics(self):
+        filePath = './rsttace/tests/testFiles'
+        fileNames = ["multiAndMonoNuc.rs3", "singleMultiNuc.rs3",
+                     "capitalizedRelations.rs3", "onlyRelations.rs3"]
+        relTables = [TableGenerator().run(
+                         RstTreeParser(filePath + "/" + fileName).read())
+                     for fileName in fileNames]
+        tabComp = TableComparer()
+
+        for relTable1 in relTables:
+            for relTable2 in relTables:
+                compTable = tabComp.run(relTable1, relTable2)
+                metrics = tabComp.runMetrics(relTable1, relTable2)
+                self.assertIsInstance(metrics, ComparisonMetrics)
+                self.assertEqual(str(compTable.matchingRatios),
+                                 str(metrics.matchingRatios))
+                self.assertEqual(str(compTable.cohensKappas),
+                                 str(metrics.cohensKappas))
+                self.assertEqual(compTable.agreementCounts.toDict(),
+                                 metrics.agreementCounts.toDict())
+
+    def test_blockwiseEqualsDenseAssociation(self):
+        # two independent blocks of relations and unmatched relations
+        relTable1 = createRelTable([
+            createRelation("reason", False, (2, 2), (1, 1), [(2, 2)]),
+            createRelation("list", True, (3, 3), (4, 5), [(3, 3), (4, 5)]),
+            createRelation("cause", False, (9, 9), (8, 8), [(9, 9)]),
+            createRelation("joint", True, (6, 6), (7, 7), [(6, 6), (7, 7)])])
+        relTable2 = createRelTable([
+            createRelation("cause", False, (20, 20), (21, 21), [(20, 20)]),
+            createRelation("list", True, (3, 3), (4, 4), [(3, 3), (4, 4)]),
+            createRelation("cause", False, (2, 2), (1, 1), [(2, 2)])])
+        dense = TableComparer(DistanceCache())
+        blockwise = TableComparer(DistanceCache(), maxDenseCells=0)
+
+        expected = dense.run(relTable1, relTable2)
+        actual = blockwise.run(relTable1, relTable2)
+
+        self.assertEqual(list(expected.relIDs1), list(actual.relIDs1))
+        self.assertEqual(list(expected.distances), list(actual.distances))
+        self.assertEqual(expected.agreementCounts.toDict(),
+                         actual.agreementCounts.toDict())
+        self.assertEqual(9 * 4 * 3, dense.peakMatrixBytes)
+        self.assertLess(blockwise.peakMatrixBytes, dense.peakMatrixBytes)
+
+    def test_denseAssociationByDefault(self):
+        relTable1, relTable2 = createTiedRelTables()
+        default = TableComparer(DistanceCache())
+        blockwise = TableComparer(DistanceCache(), maxDenseCells=0)
+
+        expected = default.run(relTable1, relTable2)
+        actual = blockwise.run(relTable1, relTable2)
+
+        self.assertIsNone(default.maxDenseCells)
+        self.assertEqual(9 * 2 * 2, default.peakMatrixBytes)
+        # ties may be chosen differently, the total distance is the same
+        self.assertEqual(sumDistances(expected), sumDistances(actual))
+
+    def test_identicalTreesAreNotMatched(self):
+        filePath = './rsttace/tests/testFiles/multiAndMonoNuc.rs3'
+        relTable1 = TableGenerator().run(RstTreeParser(filePath).read())
+        relTable2 = TableGenerator().run(RstTreeParser(filePath).read())
+        tabComp = TableComparer(DistanceCache())
+
+        expected = tabComp.run(removeHashes(relTable1),
+                               removeHashes(relTable2))
+        compTable = tabComp.run(relTable1, relTable2)
+
+        self.assertEqual(0, tabComp.peakMatrixBytes)
+        self.assertEqual(list(expected.relIDs2), list(compTable.relIDs2))
+        self.assertTrue(all(distance == MatchingDistance.COMPLETE_SAME_CS
+                            for distance in compTable.distances))
+        self.assertEqual(expected.agreementCounts.toDict(),
+                         compTable.agreementCounts.toDict())
+
+    def test_identicalSubtreesArePairedDirectly(self):
+        relTable1 = TableGenerator().run(
+            RstBytesParser(SUBTREES_DOCUMENT).read())
+        relTable2 = TableGenerator().run(
+            RstBytesParser(SUBTREES_DOCUMENT.replace("cause", "reason")
+                           .replace("C</", "changed text</")).read())
+        hashed = TableComparer(DistanceCache())
+        unhashed = TableComparer(DistanceCache())
+
+        expected = unhashed.runMetrics(removeHashes(relTable1),
+                                       removeHashes(relTable2))
+        actual = hashed.runMetrics(relTable1, relTable2)
+
+        self.assertEqual(expected.agreementCounts.toDict(),
+                         actual.agreementCounts.toDict())
+        self.assertEqual(str(expected.cohensKappas),
+                         str(actual.cohensKappas))
+        self.assertLess(hashed.peakMatrixBytes, unhashed.peakMatrixBytes)
+
+    def test_distanceMatrixIsCompact(self):
+        relTable = createRelTable([
+            createRelation("reason", False, (2, 2), (1, 1), [(2, 2)])])
+
+        distMatrix = generateDistMatrix(relTable, relTable, DistanceCache())
+
+        self.assertEqual(1, distMatrix.itemsize)
+
     @skip("")
     def test_comparisons(self):
         self.fail("TODO: Implement test cases for table comparisons")
@@ -330,6 +451,591 @@ class TestTableComparer(TestCase):
         self.fail("TODO: Implement test cases for kappa calculations")
 
 
+def createRelation(name: str, isMultiNuclear: bool,
+                   constituent: tuple, attachmentPoint: tuple,
+                   centralSubconstituent: list) -> Relation:
+    """ Builds a relation from (minID, maxID) tuples """
+    def createElement(span: tuple, isNuclear: bool) -> RelElement:
+        elem = RelElement()
+        elem.minID, elem.maxID = span
+        elem.isNuclear = isNuclear
+        elem.isLeaf = (span[0] == span[1])
+        return elem
+
+    rel = Relation()
+    rel.name = name
+    rel.isMultiNuclear = isMultiNuclear
+    rel.constituent = createElement(constituent, isMultiNuclear)
+    rel.attachmentPoint = createElement(attachmentPoint, True)
+    rel.centralSubconstituent = [createElement(span, isMultiNuclear)
+                                 for span in centralSubconstituent]
+    return rel
+
+
+def createRelTable(relations: list) -> RelTable:
+    relTable = RelTable()
+    for rel in relations:
+        relTable.append(rel)
+    return relTable
+
+
+def createTiedRelTables() -> tuple:
+    """ Relations tables with equally good associations: the list relation
+        of table 1 has the same CS as both relations of table 2 """
+    relTable1 = createRelTable([
+        createRelation("reason", False, (1, 1), (2, 2), [(1, 1)]),
+        createRelation("list", True, (3, 3), (2, 2), [(3, 3), (2, 2)])])
+    relTable2 = createRelTable([
+        createRelation("list", True, (3, 3), (2, 2), [(3, 3), (2, 2)]),
+        createRelation("list", True, (2, 2), (3, 3), [(2, 2), (3, 3)])])
+    return (relTable1, relTable2)
+
+
+def sumDistances(compTable: ComparisonTable) -> int:
+    return int(compTable.distances.astype(int).sum())
+
+
+def removeHashes(relTable: RelTable) -> RelTable:
+    """ Copy of relTable without subtree hashes """
+    copy = RelTable()
+    for rel in relTable:
+        relCopy = Relation()
+        relCopy.__dict__.update(rel.__dict__)
+        relCopy.subtreeHash = None
+        copy.append(relCopy)
+    return copy
+
+
+# Multi-nuclear relation of a multi-nuclear and a span group, each with a
+# mono-nuclear relation
+SUBTREES_DOCUMENT = """<rst>
+  <header>
+    <relations>
+      <rel name="list" type="multinuc" />
+      <rel name="reason" type="rst" />
+      <rel name="cause" type="rst" />
+    </relations>
+  </header>
+  <body>
+    <segment id="1" parent="10" relname="list">A</segment>
+    <segment id="2" parent="10" relname="list">B</segment>
+    <segment id="3" parent="2" relname="reason">C</segment>
+    <segment id="4" parent="11" relname="span">D</segment>
+    <segment id="5" parent="4" relname="cause">E</segment>
+    <group id="10" type="multinuc" parent="12" relname="list" />
+    <group id="11" type="span" parent="12" relname="list" />
+    <group id="12" type="multinuc" />
+  </body>
+</rst>"""
+
+
+class TestDistanceCache(TestCase):
+    def setUp(self):
+        self.relations = [
+            createRelation("reason", False, (2, 2), (1, 1), [(2, 2)]),
+            createRelation("cause", False, (2, 2), (1, 1), [(2, 2)]),
+            createRelation("reason", False, (1, 1), (2, 2), [(1, 1)]),
+            createRelation("list", True, (1, 1), (2, 3), [(1, 1), (2, 3)]),
+            createRelation("list", True, (1, 1), (2, 4), [(1, 1), (2, 2)]),
+            createRelation("joint", True, (3, 4), (5, 5), [(3, 4), (5, 5)])]
+
+    def test_signatureIgnoresRelationName(self):
+        self.assertEqual(createSignature(self.relations[0]),
+                         createSignature(self.relations[1]))
+        self.assertNotEqual(createSignature(self.relations[0]),
+                            createSignature(self.relations[2]))
+
+    def test_distancesEqualUncachedDistances(self):
+        cache = DistanceCache()
+        for rel1 in self.relations:
+            for rel2 in self.relations:
+                self.assertEqual(calcDistance(rel1, rel2),
+                                 cache.get(createSignature(rel1),
+                                           createSignature(rel2)))
+
+    def test_countsHitsAndMisses(self):
+        cache = DistanceCache()
+        relTable = createRelTable(self.relations[:2])
+
+        generateDistMatrix(relTable, relTable, cache)
+
+        self.assertEqual(1, cache.misses)
+        self.assertEqual(3, cache.hits)
+        self.assertEqual(0.75, cache.hitRatio())
+
+    def test_isBounded(self):
+        cache = DistanceCache(maxSize=3)
+        relTable = createRelTable(self.relations)
+
+        generateDistMatrix(relTable, relTable, cache)
+
+        self.assertEqual(3, cache.length())
+
+
+class TestRelIndex(TestCase):
+    def setUp(self):
+        self.relations = [
+            createRelation("reason", False, (2, 2), (1, 1), [(2, 2)]),
+            createRelation("reason", False, (1, 1), (2, 2), [(1, 1)]),
+            createRelation("cause", False, (3, 3), (1, 2), [(3, 3)]),
+            createRelation("list", True, (1, 1), (2, 3), [(1, 1), (2, 3)]),
+            createRelation("list", True, (1, 1), (2, 4), [(1, 1), (2, 2)]),
+            createRelation("joint", True, (3, 4), (5, 5), [(3, 4), (5, 5)]),
+            createRelation("empty", False, (6, 6), (7, 7), [])]
+
+    def test_candidatesContainAllMatchingRelations(self):
+        relIndex = RelIndex(createRelTable(self.relations))
+        for rel1 in self.relations:
+            candidates = relIndex.findCandidates(createSignature(rel1))
+            for j, rel2 in enumerate(self.relations):
+                if calcDistance(rel1, rel2) != MatchingDistance.NO_MATCHING:
+                    self.assertIn(j, candidates)
+
+    def test_removedRelationsAreNoCandidates(self):
+        relIndex = RelIndex(createRelTable(self.relations))
+        signature = relIndex.signatures[3]
+
+        relIndex.removeRelation(3, signature)
+
+        self.assertNotIn(3, relIndex.findCandidates(signature))
+        self.assertIn(4, relIndex.findCandidates(signature))
+
+    def test_prunedMatrixEqualsFullMatrix(self):
+        relTable = createRelTable(self.relations)
+
+        distMatrix = generateDistMatrix(relTable, relTable, DistanceCache())
+
+        for i, rel1 in enumerate(self.relations):
+            for j, rel2 in enumerate(self.relations):
+                self.assertEqual(calcDistance(rel1, rel2), distMatrix[i][j])
+
+
+class TestSharedRelTables(TestCase):
+    def setUp(self):
+        self.relTables = {
+            "a": createRelTable([
+                createRelation("reason", False, (2, 2), (1, 1), [(2, 2)]),
+                createRelation("list", True, (1, 1), (2, 3),
+                               [(1, 1), (2, 3)])]),
+            "empty": RelTable(),
+            "b": createRelTable([
+                createRelation("Bedingung", False, (3, 4), (1, 2),
+                               [(3, 3), (4, 4)])])}
+        self.relTables["a"].treeHash = bytes(range(16))
+        self.relTables["a"].get(1).subtreeHash = bytes(range(1, 17))
+
+    def test_attachedTablesEqualPublishedTables(self):
+        published = SharedRelTables.publish(self.relTables)
+        try:
+            attached = SharedRelTables.attach(published.handle)
+            self.assertEqual(["a", "empty", "b"], attached.names())
+            self.assertNotIn("c", attached)
+            for name, relTable in self.relTables.items():
+                self.assertEqual(
+                    [createSignature(rel) + (rel.name, rel.subtreeHash)
+                     for rel in relTable],
+                    [createSignature(rel) + (rel.name, rel.subtreeHash)
+                     for rel in attached.get(name)])
+                self.assertEqual(relTable.treeHash,
+                                 attached.get(name).treeHash)
+            attached.close()
+        finally:
+            published.close()
+            published.unlink()
+
+
+class TestComparisonTable(TestCase):
+    def setUp(self):
+        self.relations1 = [
+            createRelation("reason", False, (2, 2), (1, 1), [(2, 2)]),
+            createRelation("list", True, (1, 1), (2, 3), [(1, 1), (2, 3)])]
+        self.relations2 = [
+            createRelation("cause", False, (2, 2), (1, 1), [(2, 2)]),
+            createRelation("list", False, (1, 1), (2, 3), [(1, 1)])]
+
+    def assertEqualEvaluation(self, expected, actual):
+        self.assertEqual(expected.relation, actual.relation)
+        self.assertEqual(expected.constituent, actual.constituent)
+        self.assertEqual(expected.attachmentPoint, actual.attachmentPoint)
+        self.assertEqual(expected.nuclearity.equalDirection,
+                         actual.nuclearity.equalDirection)
+        self.assertEqual(expected.nuclearity.equalMonoMulti,
+                         actual.nuclearity.equalMonoMulti)
+
+    def test_matchBitsEqualEvaluation(self):
+        columns1 = RelColumns(createRelTable(self.relations1))
+        columns2 = RelColumns(createRelTable(self.relations2))
+        relIDs = [0, 1, 0, 1]
+        otherIDs = [0, 1, 1, 0]
+
+        matchBits = calcMatchBits(columns1, columns2, relIDs, otherIDs)
+
+        for i, j, bits in zip(relIDs, otherIDs, matchBits):
+            rel1 = self.relations1[i]
+            rel2 = self.relations2[j]
+            dist = calcDistance(rel1, rel2)
+            self.assertEqualEvaluation(Comparison(rel1, rel2, dist).evaluation,
+                                       Comparison(rel1, rel2, dist,
+                                                  int(bits)).evaluation)
+
+    def test_appendedComparisonsAreReturned(self):
+        compTable = ComparisonTable()
+        comparisons = [Comparison(rel1, rel2, calcDistance(rel1, rel2))
+                       for rel1, rel2 in zip(self.relations1,
+                                             self.relations2)]
+
+        for comp in comparisons:
+            compTable.append(comp)
+
+        self.assertEqual(2, compTable.length())
+        for expected, actual in zip(comparisons, compTable):
+            self.assertIs(expected.relation1, actual.relation1)
+            self.assertIs(expected.relation2, actual.relation2)
+            self.assertEqual(expected.matchingDistance,
+                             actual.matchingDistance)
+            self.assertEqualEvaluation(expected.evaluation,
+                                       actual.evaluation)
+
+
+    def test_appendDoesNotChangePassedTables(self):
+        relTable1 = RelTable()
+        relTable2 = RelTable()
+        relTable1.append(self.relations1[0])
+        relTable2.append(self.relations2[0])
+        compTable = ComparisonTable(relTable1, relTable2, [0], [0], [0], [0])
+        rel1, rel2 = self.relations1[1], self.relations2[1]
+
+        compTable.append(Comparison(rel1, rel2, calcDistance(rel1, rel2)))
+
+        self.assertEqual(1, relTable1.length())
+        self.assertEqual(1, relTable2.length())
+        self.assertEqual(2, compTable.length())
+        self.assertEqual([0, 1], list(compTable.relIDs1))
+        self.assertIs(rel2, compTable.get(1).relation2)
+
+
+class TestCohensKappas(TestCase):
+    def test_kappaOfEachRow(self):
+        labels1 = array([[0, 0, 1, 1], [3, 7, -1, 7]])
+        labels2 = array([[0, 1, 1, 1], [3, 7, 3, -1]])
+
+        kappas = cohensKappas(labels1, labels2)
+
+        self.assertAlmostEqual(0.5, kappas[0])
+        self.assertAlmostEqual((0.5 - 5 / 16) / (1 - 5 / 16), kappas[1])
+
+    def test_undefinedKappa(self):
+        kappas = cohensKappas(array([[2, 2]]), array([[2, 2]]))
+
+        self.assertTrue(isnan(kappas[0]))
+
+    def test_noLabels(self):
+        kappas = cohensKappas(array([[], []]), array([[], []]))
+
+        self.assertEqual([0, 0], list(kappas))
+
+
+class TestAgreementCounts(TestCase):
+    def setUp(self):
+        relTable1 = createRelTable([
+            createRelation("reason", False, (2, 2), (1, 1), [(2, 2)]),
+            createRelation("list", True, (3, 3), (4, 5), [(3, 3), (4, 5)]),
+            createRelation("cause", False, (6, 6), (5, 5), [(6, 6)])])
+        relTable2 = createRelTable([
+            createRelation("cause", False, (2, 2), (1, 1), [(2, 2)]),
+            createRelation("list", True, (3, 3), (4, 4), [(3, 3), (4, 4)]),
+            createRelation("joint", True, (1, 2), (3, 3), [(1, 2), (3, 3)])])
+        self.compTable = TableComparer(DistanceCache()).run(relTable1,
+                                                            relTable2)
+
+    def test_metricsEqualComparisonMetrics(self):
+        counts = self.compTable.agreementCounts
+
+        self.assertEqual(self.compTable.matchingRatios,
+                         counts.calcMatchingRatios())
+        for dimension, kappa in counts.calcCohensKappas().items():
+            self.assertAlmostEqual(self.compTable.cohensKappas[dimension],
+                                   kappa)
+
+    def test_addedCountsArePooled(self):
+        counts = self.compTable.agreementCounts
+
+        pooled = counts + counts
+
+        self.assertEqual(2 * counts.total(), pooled.total())
+        self.assertEqual(counts.calcMatchingRatios(),
+                         pooled.calcMatchingRatios())
+        for dimension, kappa in counts.calcCohensKappas().items():
+            self.assertAlmostEqual(kappa,
+                                   pooled.calcCohensKappas()[dimension])
+
+    def test_accumulatorEqualsTableSet(self):
+        compTables = [self.compTable,
+                      TableComparer(DistanceCache()).run(
+                          self.compTable.relTable2, self.compTable.relTable1)]
+        compTables[0].name = "a"
+        compTables[1].name = "b"
+        accumulator = MetricsAccumulator()
+        for compTable in compTables:
+            accumulator.add(compTable)
+
+        expected = TableSetComparer().run(compTables)
+        actual = TableSetComparer().runOnAccumulator(accumulator)
+
+        self.assertIsNone(actual.agreementCountsList)
+        self.assertTrue(expected.dataFrame.equals(actual.dataFrame))
+        self.assertTrue(expected.stats.equals(actual.stats))
+
+    def test_dictRoundTripKeepsCounts(self):
+        counts = self.compTable.agreementCounts
+
+        restored = AgreementCounts.fromDict(
+            json.loads(json.dumps(counts.toDict())))
+
+        self.assertEqual(counts.matchPatternCounts.tolist(),
+                         restored.matchPatternCounts.tolist())
+        self.assertEqual(counts.labelCounts1, restored.labelCounts1)
+        self.assertEqual(counts.calcMatchingRatios(),
+                         restored.calcMatchingRatios())
+        self.assertEqual(counts.calcCohensKappas(),
+                         restored.calcCohensKappas())
+
+
+class TestAgreementSession(TestCase):
+    def setUp(self):
+        self.relTable1 = TableGenerator().run(
+            RstBytesParser(SUBTREES_DOCUMENT).read())
+        self.relTable2 = TableGenerator().run(
+            RstBytesParser(SUBTREES_DOCUMENT.replace('"cause"', '"reason"')
+                           .replace('parent="4"', 'parent="3"')).read())
+        self.session = AgreementSession(self.relTable1, self.relTable2,
+                                        DistanceCache())
+
+    def assertEqualsComparer(self, session: AgreementSession):
+        """ session's metrics equal those of a new block-wise comparison of
+            its relations tables, its total distance also equals the one of
+            the default comparer """
+        relTable1 = removeHashes(session.relTable(1))
+        relTable2 = removeHashes(session.relTable(2))
+        expected = TableComparer(DistanceCache(), maxDenseCells=0).run(
+            relTable1, relTable2)
+        dense = TableComparer(DistanceCache()).run(relTable1, relTable2)
+        self.assertEqual(sumDistances(dense),
+                         sumDistances(session.comparisonTable()))
+        self.assertEqual(expected.agreementCounts.toDict(),
+                         session.agreementCounts.toDict())
+        self.assertEqual(expected.matchingRatios, session.matchingRatios)
+        for dimension, kappa in expected.cohensKappas.items():
+            self.assertAlmostEqual(kappa, session.cohensKappas[dimension])
+        self.assertEqual(expected.agreementCounts.toDict(),
+                         session.comparisonTable().agreementCounts.toDict())
+
+    def test_metricsEqualComparer(self):
+        self.assertEqualsComparer(self.session)
+
+    def test_relabelKeepsAssociation(self):
+        partner = self.session.getPartner(1, 0)
+
+        self.session.relabelRelation(1, 0, "elaboration")
+
+        self.assertEqual("elaboration", self.session.getRelation(1, 0).name)
+        self.assertEqual(partner, self.session.getPartner(1, 0))
+        self.assertEqualsComparer(self.session)
+
+    def test_editsEqualComparerOfEditedTables(self):
+        session = self.session
+        moved = RelElement()
+        moved.minID, moved.maxID = (1, 2)
+        moved.isNuclear = True
+        moved.isLeaf = False
+
+        session.moveAttachment(2, 1, moved)
+        self.assertEqualsComparer(session)
+        session.removeRelation(2, 1)
+        self.assertEqualsComparer(session)
+        self.assertIsNone(session.getPartner(1, 1))
+        relID = session.addRelation(
+            2, createRelation("cause", False, (5, 5), (4, 4), [(5, 5)]))
+        self.assertEqualsComparer(session)
+        self.assertEqual((relID, MatchingDistance.COMPLETE_SAME_CS),
+                         session.getPartner(1, 1))
+        session.removeRelation(1, 0)
+        self.assertEqualsComparer(session)
+        session.addRelation(
+            1, createRelation("joint", True, (6, 6), (7, 7),
+                              [(6, 6), (7, 7)]))
+        self.assertEqualsComparer(session)
+
+    def test_removedRelationsAreNotCompared(self):
+        for side in [1, 2]:
+            for relID in self.session.relationIDs(side):
+                self.session.removeRelation(side, relID)
+
+        self.assertEqual(0, self.session.agreementCounts.total())
+        self.assertEqual(0, self.session.comparisonTable().length())
+        self.assertEqualsComparer(self.session)
+
+    def test_tiesAreBrokenAsBlockwise(self):
+        session = AgreementSession(*createTiedRelTables(), DistanceCache())
+
+        self.assertEqualsComparer(session)
+
+    def test_unknownSideIsRejected(self):
+        with self.assertRaises(ValueError):
+            self.session.relationIDs(3)
+
+
+class TestWindowedComparer(TestCase):
+    def setUp(self):
+        # two top-level spans (1-3, 4-6), joined by a list relation
+        self.relTable1 = createRelTable([
+            createRelation("reason", False, (2, 2), (1, 1), [(2, 2)]),
+            createRelation("cause", False, (3, 3), (1, 2), [(3, 3)]),
+            createRelation("list", True, (1, 3), (4, 6), [(1, 3), (4, 6)]),
+            createRelation("joint", True, (4, 4), (5, 6), [(4, 4), (5, 6)]),
+            createRelation("joint", True, (5, 5), (6, 6), [(5, 5), (6, 6)])])
+        self.relTable2 = createRelTable([
+            createRelation("cause", False, (2, 2), (1, 1), [(2, 2)]),
+            createRelation("list", True, (1, 2), (3, 6), [(1, 2), (3, 6)]),
+            createRelation("reason", False, (6, 6), (5, 5), [(6, 6)]),
+            createRelation("joint", True, (5, 5), (6, 6), [(5, 5), (6, 6)])])
+
+    def assertEqualsBlockwise(self, windowedComparer: WindowedComparer):
+        expected = TableComparer(DistanceCache(), maxDenseCells=0).run(
+            self.relTable1, self.relTable2)
+        actual = windowedComparer.run(self.relTable1, self.relTable2)
+        self.assertEqual(list(expected.relIDs1), list(actual.relIDs1))
+        self.assertEqual(list(expected.relIDs2), list(actual.relIDs2))
+        self.assertEqual(list(expected.distances), list(actual.distances))
+        self.assertEqual(expected.agreementCounts.toDict(),
+                         actual.agreementCounts.toDict())
+
+    def test_windowsAreCutBetweenTopLevelSpans(self):
+        windows = createWindows(self.relTable1, self.relTable2, 4)
+
+        self.assertEqual([(1, 3), (4, 6)], windows)
+
+    def test_windowedEqualsBlockwiseAssociation(self):
+        windowedComparer = WindowedComparer(4, distanceCache=DistanceCache(),
+                                            maxDenseCells=0)
+
+        self.assertEqualsBlockwise(windowedComparer)
+        self.assertEqual([(1, 3), (4, 6)], windowedComparer.lastWindows)
+
+    def test_crossingRelationsAreReconciled(self):
+        # (3, 4) is crossed by relations of both tables
+        windowedComparer = WindowedComparer(windows=[(1, 3), (4, 6)],
+                                            distanceCache=DistanceCache(),
+                                            maxDenseCells=0)
+        self.relTable1.append(
+            createRelation("reason", False, (4, 4), (3, 3), [(4, 4)]))
+
+        self.assertEqualsBlockwise(windowedComparer)
+
+    def test_parallelEqualsSequential(self):
+        self.assertEqualsBlockwise(WindowedComparer(2, jobs=2,
+                                                    maxDenseCells=0))
+
+    def test_tiesKeepTotalDistanceOfFullComparer(self):
+        relTable1, relTable2 = createTiedRelTables()
+        expected = TableComparer(DistanceCache()).run(relTable1, relTable2)
+
+        for windows in [[(1, 1), (2, 3)], [(1, 2), (3, 3)], [(1, 3)]]:
+            actual = WindowedComparer(windows=windows,
+                                      distanceCache=DistanceCache()).run(
+                relTable1, relTable2)
+
+            self.assertEqual(expected.length(), actual.length())
+            self.assertEqual(sumDistances(expected), sumDistances(actual))
+
+    def test_overlappingWindowsAreRejected(self):
+        windowedComparer = WindowedComparer(windows=[(1, 4), (4, 6)])
+
+        with self.assertRaises(ValueError):
+            windowedComparer.run(self.relTable1, self.relTable2)
+
+    def test_selectSegments(self):
+        relTable = selectSegments(self.relTable1, 4, 6)
+
+        self.assertEqual(["joint", "joint"],
+                         [rel.name for rel in relTable])
+
+
+class TestRunningStats(TestCase):
+    values = [[0.5, nan, 1.0],
+              [1.0, 0.25, 1.0],
+              [0.0, 0.75, nan],
+              [0.75, 1.0, 1.0]]
+
+    def test_statsEqualDescribe(self):
+        dataFrame = pd.DataFrame(self.values, columns=["a", "b", "c"])
+        dataFrame.insert(0, "Name", ["w", "x", "y", "z"])
+
+        stats = statEval(dataFrame)
+
+        expected = dataFrame.describe().loc[["mean", "std", "min", "max"]]
+        self.assertEqual(list(expected.columns), list(stats.columns))
+        self.assertEqual(list(expected.index), list(stats.index))
+        for column in expected.columns:
+            for index in expected.index:
+                self.assertAlmostEqual(expected[column][index],
+                                       stats[column][index])
+
+    def test_mergedEqualsSequential(self):
+        sequential = RunningStats(["a", "b", "c"])
+        first = RunningStats(["a", "b", "c"])
+        second = RunningStats(["a", "b", "c"])
+        for i, row in enumerate(self.values):
+            sequential.add(row)
+            (first if i < 1 else second).add(row)
+
+        first.merge(second)
+        first.merge(RunningStats(["a", "b", "c"]))
+
+        expected = sequential.toDataFrame()
+        actual = first.toDataFrame()
+        for column in expected.columns:
+            for index in expected.index:
+                self.assertAlmostEqual(expected[column][index],
+                                       actual[column][index])
+
+    def test_noValues(self):
+        stats = RunningStats().toDataFrame()
+
+        self.assertEqual(["mean", "std", "min", "max"], list(stats.index))
+        self.assertTrue(stats.isna().all().all())
+
+
+class TestBootstrap(TestCase):
+    def setUp(self):
+        self.values = array([[0.5, 0.2], [0.7, 0.4], [0.9, 0.1], [0.6, 0.3]])
+        # pattern 15: all dimensions match, pattern 0: nothing matches
+        self.patternCounts = array([[0] * 16 for _ in range(4)])
+        self.patternCounts[:, 15] = [10, 20, 5, 5]
+        self.patternCounts[:, 0] = [10, 0, 5, 5]
+
+    def test_intervalsContainEstimates(self):
+        meanBounds, microBounds = bootstrapConfidenceIntervals(
+            self.values, self.patternCounts, replicates=1000, seed=3)
+
+        means = self.values.mean(axis=0)
+        for i in range(0, 2):
+            self.assertLessEqual(meanBounds[0][i], means[i])
+            self.assertGreaterEqual(meanBounds[1][i], means[i])
+        for i in range(0, 5):
+            self.assertLessEqual(microBounds[0][i], 0.6)
+            self.assertGreaterEqual(microBounds[1][i], 0.6)
+
+    def test_resultsDoNotDependOnJobs(self):
+        sequential = bootstrapConfidenceIntervals(
+            self.values, self.patternCounts, replicates=600, seed=7)
+        parallel = bootstrapConfidenceIntervals(
+            self.values, self.patternCounts, replicates=600, seed=7, jobs=2)
+
+        for seqBounds, parBounds in zip(sequential, parallel):
+            self.assertTrue((seqBounds == parBounds).all())
+
+
 class TestTableEvaluator(TestCase):
     @skip("")
     def test_comparisons(self):
@@ -1,10 +1,17 @@
 from unittest import TestCase
 from rsttace.input import RstTreeParser, InvalidRstFile
+from rsttace.input import RstBytesParser, RstFileObjectParser
+from rsttace.input import RstDirectory, RstArchive, isArchive, isRstSet
 from rsttace.core.rsttree import RstType, RstNode
 from rsttace.core.rsttree import MonoNucRelation, MultiNucRelation, Span
 
 import rsttace.input.parser as package
+from io import BytesIO, StringIO
 from os.path import join
+from tempfile import TemporaryDirectory
+import pickle
+import tarfile
+import zipfile
 
 
 def stub_readFile(filePath: str):
@@ -12,6 +19,10 @@ def stub_readFile(filePath: str):
     return filePath
 
 
+def stub_readFileFails(filePath: str):
+    raise AssertionError("File must not be read")
+
+
 def stub_fileExistsTrue(filePath: str):
     return True
 
@@ -36,18 +47,27 @@ class TestRstTreeParser_withStubs(TestCase):
         with self.assertRaises(FileNotFoundError):
             RstTreeParser("fakeFilePath")
 
-    def test_init_readsFile(self):
+    def test_init_doesNotReadFile(self):
         package.fileExists = stub_fileExistsTrue
+        package.readFile = stub_readFileFails
         filePath = "<some file path>"
 
         parser = RstTreeParser(filePath)
 
-        self.assertEqual(filePath, parser.fileContent)
+        self.assertEqual(filePath, parser.filePath)
 
 
 class TestRstTreeParser_withFiles(TestCase):
     filePath = './rsttace/tests/testFiles'
 
+    def test_parserKeepsNoParsedContent(self):
+        path = join(self.filePath, 'multiAndMonoNuc.rs3')
+
+        parser = pickle.loads(pickle.dumps(RstTreeParser(path)))
+
+        self.assertEqual({"filePath": path}, vars(parser))
+        self.assertIsNotNone(parser.read().root)
+
     def test_read_fileWithWrontRoot(self):
         path = join(self.filePath, 'invalidFile_wrongXmlRoot.rs3')
 
@@ -332,3 +352,136 @@ class TestRstTreeParser_withFiles(TestCase):
         self.assertIsNone(segmentD.toChildren)
         self.assertEqual("D", segmentD.text)
         self.assertEqual([4], segmentD.segmentID)
+
+
+def readBytes(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+class TestRstBytesParser(TestCase):
+    filePath = './rsttace/tests/testFiles'
+
+    def assertEqualToFile(self, rstTree, fileName: str):
+        expectedTree = RstTreeParser(join(self.filePath, fileName)).read()
+        self.assertEqual(expectedTree.relations, rstTree.relations)
+        self.assertEqual(expectedTree.root.segmentID, rstTree.root.segmentID)
+        self.assertEqual(len(expectedTree.monoNucs), len(rstTree.monoNucs))
+        self.assertEqual(len(expectedTree.multiNucs), len(rstTree.multiNucs))
+
+    def test_read_bytes(self):
+        content = readBytes(join(self.filePath, 'multiAndMonoNuc.rs3'))
+
+        rstTree = RstBytesParser(content).read()
+
+        self.assertEqualToFile(rstTree, 'multiAndMonoNuc.rs3')
+
+    def test_size_countsSegments(self):
+        path = join(self.filePath, 'multiAndMonoNuc.rs3')
+
+        self.assertEqual(4, RstBytesParser(readBytes(path)).size())
+        self.assertEqual(4, RstTreeParser(path).size())
+
+    def test_read_string(self):
+        content = readBytes(join(self.filePath, 'multiAndMonoNuc.rs3'))
+
+        rstTree = RstBytesParser(content.decode("utf-8")).read()
+
+        self.assertEqualToFile(rstTree, 'multiAndMonoNuc.rs3')
+
+    def test_read_fileObjects(self):
+        content = readBytes(join(self.filePath, 'singleMonoNuc.rs3'))
+
+        for fileObject in (BytesIO(content),
+                           StringIO(content.decode("utf-8"))):
+            rstTree = RstFileObjectParser(fileObject).read()
+            self.assertEqualToFile(rstTree, 'singleMonoNuc.rs3')
+
+    def test_read_invalidContent(self):
+        content = readBytes(join(self.filePath, 'invalidFile_noBody.rs3'))
+
+        parser = RstBytesParser(content)
+        with self.assertRaises(InvalidRstFile):
+            parser.read()
+
+
+class TestSubtreeHashes(TestCase):
+    filePath = './rsttace/tests/testFiles'
+
+    def readTree(self, content: bytes):
+        return RstBytesParser(content).read()
+
+    def test_equalStructuresHaveEqualHashes(self):
+        content = readBytes(join(self.filePath, 'multiAndMonoNuc.rs3'))
+
+        rstTree1 = self.readTree(content)
+        rstTree2 = self.readTree(content.replace(b">A<", b">Other text<"))
+
+        self.assertEqual(16, len(rstTree1.root.subtreeHash))
+        self.assertEqual(rstTree1.root.subtreeHash,
+                         rstTree2.root.subtreeHash)
+
+    def test_changedRelationChangesOnlyItsSubtrees(self):
+        content = readBytes(join(self.filePath, 'singleMonoNuc.rs3'))
+
+        rstTree = self.readTree(content)
+        changedTree = self.readTree(content.replace(b'"reason"',
+                                                    b'"cause"'))
+
+        self.assertNotEqual(rstTree.root.subtreeHash,
+                            changedTree.root.subtreeHash)
+        self.assertEqual(rstTree.monoNucs[0].start.subtreeHash,
+                         changedTree.monoNucs[0].start.subtreeHash)
+
+
+class TestRstArchive(TestCase):
+    filePath = './rsttace/tests/testFiles'
+    fileNames = ['multiAndMonoNuc.rs3', 'singleMonoNuc.rs3']
+
+    def setUp(self):
+        self.tempDir = TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    def createTar(self, name: str, mode: str) -> str:
+        path = join(self.tempDir.name, name)
+        with tarfile.open(path, mode) as archive:
+            for fileName in self.fileNames:
+                archive.add(join(self.filePath, fileName),
+                            arcname=join("set", fileName))
+        return path
+
+    def createZip(self, name: str) -> str:
+        path = join(self.tempDir.name, name)
+        with zipfile.ZipFile(path, "w") as archive:
+            for fileName in self.fileNames:
+                archive.write(join(self.filePath, fileName),
+                              arcname=join("set", fileName))
+            archive.writestr("set/readme.txt", "no rs3-file")
+        return path
+
+    def test_listFiles_tarAndZip(self):
+        for path in (self.createTar("set.tar", "w"),
+                     self.createTar("set.tar.gz", "w:gz"),
+                     self.createZip("set.zip")):
+            self.assertTrue(isArchive(path))
+            self.assertTrue(isRstSet(path))
+            self.assertEqual(sorted(self.fileNames),
+                             sorted(RstArchive(path).listFiles()))
+
+    def test_createInput_readsMember(self):
+        rstSet = RstArchive(self.createZip("set.zip"))
+
+        rstTree = rstSet.createInput('singleMonoNuc.rs3').read()
+
+        expectedTree = RstTreeParser(join(self.filePath,
+                                          'singleMonoNuc.rs3')).read()
+        self.assertEqual(expectedTree.relations, rstTree.relations)
+        self.assertEqual(expectedTree.root.segmentID, rstTree.root.segmentID)
+
+    def test_isRstSet_directoryAndFiles(self):
+        self.assertTrue(isRstSet(self.filePath))
+        self.assertFalse(isRstSet(join(self.filePath, 'singleMonoNuc.rs3')))
+        self.assertIn('singleMonoNuc.rs3',
+                      RstDirectory(self.filePath).listFiles())
@@ -0,0 +1,190 @@
+from unittest import TestCase
+from io import StringIO
+from os.path import join
+from tempfile import TemporaryDirectory
+import json
+
+from rsttace.core import TableGenerator, TableComparer, MatchingDistance
+from rsttace.input import RstTreeParser
+from rsttace.output import RelTableJsonLogger, CompTableJsonLogger
+from rsttace.output import CheckpointLog, InvalidCheckpointFile
+from rsttace.output.clitable import RstTableRenderer
+
+
+class TestRstTableRenderer(TestCase):
+    def render(self, headers: list, rows: list, maxRows=None) -> str:
+        stream = StringIO()
+        RstTableRenderer(headers, lambda: iter(rows), maxRows).render(stream)
+        return stream.getvalue()
+
+    def test_alignsNumbersAtDecimalPoint(self):
+        # Build
+        headers = ["", "Name", "Ratio", "ID"]
+        rows = [["", "a", 0.25, "1"],
+                ["x", "bb", 1.0, "12"],
+                ["y", "", float("nan"), ""]]
+        expected = "====  ======  =======  ====\n" \
+                   "..    Name      Ratio    ID\n" \
+                   "====  ======  =======  ====\n" \
+                   "..    a          0.25     1\n" \
+                   "x     bb         1       12\n" \
+                   "y              nan\n" \
+                   "====  ======  =======  ====\n"
+
+        # Operate & Check
+        self.assertEqual(expected, self.render(headers, rows))
+
+    def test_maxRowsHidesRemainingRows(self):
+        # Build
+        rows = [[str(i)] for i in range(5)]
+        expected = "====\n" \
+                   "  ID\n" \
+                   "====\n" \
+                   "   0\n" \
+                   "   1\n" \
+                   "====\n" \
+                   "... 3 more rows not shown\n"
+
+        # Operate & Check
+        self.assertEqual(expected, self.render(["ID"], rows, maxRows=2))
+
+
+class TestJsonLoggers(TestCase):
+    filePath = './rsttace/tests/testFiles'
+
+    def setUp(self):
+        rstTree1 = RstTreeParser(join(self.filePath,
+                                      "multiAndMonoNuc.rs3")).read()
+        rstTree2 = RstTreeParser(join(self.filePath,
+                                      "singleMonoNuc.rs3")).read()
+        self.relTable = TableGenerator().run(rstTree1)
+        self.compTable = TableComparer().run(self.relTable,
+                                             TableGenerator().run(rstTree2))
+
+    def readRecords(self, path: str) -> list:
+        with open(path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    def test_writesOneTypedRecordPerRelation(self):
+        with TemporaryDirectory() as tmpDir:
+            path = join(tmpDir, "relations.jsonl")
+            RelTableJsonLogger(path).write(self.relTable)
+            records = self.readRecords(path)
+
+        self.assertEqual(self.relTable.length(), len(records))
+        record = records[0]
+        self.assertEqual("relation", record["type"])
+        self.assertIsInstance(record["isMultiNuclear"], bool)
+        self.assertIsInstance(record["constituent"]["minID"], int)
+        self.assertIn(record["nuclearity"], ["multi", "right", "left"])
+
+    def test_writesComparisonsAndMetrics(self):
+        with TemporaryDirectory() as tmpDir:
+            path = join(tmpDir, "comparison.jsonl")
+            CompTableJsonLogger(path).write(self.compTable)
+            records = self.readRecords(path)
+
+        comparisons = records[:-1]
+        self.assertEqual(self.compTable.length(), len(comparisons))
+        for record in comparisons:
+            self.assertIn(record["matchingDistance"],
+                          [distance.name for distance in MatchingDistance])
+            if record["matchingDistance"] == "NO_MATCHING":
+                self.assertIsNone(record["equivalency"])
+            else:
+                self.assertIsInstance(record["equivalency"]["relation"], bool)
+        self.assertEqual("metrics", records[-1]["type"])
+        self.assertEqual(self.compTable.matchingRatios,
+                         records[-1]["matchingRatios"])
+
+
+class TestCheckpointLog(TestCase):
+    filePath = './rsttace/tests/testFiles'
+
+    def setUp(self):
+        relTable = TableGenerator().run(
+            RstTreeParser(join(self.filePath, "multiAndMonoNuc.rs3")).read())
+        self.counts = TableComparer().runMetrics(relTable,
+                                                 relTable).agreementCounts
+        self.rows = [["pair" + str(i), 1.0, 0.5, float("nan")]
+                     for i in range(3)]
+
+    def writeRows(self, checkpoint: CheckpointLog, rows: list):
+        for row in rows:
+            checkpoint.write(row, self.counts)
+        checkpoint.close()
+
+    def test_resumeReadsAndAppendsRecords(self):
+        with TemporaryDirectory() as tmpDir:
+            path = join(tmpDir, "checkpoint.jsonl")
+            self.writeRows(CheckpointLog(path), self.rows[:2])
+            checkpoint = CheckpointLog(path, resume=True)
+            recorded = checkpoint.read()
+            self.writeRows(checkpoint, self.rows[2:])
+            results = CheckpointLog(path, resume=True).read()
+
+        self.assertEqual(["pair0", "pair1"], [row[0] for row, _ in recorded])
+        self.assertEqual([row[0] for row in self.rows],
+                         [row[0] for row, _ in results])
+        self.assertEqual(self.counts.toDict(), results[0][1].toDict())
+
+    def test_incompleteRecordIsDropped(self):
+        with TemporaryDirectory() as tmpDir:
+            path = join(tmpDir, "checkpoint.jsonl")
+            self.writeRows(CheckpointLog(path), self.rows[:2])
+            with open(path, "ab") as file:
+                file.write(b'{"metrics": ["pair')
+            checkpoint = CheckpointLog(path, resume=True)
+            recorded = checkpoint.read()
+            self.writeRows(checkpoint, self.rows[2:])
+            results = CheckpointLog(path, resume=True).read()
+
+        self.assertEqual(2, len(recorded))
+        self.assertEqual(["pair0", "pair1", "pair2"],
+                         [row[0] for row, _ in results])
+
+    def test_withoutResumeReplacesLog(self):
+        with TemporaryDirectory() as tmpDir:
+            path = join(tmpDir, "checkpoint.jsonl")
+            self.writeRows(CheckpointLog(path), self.rows)
+            checkpoint = CheckpointLog(path)
+            recorded = checkpoint.read()
+            self.writeRows(checkpoint, self.rows[:1])
+            results = CheckpointLog(path, resume=True).read()
+
+        self.assertEqual([], recorded)
+        self.assertEqual(1, len(results))
+
+    def test_wrongFormatRaisesError(self):
+        with TemporaryDirectory() as tmpDir:
+            path = join(tmpDir, "checkpoint.jsonl")
+            with open(path, "w") as file:
+                file.write('{"format": "rsttace-partial-results"}\n')
+
+            with self.assertRaises(InvalidCheckpointFile):
+                CheckpointLog(path, resume=True).read()
+
+    def test_corruptRecordsRaiseError(self):
+        for record in [b'{"metrics": ["pair0"], "counts": \n', b'[1, 2]\n',
+                       b'{"metrics": ["pair0"]}\n']:
+            with TemporaryDirectory() as tmpDir:
+                path = join(tmpDir, "checkpoint.jsonl")
+                self.writeRows(CheckpointLog(path), self.rows[:1])
+                with open(path, "ab") as file:
+                    file.write(record)
+
+                with self.assertRaises(InvalidCheckpointFile):
+                    CheckpointLog(path, resume=True).read()
+
+    def test_otherInputsRaiseError(self):
+        with TemporaryDirectory() as tmpDir:
+            path = join(tmpDir, "checkpoint.jsonl")
+            self.writeRows(CheckpointLog(path, inputs={"pairs": ["pair0"]}),
+                           self.rows[:1])
+            recorded = CheckpointLog(path, resume=True,
+                                     inputs={"pairs": ["pair0"]}).read()
+
+            with self.assertRaises(InvalidCheckpointFile):
+                CheckpointLog(path, resume=True,
+                              inputs={"pairs": ["pair1"]}).read()
+        self.assertEqual(1, len(recorded))
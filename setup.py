@@ -30,10 +30,8 @@ setup(name='rsttace',
       install_requires=[
           'anytree',
           'click',
-          'tabulate',
           'numpy',
           'scipy',
-          'scikit-learn',
           'pandas'
       ],
       test_suite='nose.collector',